@@ -0,0 +1,50 @@
+import argparse
+import os
+import tempfile
+import time
+import database.database as database
+from models.expense import Expense
+
+"""
+Compares single-row inserts (one commit each) with add_expenses_bulk.
+Run from the project root: python -m benchmarks.bench_inserts --rows 20000
+"""
+
+
+def make_expenses(n) -> list[Expense]:
+    """Builds n simple expenses to insert"""
+    categories = ["Food", "Home", "Work", "Fun", "Misc"]
+    return [Expense(f"Item {i}", (i % 500) + 0.99, categories[i % len(categories)]) for i in range(n)]
+
+def time_inserts(path, insert, expenses) -> float:
+    """Runs insert(expenses) against a fresh database file and returns rows/sec"""
+    database.configure(path)
+    database.get_connection() # Open and migrate before timing
+    start = time.perf_counter()
+    insert(expenses)
+    elapsed = time.perf_counter() - start
+    database.configure(database.DEFAULT_DB_PATH)
+    return len(expenses) / elapsed
+
+def insert_one_by_one(expenses) -> None:
+    """The old write path: one INSERT and one commit per row"""
+    for expense in expenses:
+        database.add_expense(expense)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark single-row vs bulk expense inserts")
+    parser.add_argument("--rows", type=int, default=20000, help="rows to insert in each run")
+    args = parser.parse_args()
+
+    expenses = make_expenses(args.rows)
+    with tempfile.TemporaryDirectory() as folder:
+        single = time_inserts(os.path.join(folder, "single.db"), insert_one_by_one, expenses)
+        bulk = time_inserts(os.path.join(folder, "bulk.db"), database.add_expenses_bulk, expenses)
+
+    print(f"add_expense (commit per row): {single:>12,.0f} rows/sec")
+    print(f"add_expenses_bulk:            {bulk:>12,.0f} rows/sec")
+    print(f"Speed-up: {bulk / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+from models.expense import ExpenseRecord
+from utils import _parse_entry_date, parse_date, parse_dates
+
+"""
+Compares the old strptime-based utils.parse_date with the fast path and the batch API.
+Run from the project root: python -m benchmarks.bench_parse --rows 100000 --days 365
+"""
+
+
+def legacy_parse_date(entry_str) -> tuple[datetime, float]:
+    """The previous utils.parse_date: strptime with a fallback format and repeated splits"""
+    try:
+        clean_str = entry_str.strip()
+        if " on [" not in clean_str:
+            raise ValueError("Invalid entry format")
+        date_part = clean_str.split(" on [", 1)[1]
+        date_str = date_part.split("]", 1)[0].strip()
+        try:
+            date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            date = datetime.strptime(date_str, "%Y-%m-%d")
+        before_date = clean_str.split(" on [")[0]
+        if " - £" in before_date:
+            amount_str = before_date.split(" - £")[1].strip()
+        elif " - " in before_date:
+            amount_str = before_date.split(" - ")[1].strip()
+        else:
+            raise ValueError("Invalid entry format")
+        return date, float(amount_str)
+    except Exception:
+        raise ValueError("Invalid entry format")
+
+def make_entries(rows, days, seed=42) -> list[str]:
+    """Entry strings as printed for records, spread over `days` days at whole-hour times"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00:00", "s")
+    dates = start + rng.integers(0, days * 24, rows) * np.timedelta64(3600, "s")
+    amounts = rng.uniform(1, 999, rows).round(2)
+    return [
+        str(ExpenseRecord(i, "Lunch", "Food", float(amount), date.astype(datetime)))
+        for i, (date, amount) in enumerate(zip(dates, amounts), start=1)
+    ]
+
+def time_once(func, *args) -> float:
+    """Returns how long one call takes"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def best_of(repeat, func, *args) -> float:
+    """Returns the fastest of `repeat` timed calls, starting each with an empty date memo"""
+    timings = []
+    for _ in range(repeat):
+        _parse_entry_date.cache_clear()
+        timings.append(time_once(func, *args))
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark parsing entry strings into dates and amounts")
+    parser.add_argument("--rows", type=int, default=100_000, help="entries to parse")
+    parser.add_argument("--days", type=int, default=365, help="days the entries span")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    # Amounts under £1,000 so the legacy parser, which can't read thousands separators, accepts every entry
+    entries = make_entries(args.rows, args.days)
+    print(f"{args.rows:,} entries over {args.days} days")
+    legacy = best_of(args.repeat, lambda: [legacy_parse_date(entry) for entry in entries])
+    print(f"legacy strptime:       {legacy * 1000:>9.1f} ms")
+    fast = best_of(args.repeat, lambda: [parse_date(entry) for entry in entries])
+    print(f"parse_date:            {fast * 1000:>9.1f} ms  ({legacy / fast:.1f}x)")
+    batch = best_of(args.repeat, parse_dates, entries)
+    print(f"parse_dates (batch):   {batch * 1000:>9.1f} ms  ({legacy / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import time
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
+import timeseries
+
+"""
+Compares the old pure-Python line chart aggregation with the NumPy engine.
+Run from the project root: python -m benchmarks.bench_timeseries --rows 1000000 --years 5
+"""
+
+
+def make_ledger(rows, years, seed=42) -> tuple[np.ndarray, np.ndarray]:
+    """Random transaction days spread over `years` years with random amounts"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2020-01-01")
+    days = start + rng.integers(0, 365 * years, rows).astype("timedelta64[D]")
+    amounts = rng.uniform(3, 1200, rows).round(2)
+    return days, amounts
+
+def python_running_totals(dates, amounts) -> tuple[list, list]:
+    """The previous graphs.py approach: defaultdict, per-day range and manual running sum"""
+    totals = defaultdict(float)
+    for day, amount in zip(dates, amounts):
+        totals[day] += amount
+    all_dates = sorted(totals)
+    start, end = all_dates[0], all_dates[-1]
+    full_range = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    values, running = [], 0
+    for d in full_range:
+        running += totals.get(d, 0)
+        values.append(running)
+    return full_range, values
+
+def best_of(repeat, func, *args) -> float:
+    """Returns the fastest of `repeat` timed calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark line chart time-series aggregation")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transactions in the ledger")
+    parser.add_argument("--years", type=int, default=5, help="years the ledger spans")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    days, amounts = make_ledger(args.rows, args.years)
+    py_dates, py_amounts = days.tolist(), amounts.tolist() # Python objects, as the old path received
+
+    print(f"{args.rows:,} rows over {args.years} years")
+    python_time = best_of(args.repeat, python_running_totals, py_dates, py_amounts)
+    print(f"python loop:                 {python_time * 1000:>10.1f} ms")
+    for resolution in timeseries.RESOLUTIONS:
+        numpy_time = best_of(args.repeat, timeseries.cumulative_totals, days, amounts, resolution)
+        print(f"numpy cumulative ({resolution:>5}):   {numpy_time * 1000:>10.1f} ms  ({python_time / numpy_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
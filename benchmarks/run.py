@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import database.database as database
+import exporter
+import synthetic
+import timeseries
+from utils import parse_dates
+
+"""
+Benchmark suite: times the app's main operations against seeded ledgers of
+increasing size and writes the results to JSON, so runs can be compared between commits.
+Run from the project root:
+    python -m benchmarks.run --sizes 10000 100000 1000000
+    python -m benchmarks.run --compare benchmarks/results/<old commit>.json
+"""
+
+SIZES = (10_000, 100_000, 1_000_000)
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def best_of(repeat, func, setup=None) -> float:
+    """Returns the fastest of `repeat` timed calls, running `setup` untimed before each"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_size(rows, repeat, folder) -> list[dict]:
+    """Loads a synthetic ledger of `rows` expenses into a fresh database and times each operation on it"""
+    database.configure(os.path.join(folder, f"bench-{rows}.db"))
+    database.get_connection() # Open and migrate before timing
+
+    results = []
+    def record(operation, seconds, processed) -> None:
+        results.append({
+            "operation": operation, "rows": rows, "seconds": round(seconds, 6),
+            "rows_per_second": round(processed / seconds) if seconds else None,
+        })
+        print(f"{rows:>10,} {operation:<16} {seconds * 1000:>10.1f} ms")
+
+    # The insert runs once: the ledger it loads is what the other operations read
+    start = time.perf_counter()
+    added, added_income = synthetic.generate_ledger(rows)
+    record("insert", time.perf_counter() - start, added + added_income)
+
+    # The query cache is cleared before each run so the SQL itself is measured
+    clear = database.clear_cache
+    record(
+        "summarise", best_of(repeat, lambda: (database.summarise_expenses(), database.get_total_income()), clear), rows
+    )
+    record("list_page", best_of(repeat, lambda: list(database.iter_expenses(limit=20))), 20)
+    record("list_all", best_of(repeat, lambda: sum(1 for _ in database.iter_expenses())), rows)
+
+    csv_path = os.path.join(folder, "export.csv")
+    record("export_csv", best_of(repeat, lambda: exporter.export_csv("expenses", csv_path)), rows)
+    snapshot = os.path.join(folder, "snapshot")
+    record("export_snapshot", best_of(repeat, lambda: exporter.export_snapshot("expenses", snapshot)), rows)
+
+    def plot_prep() -> None:
+        labels, expense_values, income_values = timeseries.income_vs_expenses(database.get_daily_totals(), "day")
+        timeseries.downsample(labels, expense_values, 1000)
+        timeseries.downsample(labels, income_values, 1000)
+    record("plot_prep", best_of(repeat, plot_prep, clear), rows)
+
+    entries = [str(expense) for expense in database.iter_expenses()]
+    record("parse", best_of(repeat, lambda: parse_dates(entries)), rows)
+
+    database.configure(database.DEFAULT_DB_PATH)
+    return results
+
+def git_commit() -> str | None:
+    """Returns the current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path) -> None:
+    """Prints how each operation's time changed against a saved results file"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    before = {(r["operation"], r["rows"]): r["seconds"] for r in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit') or baseline_path}:")
+    for result in results:
+        old = before.get((result["operation"], result["rows"]))
+        if old:
+            change = result["seconds"] / old
+            label = "slower" if change > 1 else "faster"
+            print(f"{result['rows']:>10,} {result['operation']:<16} {max(change, 1 / change):>6.2f}x {label}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the expense tracker against seeded ledgers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="ledger sizes in expense rows")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("-o", "--output", help=f"JSON file to write (default: {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in args.sizes:
+            results += run_size(rows, args.repeat, folder)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }, file, indent=2)
+    print(f"Results written to '{output}'.")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
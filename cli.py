@@ -0,0 +1,338 @@
+import argparse
+import sys
+from datetime import datetime
+import database.database as database
+import exporter
+import graphs
+import importer
+import main as menu
+from models.expense import Expense
+from models.income import Income
+from utils import format_currency, parse_period, to_datetime
+
+"""Non-interactive command line interface for scripted use, e.g. from cron jobs"""
+
+def date_argument(value) -> datetime | None:
+    """argparse type for an ISO 'YYYY-MM-DD[ HH:MM:SS]' date (blank for none), parsed by utils.to_datetime"""
+    try:
+        return to_datetime(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+def parse_mapping(value) -> tuple[str, str]:
+    """Parses a FIELD=COLUMN column mapping"""
+    field, separator, column = value.partition("=")
+    if not separator or not field.strip() or not column.strip():
+        raise argparse.ArgumentTypeError(f"expected FIELD=COLUMN, got '{value}'")
+    return field.strip(), column.strip()
+
+def add_period_arguments(parser) -> None:
+    """Adds --period, --start and --end options for limiting a command to a date range"""
+    parser.add_argument("--period", type=parse_period, help="a year, month or day: YYYY, YYYY-MM or YYYY-MM-DD")
+    parser.add_argument("--start", type=date_argument, help="only rows on or after this date")
+    parser.add_argument("--end", type=date_argument, help="only rows before this date")
+
+def period_range(args) -> tuple[datetime | None, datetime | None]:
+    """Returns the [start, end) range chosen with --period or --start/--end"""
+    return args.period if args.period else (args.start, args.end)
+
+def print_progress(stats) -> None:
+    """Reports import progress on stderr"""
+    print(f"  {stats.path}: {stats.read:,} rows read ({stats.rows_per_second:,.0f} rows/sec)", file=sys.stderr)
+
+
+def cmd_add(args) -> int:
+    """Adds a single expense or income entry"""
+    if args.kind == "expense":
+        expense = Expense(name=args.name, amount=args.amount, category=args.category, date=args.date)
+        database.add_expense(expense)
+        print(f"Expense added: {expense.name}, {format_currency(expense.amount)}, Category: {expense.category}")
+    else:
+        income = Income(description=args.description, amount=args.amount, date=args.date)
+        database.add_income(income.description, income.amount, date=income.date)
+        print(f"Income added: {income.description}, {format_currency(income.amount)}")
+    return 0
+
+def cmd_import(args) -> int:
+    """Imports one or more CSV files in a single transaction, skipping rows already in the ledger"""
+    imported = 0
+    with database.transaction(): # All files go in together, or not at all
+        for path in args.files:
+            stats = importer.import_csv(
+                path, args.kind, columns=dict(args.mapping), date_format=args.date_format,
+                default_category=args.category, skip_invalid=args.skip_invalid, chunk_size=args.chunk_size,
+                progress=None if args.quiet else print_progress,
+            )
+            print(stats)
+            for error in stats.errors:
+                print(f"  skipped {error}", file=sys.stderr)
+            imported += stats.imported
+    print(f"Imported {imported} {args.kind} rows.")
+    return 0
+
+def cmd_export(args) -> int:
+    """Exports expenses and income to CSV"""
+    start, end = period_range(args)
+    menu.export_to_csv(
+        args.expenses_out, args.income_out, start=start, end=end, category=args.category, compress=args.gzip
+    )
+    return 0
+
+def cmd_snapshot(args) -> int:
+    """Writes a columnar snapshot of expenses or income"""
+    start, end = period_range(args)
+    path = exporter.export_snapshot(
+        args.kind, args.output or args.kind, start=start, end=end, category=args.category, fmt=args.format
+    )
+    print(f"Snapshot written to '{path}'.")
+    return 0
+
+def cmd_summary(args) -> int:
+    """Prints expenses by category (or by day/week/month) and total income, optionally for one period"""
+    start, end = period_range(args)
+    summary = database.aggregate_expenses(args.by, start, end, args.category)
+    if not summary:
+        print("No expenses to summarize.")
+    for key, total, count in summary:
+        print(f"{key}: {format_currency(total)} ({count} expenses)")
+    print(f"Total Income: {format_currency(database.get_total_income(start, end))}")
+    return 0
+
+def cmd_journal(args) -> int:
+    """Lists, undoes, restores or recovers changes recorded in the change journal"""
+    if args.action == "list":
+        entries = database.get_journal(args.limit)
+        if not entries:
+            print("The journal is empty.")
+        for entry in reversed(entries):
+            print(entry)
+    elif args.action == "undo":
+        undone = database.undo(args.steps)
+        for entry in undone:
+            print(f"Undid {entry}")
+        if not undone:
+            print("Nothing to undo.")
+    elif args.action == "restore":
+        added, removed = database.restore(args.seq, args.at)
+        print(f"Restored: {added} rows added back and {removed} rows removed.")
+    elif args.action == "recover":
+        expenses, income = database.recover(args.path, args.seq, args.at)
+        print(f"Recovered {expenses} expenses and {income} income entries into '{args.path}'.")
+    else:
+        seq = database.checkpoint(force=True)
+        print(f"Snapshot taken at journal entry #{seq}.")
+    return 0
+
+def cmd_archive(args) -> int:
+    """Moves closed years into yearly archive files, or lists the archives"""
+    if not args.list:
+        moved = database.archive_closed_years(args.before)
+        for year, expenses, income in moved:
+            print(f"Archived {year}: {expenses} expenses and {income} income entries.")
+        if not moved:
+            print("No closed years left to archive.")
+        return 0
+    archives = database.get_archives()
+    if not archives:
+        print("No years have been archived.")
+    for year, path, expenses, income in archives:
+        print(f"{year}: {expenses} expenses and {income} income entries in '{path}'")
+    return 0
+
+def cmd_search(args) -> int:
+    """Prints the expenses and income entries best matching the search words"""
+    start, end = period_range(args)
+    expenses, income = [], []
+    if args.kind != "income":
+        expenses = database.search_expenses(args.text, start, end, args.category, args.limit)
+    if args.kind != "expenses":
+        income = database.search_income(args.text, start, end, args.limit)
+    if not expenses and not income:
+        print(f"Nothing matches '{args.text}'.")
+        return 1
+    for heading, entries in [("Expenses", expenses), ("Income", income)]:
+        if entries:
+            print(f"{heading}:")
+            for entry in entries:
+                print(f"  {entry}")
+    return 0
+
+def cmd_plot(args) -> int:
+    """Renders a chart to an image file"""
+    start, end = period_range(args)
+    path = graphs.render_chart(
+        args.chart, path=args.output, fmt=args.format, resolution=args.resolution, start=start, end=end
+    )
+    if path is None:
+        print("No data to plot.")
+        return 1
+    print(f"Chart written to '{path}'.")
+    return 0
+
+def cmd_forecast(args) -> int:
+    """Brings the fitted model up to date and prints each category's forecast for the next weeks"""
+    import ml_module
+
+    forecasts = ml_module.forecast(args.weeks, ml_module.update())
+    if not forecasts:
+        print("No expenses to forecast from.")
+        return 1
+    for category, weeks in forecasts.items():
+        print(f"{category}: " + ", ".join(f"w/c {week}: {format_currency(amount)}" for week, amount in weeks))
+    totals = [sum(weeks[i][1] for weeks in forecasts.values()) for i in range(args.weeks)]
+    print("Total: " + ", ".join(format_currency(total) for total in totals))
+    return 0
+
+def cmd_anomalies(args) -> int:
+    """
+    Prints unusual expenses. By default only those added since the model was last
+    updated are scored, against the existing fit, and then folded in.
+    """
+    import ml_module
+
+    state = ml_module.load_state()
+    since = 0 if args.all else state.last_expense_id
+    if args.all or not state.categories:
+        state = ml_module.update(state)
+    anomalies = ml_module.find_anomalies(since, args.threshold, state)
+    ml_module.update(state)
+    if not anomalies:
+        print("No unusual expenses found.")
+    for record, score in anomalies:
+        print(f"{record} (robust z {score:+.1f})")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the argument parser and its subcommands"""
+    parser = argparse.ArgumentParser(prog="expense-tracker", description="Expense Tracker command line interface")
+    parser.add_argument("--db", help="database file to use (default: $EXPENSE_TRACKER_DB or expenses.db)")
+    parser.add_argument("--profile", action="store_true", help="time hot paths and print a summary table on exit")
+    parser.add_argument("--pstats", metavar="FILE", help="like --profile, and also write a cProfile dump to FILE")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add one expense or income entry")
+    kinds = add.add_subparsers(dest="kind", required=True)
+    add_expense = kinds.add_parser("expense", help="add an expense")
+    add_expense.add_argument("--name", required=True)
+    add_expense.add_argument("--amount", type=float, required=True)
+    add_expense.add_argument("--category", required=True, choices=menu.EXPENSE_CATEGORIES)
+    add_expense.add_argument("--date", type=date_argument, help="'YYYY-MM-DD HH:MM:SS' (default: now)")
+    add_income = kinds.add_parser("income", help="add an income entry")
+    add_income.add_argument("--description", required=True)
+    add_income.add_argument("--amount", type=float, required=True)
+    add_income.add_argument("--date", type=date_argument, help="'YYYY-MM-DD HH:MM:SS' (default: now)")
+    add.set_defaults(handler=cmd_add)
+
+    imports = commands.add_parser("import", help="import CSV files (exports or bank statements), skipping duplicates")
+    imports.add_argument("kind", choices=["expenses", "income"])
+    imports.add_argument("files", nargs="+", help="CSV files to import")
+    imports.add_argument(
+        "--map", dest="mapping", type=parse_mapping, action="append", default=[], metavar="FIELD=COLUMN",
+        help="read a field (name, category, description, amount, date) from a differently named column",
+    )
+    imports.add_argument("--date-format", help="strptime format of the date column, e.g. %%d/%%m/%%Y (default: ISO)")
+    imports.add_argument("--category", help="category for expense rows without one")
+    imports.add_argument("--skip-invalid", action="store_true", help="skip and report invalid rows instead of aborting")
+    imports.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE, help="rows inserted per batch")
+    imports.add_argument("-q", "--quiet", action="store_true", help="don't report progress")
+    imports.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="export expenses and income to CSV")
+    export.add_argument("--expenses-out", default="expenses.csv", help="expenses file (default: expenses.csv)")
+    export.add_argument("--income-out", default="income.csv", help="income file (default: income.csv)")
+    add_period_arguments(export)
+    export.add_argument("--category", help="only expenses in this category")
+    export.add_argument("--gzip", action="store_true", help="gzip-compress the files (adds .gz)")
+    export.set_defaults(handler=cmd_export)
+
+    snapshot = commands.add_parser("snapshot", help="write a columnar snapshot (Arrow IPC, or .npz without pyarrow)")
+    snapshot.add_argument("kind", choices=["expenses", "income"])
+    snapshot.add_argument("-o", "--output", help="file to write; the extension is added (default: the kind)")
+    snapshot.add_argument("--format", choices=exporter.SNAPSHOT_FORMATS, help="default: arrow if pyarrow is installed")
+    add_period_arguments(snapshot)
+    snapshot.add_argument("--category", help="only expenses in this category")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    summary = commands.add_parser("summary", help="print expenses by category and total income")
+    summary.add_argument(
+        "--by", choices=database.GROUPINGS, default="category", help="group expenses by (default: category)"
+    )
+    summary.add_argument("--category", help="only expenses in this category")
+    add_period_arguments(summary)
+    summary.set_defaults(handler=cmd_summary)
+
+    journal = commands.add_parser(
+        "journal", help="list, undo or roll back changes, or recover the ledger into a new file"
+    )
+    actions = journal.add_subparsers(dest="action", required=True)
+    history = actions.add_parser("list", help="show the latest adds and removes, oldest first")
+    history.add_argument("--limit", type=int, default=20, help="entries to show (default: 20)")
+    undo = actions.add_parser("undo", help="undo the latest changes")
+    undo.add_argument("steps", type=int, nargs="?", default=1, help="changes to undo (default: 1)")
+    for name, help_text in [("restore", "put the ledger back as it was at an earlier point"),
+                            ("recover", "write the ledger rebuilt from the journal into a new database file")]:
+        action = actions.add_parser(name, help=help_text)
+        if name == "recover":
+            action.add_argument("path", help="database file to create")
+        point = action.add_mutually_exclusive_group(required=name == "restore")
+        point.add_argument("--seq", type=int, help="just after this journal entry")
+        point.add_argument("--at", type=date_argument, help="at this UTC time, 'YYYY-MM-DD[ HH:MM:SS]'")
+    actions.add_parser("checkpoint", help="snapshot the ledger now, so replays start from here")
+    journal.set_defaults(handler=cmd_journal)
+
+    archives = commands.add_parser("archive", help="move closed years out of the database into read-only yearly files")
+    archives.add_argument("--before", type=int, help="archive years before this one (default: the current year)")
+    archives.add_argument("--list", action="store_true", help="list the archived years instead")
+    archives.set_defaults(handler=cmd_archive)
+
+    search = commands.add_parser("search", help="find expenses and income by name, best match first")
+    search.add_argument("text", help="words to find; each matches as a prefix, e.g. 'cof sho' finds 'Coffee Shop'")
+    search.add_argument("--kind", choices=["expenses", "income"], help="search only one kind (default: both)")
+    search.add_argument("--category", help="only expenses in this category")
+    search.add_argument(
+        "--limit", type=int, default=database.SEARCH_LIMIT,
+        help=f"most matches of each kind (default: {database.SEARCH_LIMIT})",
+    )
+    add_period_arguments(search)
+    search.set_defaults(handler=cmd_search)
+
+    plot = commands.add_parser("plot", help="render a chart to an image file")
+    plot.add_argument("chart", choices=graphs.CHART_TYPES)
+    plot.add_argument("-o", "--output", help="file to write (default: a path in the chart cache)")
+    plot.add_argument("--format", choices=graphs.CHART_FORMATS, default="png")
+    plot.add_argument("--resolution", choices=["day", "week", "month"], default="day")
+    add_period_arguments(plot)
+    plot.set_defaults(handler=cmd_plot)
+
+    forecast = commands.add_parser("forecast", help="forecast weekly spending per category")
+    forecast.add_argument("--weeks", type=int, default=4, help="weeks to forecast (default: 4)")
+    forecast.set_defaults(handler=cmd_forecast)
+
+    anomalies = commands.add_parser("anomalies", help="list unusually large or small expenses for their category")
+    anomalies.add_argument(
+        "--all", action="store_true", help="score every expense, not just those added since the last run"
+    )
+    anomalies.add_argument("--threshold", type=float, default=3.5, help="robust z-score cut-off (default: 3.5)")
+    anomalies.set_defaults(handler=cmd_anomalies)
+    return parser
+
+def main(argv=None) -> int:
+    """Parses arguments, runs the chosen command and returns its exit code"""
+    args = build_parser().parse_args(argv)
+    if args.db:
+        database.configure(args.db)
+    if args.profile or args.pstats:
+        import instrumentation
+        instrumentation.enable(profile_path=args.pstats)
+    try:
+        code = args.handler(args)
+        database.checkpoint() # Snapshot the ledger if enough has changed since the last snapshot
+        return code
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import stat
+from pathlib import Path
+from database.migrations import backfill_rollups, create_rollup_tables, create_search_index
+
+"""
+Yearly archive files: read-only SQLite files holding one closed year's expenses and
+income with its rollups and search index precomputed. They are attached to a connection, read-only,
+only when a query's date range reaches into their year.
+"""
+
+ARCHIVES_ATTACHED = 8 # Archives a connection keeps attached at once (SQLite's default limit is 10 databases)
+
+
+def folder(db_path) -> str:
+    """Folder the archives of the database at `db_path` are written to, e.g. expenses-archive/"""
+    return f"{os.path.splitext(db_path)[0]}-archive"
+
+def file_name(year, generation) -> str:
+    """Archive file name for a year; archiving the year again writes the next generation"""
+    return f"{year}.db" if generation == 1 else f"{year}.{generation}.db"
+
+def schema(year) -> str:
+    """Name an archive is attached under"""
+    return f"archive_{year}"
+
+def year_range(year) -> tuple[str, str]:
+    """The [start, end) bounds of a year as stored dates"""
+    return f"{year:04d}-01-01 00:00:00", f"{year + 1:04d}-01-01 00:00:00"
+
+def overlaps(year, start, end) -> bool:
+    """True if a year overlaps the [start, end) range of stored dates (None is unbounded)"""
+    first, last = year_range(year)
+    return (start is None or start < last) and (end is None or end > first)
+
+def read_only_uri(path) -> str:
+    """URI that opens an archive read-only"""
+    return f"{Path(os.path.abspath(path)).as_uri()}?mode=ro" # file:///C:/... on Windows
+
+def write(path, db_path, year, previous=None) -> tuple[int, int]:
+    """
+    Writes a new archive at `path` holding the year's rows from the database at
+    `db_path` (committed ones only), plus those of the `previous` archive of that year,
+    with its rollups precomputed, and makes the file read-only.
+    Returns (expenses, income entries) archived
+    """
+    first, last = year_range(year)
+    connection = sqlite3.connect(path, uri=True) # uri lets the sources be attached read-only
+    try:
+        connection.execute("""
+        CREATE TABLE expenses (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount_pence INTEGER NOT NULL,
+            date TEXT,
+            content_hash TEXT
+        )
+        """)
+        connection.execute("""
+        CREATE TABLE income (
+            id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            amount_pence INTEGER NOT NULL,
+            date TEXT,
+            content_hash TEXT
+        )
+        """)
+        connection.execute("ATTACH DATABASE ? AS live", (read_only_uri(db_path),))
+        sources = ["live"]
+        if previous is not None:
+            connection.execute("ATTACH DATABASE ? AS previous", (read_only_uri(previous),))
+            sources.append("previous")
+        for source in sources:
+            connection.execute(
+                "INSERT INTO expenses SELECT id, name, category, amount_pence, date, content_hash"
+                f" FROM {source}.expenses WHERE date >= ? AND date < ?",
+                (first, last),
+            )
+            connection.execute(
+                f"INSERT INTO income SELECT id, description, amount_pence, date, content_hash FROM {source}.income"
+                " WHERE date >= ? AND date < ?", (first, last)
+            )
+        connection.execute("CREATE INDEX idx_expenses_date ON expenses (date)")
+        connection.execute("CREATE INDEX idx_expenses_category_date ON expenses (category, date)")
+        connection.execute("CREATE INDEX idx_income_date ON income (date)")
+        connection.execute("CREATE INDEX idx_expenses_content_hash ON expenses (content_hash)")
+        connection.execute("CREATE INDEX idx_income_content_hash ON income (content_hash)")
+        create_rollup_tables(connection)
+        backfill_rollups(connection)
+        create_search_index(connection)
+        counts = connection.execute("SELECT (SELECT COUNT(*) FROM expenses), (SELECT COUNT(*) FROM income)").fetchone()
+        connection.commit()
+        for source in sources:
+            connection.execute(f"DETACH DATABASE {source}")
+    finally:
+        connection.close()
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    return counts
+
+def attach(connection, year, path) -> str | None:
+    """
+    Attaches a year's archive read-only to `connection`, unless it already is, and
+    returns the schema name to query it under. A stale attachment (an older generation)
+    is replaced, and once ARCHIVES_ATTACHED archives are attached the first is detached.
+    SQLite can't detach a database read in an open transaction, so when that would be
+    needed while `connection` is in one, nothing is attached and None is returned.
+    """
+    name = schema(year)
+    attached = {database: file for _, database, file in connection.execute("PRAGMA database_list")}
+    if attached.get(name) == os.path.abspath(path):
+        return name
+    archives = [database for database in attached if database.startswith("archive_")]
+    detach = name if name in attached else archives[0] if len(archives) >= ARCHIVES_ATTACHED else None
+    if detach is not None:
+        if connection.in_transaction:
+            return None
+        connection.execute(f"DETACH DATABASE {detach}")
+    connection.execute(f"ATTACH DATABASE ? AS {name}", (read_only_uri(path),))
+    return name
+
+def open_read_only(path) -> sqlite3.Connection:
+    """Opens an archive read-only on a connection of its own"""
+    return sqlite3.connect(read_only_uri(path), uri=True)
+
+def remove(connection, year, path) -> None:
+    """
+    Deletes an archive file, first detaching it from `connection` if it is attached
+    and making it writable again, as Windows won't delete an open or read-only file
+    """
+    name = schema(year)
+    attached = {database: file for _, database, file in connection.execute("PRAGMA database_list")}
+    if attached.get(name) == os.path.abspath(path):
+        connection.execute(f"DETACH DATABASE {name}")
+    os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.remove(path)
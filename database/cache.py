@@ -0,0 +1,99 @@
+import threading
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+
+"""Size-bounded LRU cache for read query results, invalidated by table"""
+
+MISSING = object() # Returned by QueryCache.get when a key is not cached
+
+
+class CacheInfo(NamedTuple):
+    """Counters describing how well the query cache is doing"""
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    size: int
+    maxsize: int
+
+
+class QueryCache:
+    """
+    Maps query keys to results, remembering which tables each result was read
+    from so a write can drop just the entries it affects. Once `maxsize` entries
+    are held, the least recently used one is evicted. A maxsize of 0 disables caching.
+    Safe to share between threads: each table has a generation, bumped whenever it is
+    invalidated, so a result computed while a write landed is not cached afterwards.
+    """
+
+    def __init__(self, maxsize=128) -> None:
+        """Creates an empty cache holding at most `maxsize` results"""
+        self.maxsize = maxsize
+        self._entries = OrderedDict() # key -> (tables, result), least recently used first
+        self._lock = threading.Lock()
+        self._generations = Counter() # table -> times invalidated
+        self._clears = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached result for `key`, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, tables) -> tuple:
+        """Returns a token that changes whenever any of `tables` is invalidated; read it before computing a result"""
+        with self._lock:
+            return self._generation(tables)
+
+    def _generation(self, tables) -> tuple:
+        """generation() without taking the lock"""
+        return (self._clears, *(self._generations[table] for table in sorted(tables)))
+
+    def put(self, key, tables, result, generation=None) -> None:
+        """
+        Caches `result`, read from `tables`, under `key`. If `generation` (from generation(),
+        read before the result was computed) is out of date, the result may be stale and is dropped
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                return
+            self._entries[key] = (frozenset(tables), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tables) -> int:
+        """Drops every result read from any of `tables`; returns how many were dropped"""
+        with self._lock:
+            self._generations.update(tables)
+            stale = [key for key, (read_from, _) in self._entries.items() if not read_from.isdisjoint(tables)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        """Drops every cached result"""
+        with self._lock:
+            self._clears += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        """Returns the current hit/miss/eviction counters and size"""
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, self.invalidations, len(self._entries), self.maxsize
+            )
+
+    def __repr__(self) -> str:
+        return f"QueryCache(size={len(self._entries)}, maxsize={self.maxsize})"
@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+from database.migrations import migrate
+
+"""Connection factory and per-thread connection pool for the expenses database"""
+
+# Applied to every new connection. WAL lets readers carry on while a write is
+# in progress, and synchronous=NORMAL is durable in WAL mode while only
+# syncing at checkpoints rather than on every commit.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000, # Negative means KiB, so about 32 MB of page cache
+    "mmap_size": 268435456, # Memory-map up to 256 MB of the file
+    "temp_store": "MEMORY",
+}
+
+
+def connect(path) -> sqlite3.Connection:
+    """
+    Opens a connection to the database at `path` with the tuned pragmas applied.
+    The connection may be closed from any thread but should only be used by one.
+    """
+    connection = sqlite3.connect(path, check_same_thread=False, uri=True) # uri lets archives be attached read-only
+    for pragma, value in PRAGMAS.items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
+    return connection
+
+
+class ConnectionPool:
+    """
+    Hands each thread its own connection to one database file, so reports can
+    read while another thread is inserting. Each new connection checks the
+    schema version, so the first one opened migrates the file.
+    """
+
+    def __init__(self, path) -> None:
+        """Creates a pool for the database at `path`; no connection is opened yet"""
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it on first use"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.path)
+            with self._lock:
+                migrate(connection)
+                self._connections.append(connection)
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        """Closes every connection the pool has opened"""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+            self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"ConnectionPool(path={self.path!r}, open={len(self._connections)})"
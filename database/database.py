@@ -1,87 +1,940 @@
+import functools
+import heapq
+import itertools
+import os
+import re
+import shutil
 import sqlite3
-from models.expense import Expense
-from models.income import Income
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import Iterable, Iterator
+from models.expense import Expense, ExpenseBatch, ExpenseRecord
+from models.income import Income, IncomeRecord
+from database.cache import MISSING, CacheInfo, QueryCache
+from database.connection import ConnectionPool, connect
+from database import archive, journal
+from database.journal import JournalEntry
+from database.migrations import bulk_insert_statements, content_hash, migrate
 
 """Database for managing expenses and income using SQLite"""
 
-expense_db = sqlite3.connect('expenses.db') # Connect to SQLite database 
-expense_cursor = expense_db.cursor() #  Create a cursor object
-
-expense_cursor.execute(""" 
-CREATE TABLE IF NOT EXISTS expenses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    category TEXT NOT NULL,
-    amount REAL NOT NULL,
-    date TEXT DEFAULT CURRENT_TIMESTAMP
-)
-""") # Create expenses table if it doesn't exist
-
-expense_cursor.execute("""
-CREATE TABLE IF NOT EXISTS income (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    description TEXT NOT NULL,
-    amount REAL NOT NULL,
-    date TEXT DEFAULT CURRENT_TIMESTAMP
-)
-""") # Create income table if it doesn't exist
-expense_db.commit() # Commit changes
+# The database file can be overridden with the EXPENSE_TRACKER_DB environment variable
+DEFAULT_DB_PATH = os.environ.get("EXPENSE_TRACKER_DB", "expenses.db")
+
+# Results of read queries are cached in memory, up to this many (0 turns caching off)
+QUERY_CACHE_SIZE = int(os.environ.get("EXPENSE_TRACKER_QUERY_CACHE", "128"))
+
+_pool = ConnectionPool(DEFAULT_DB_PATH) # Connections are opened lazily, one per thread
+_state = threading.local() # Per-thread transaction() nesting depth and tables it has written
+_cache = QueryCache(QUERY_CACHE_SIZE)
+
+
+def configure(path) -> None:
+    """Points the module at a different database file, closing any open connections"""
+    global _pool
+    _pool.close()
+    _pool = ConnectionPool(path)
+    _cache.clear()
+
+def get_db_path() -> str:
+    """Returns the path of the database file currently in use"""
+    return _pool.path
+
+def get_connection() -> sqlite3.Connection:
+    """Returns this thread's connection to the configured database"""
+    return _pool.connection()
+
+def cache_info() -> CacheInfo:
+    """Returns the query cache's hit/miss/eviction/invalidation counters and size"""
+    return _cache.info()
+
+def clear_cache() -> None:
+    """Drops every cached query result"""
+    _cache.clear()
+
+def _check_external_writes() -> None:
+    """
+    Clears the query cache if another connection (another thread, or another process
+    such as a scripted import) has committed since this thread's connection last looked.
+    PRAGMA data_version only changes for other connections' commits, so it costs no table read.
+    """
+    connection = get_connection()
+    version = connection.execute("PRAGMA data_version").fetchone()[0]
+    seen = getattr(_state, "data_version", None)
+    if seen is not None and seen[0] is connection and seen[1] != version:
+        _cache.clear()
+    _state.data_version = (connection, version)
+
+def cached(*tables):
+    """
+    Memoizes a read query until a write to one of `tables` invalidates it.
+    Lists are copied on the way out so callers can't change the cached result.
+    While this thread has uncommitted writes the cache is bypassed, as its reads see
+    rows other threads can't, and which may yet be rolled back.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if get_connection().in_transaction:
+                return function(*args, **kwargs)
+            _check_external_writes()
+            key = (function.__name__, args, tuple(sorted(kwargs.items())))
+            result = _cache.get(key)
+            if result is MISSING:
+                generation = _cache.generation(tables)
+                result = function(*args, **kwargs)
+                _cache.put(key, tables, result, generation)
+            return list(result) if isinstance(result, list) else result
+        return wrapper
+    return decorator
+
+def _changed(*tables) -> None:
+    """
+    Drops cached reads of `tables` after a write. Inside a transaction() block they
+    are dropped again when it commits or rolls back, as other threads may have cached reads made meanwhile.
+    """
+    _cache.invalidate(*tables)
+    if getattr(_state, "depth", 0):
+        _state.written = getattr(_state, "written", set()) | set(tables)
+
+def _invalidate_written() -> None:
+    """Drops cached reads of every table written in the transaction that just ended"""
+    _cache.invalidate(*getattr(_state, "written", ()))
+    _state.written = set()
+
+def _archived_years(start=None, end=None) -> list[tuple[int, str]]:
+    """(year, file path) of every archive overlapping a [start, end) range, oldest first"""
+    start = _format_timestamp(start) if start is not None else None
+    end = _format_timestamp(end) if end is not None else None
+    folder = os.path.dirname(os.path.abspath(get_db_path()))
+    rows = get_connection().execute("SELECT year, path FROM archives ORDER BY year").fetchall()
+    return [(year, os.path.join(folder, path)) for year, path in rows if archive.overlaps(year, start, end)]
+
+def _archive_sources(archives) -> Iterator[tuple[sqlite3.Connection, str]]:
+    """
+    Yields (connection, schema) to query each of the (year, path) archives under, attaching
+    them to this thread's connection on demand. Archives that can't be attached because the
+    connection is in a transaction are read through a short-lived connection of their own,
+    closed once the next source is asked for, so each must be read fully before then.
+    """
+    connection = get_connection()
+    for year, path in archives:
+        schema = archive.attach(connection, year, path)
+        if schema is not None:
+            yield connection, schema
+            continue
+        reader = archive.open_read_only(path)
+        try:
+            yield reader, "main"
+        finally:
+            reader.close()
+
+def _sources(start=None, end=None) -> Iterator[tuple[sqlite3.Connection, str]]:
+    """
+    Yields (connection, schema) for each place holding rows dated in a [start, end) range:
+    the archive of each closed year it overlaps (oldest first), then the live "main" file
+    """
+    yield from _archive_sources(_archived_years(start, end))
+    yield get_connection(), "main"
+
+def query_sources(sql, params=(), start=None, end=None) -> Iterator[sqlite3.Cursor]:
+    """
+    Runs `sql`, with {schema} standing for the schema to read, against the live file and
+    every yearly archive holding rows dated in a [start, end) range, oldest first, yielding
+    a cursor for each. Each cursor must be read fully before the next one is asked for.
+    """
+    for connection, schema in _sources(start, end):
+        cursor = connection.execute(sql.format(schema=schema), params)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+def _merge_totals(results) -> list[tuple]:
+    """
+    Adds up (key, value, ...) rows from several sources by key, returning them in key
+    order with NULL first, as ORDER BY would. A single source is returned as it is.
+    """
+    results = list(results)
+    if len(results) == 1:
+        return results[0]
+    totals = {}
+    for rows in results:
+        for key, *values in rows:
+            totals[key] = [a + b for a, b in zip(totals[key], values)] if key in totals else values
+    ordered = sorted(totals.items(), key=lambda item: (item[0] is not None, item[0] or "")) # None (uncategorised) first
+    return [(key, *values) for key, values in ordered]
+
+def _merge_by_date(results, limit=None) -> list[tuple]:
+    """Merges (id, ..., date) rows from several sources, each in date and id order, keeping that order"""
+    results = list(results)
+    rows = results[0] if len(results) == 1 else heapq.merge(*results, key=lambda row: (row[-1] or "", row[0]))
+    return list(itertools.islice(rows, limit))
+
+
+BATCH_SIZE = 500 # Rows fetched per page by the iter_* functions
+BULK_CHUNK_SIZE = 1000 # Rows per executemany call in the *_bulk functions
+SEARCH_LIMIT = 50 # Most matches a search returns unless asked for more
+# Searches matching more rows than this list them newest first instead of ranking them:
+# bm25 costs a few microseconds per match and tells little apart among so many
+RANK_LIMIT = 10_000
+EXPORT_BATCH_SIZE = 5000 # Rows per fetchmany call when streaming an export
+
+# Amounts are stored as integer pence and converted back to pounds on read
+EXPENSE_COLUMNS = "id, name, category, amount_pence / 100.0, date"
+INCOME_COLUMNS = "id, description, amount_pence / 100.0, date"
+
+INSERT_EXPENSE = "INSERT INTO expenses (name, category, amount_pence, date, content_hash) VALUES (?, ?, ?, ?, ?)"
+INSERT_INCOME = "INSERT INTO income (description, amount_pence, date, content_hash) VALUES (?, ?, ?, ?)"
+BULK_INSERT_STATEMENTS = {table: bulk_insert_statements(table) for table in ["expenses", "income"]}
+
+
+def parse_timestamp(value) -> datetime | None:
+    """Converts a stored 'YYYY-MM-DD HH:MM:SS' date column into a datetime"""
+    return datetime.fromisoformat(value) if value else None
+
+def _to_pence(amount) -> int:
+    """Converts an amount in pounds to whole pence"""
+    return round(float(amount) * 100)
+
+def _format_timestamp(value) -> str:
+    """Converts a datetime/date (or an ISO date string) into the stored 'YYYY-MM-DD HH:MM:SS' format"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+def _filters(start=None, end=None, category=None, min_amount=None, max_amount=None) -> tuple[list[str], list]:
+    """Builds WHERE conditions for an optional [start, end) date range, category and [min, max] amount range"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(_format_timestamp(start))
+    if end is not None:
+        conditions.append("date < ?")
+        params.append(_format_timestamp(end))
+    if category is not None:
+        conditions.append("category = ?")
+        params.append(category)
+    if min_amount is not None:
+        conditions.append("amount_pence >= ?")
+        params.append(_to_pence(min_amount))
+    if max_amount is not None:
+        conditions.append("amount_pence <= ?")
+        params.append(_to_pence(max_amount))
+    return conditions, params
+
+def _where(conditions) -> str:
+    """Joins WHERE conditions into a clause, or returns '' when there are none"""
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+def _iter_pages(select, conditions, params, limit, batch_size) -> Iterator[tuple]:
+    """
+    Yields rows of `select` in id order using keyset pagination, so only
+    one batch is ever held in memory and each page is an index seek on id
+    """
+    where = "".join(f" AND {condition}" for condition in conditions)
+    last_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        rows = get_connection().execute(
+            f"{select} WHERE id > ?{where} ORDER BY id LIMIT ?", (last_id, *params, size)
+        ).fetchall()
+        yield from rows
+        if len(rows) < size:
+            return
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+@contextmanager
+def transaction() -> Iterator[None]:
+    """
+    Groups every write made inside the block into one transaction, committed
+    once when the outermost block exits and rolled back if it raises.
+    Nested blocks join the enclosing transaction. Each thread has its own transactions.
+    """
+    depth = getattr(_state, "depth", 0)
+    _state.depth = depth + 1
+    try:
+        yield
+    except BaseException:
+        _state.depth = depth
+        if depth == 0:
+            get_connection().rollback()
+            _invalidate_written()
+        raise
+    _state.depth = depth
+    if depth == 0:
+        get_connection().commit()
+        _invalidate_written()
+
+def _commit() -> None:
+    """Commits the current write unless it is part of an open transaction() block"""
+    if getattr(_state, "depth", 0) == 0:
+        get_connection().commit()
+
+def _insert_many(table, sql, rows, chunk_size) -> int:
+    """
+    Inserts rows into `table` with executemany, `chunk_size` at a time, in a single transaction.
+    The per-row insert triggers are switched off meanwhile: after each chunk its rollups,
+    data version, search index and journal entries are written set-based instead.
+    """
+    connection = get_connection()
+    count = 0
+    with transaction():
+        connection.execute("UPDATE bulk_load SET active = 1")
+        try:
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                after = connection.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                try:
+                    connection.executemany(sql, chunk)
+                finally: # Also covers the rows inserted before a failing one
+                    for statement in BULK_INSERT_STATEMENTS[table]:
+                        connection.execute(statement, {"after": after})
+                count += len(chunk)
+        finally:
+            connection.execute("UPDATE bulk_load SET active = 0")
+    return count
+
+def _skip_existing(rows, table, chunk_size) -> Iterator[tuple]:
+    """
+    Drops rows (whose last two values are the stored date and the content hash) that
+    are already in `table`, in the live file or in the archive of the row's year.
+    Copies are counted, so a file holding the same transaction twice still adds
+    the second copy when the table only has one. Each hash is looked up once,
+    through the content hash index, the first time it is seen.
+    """
+    archived = dict(_archived_years())
+    stored = Counter() # Copies of each hash stored before this call added any
+    looked_up = set()
+    seen = Counter()
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        new = list({row[-1] for row in chunk}.difference(looked_up))
+        looked_up.update(new)
+        years = sorted({int(row[-2][:4]) for row in chunk}.intersection(archived))
+        for start in range(0, len(new), 500): # Stay well under SQLite's bound-parameter limit
+            batch = new[start:start + 500]
+            archives = _archive_sources((year, archived[year]) for year in years)
+            for connection, schema in itertools.chain(archives, [(get_connection(), "main")]):
+                stored.update(dict(connection.execute(
+                    f"SELECT content_hash, COUNT(*) FROM {schema}.{table}"
+                    f" WHERE content_hash IN ({', '.join('?' * len(batch))}) GROUP BY content_hash",
+                    batch,
+                )))
+        for row in chunk:
+            seen[row[-1]] += 1
+            if seen[row[-1]] > stored[row[-1]]:
+                yield row
+
+def _check_not_archived(table, row_id) -> None:
+    """Raises ValueError if the row with `row_id` has been moved into a (read-only) yearly archive"""
+    for year, path in _archived_years():
+        for connection, schema in _archive_sources([(year, path)]):
+            if connection.execute(f"SELECT 1 FROM {schema}.{table} WHERE id = ?", (row_id,)).fetchone():
+                raise ValueError(f"it is in the read-only {year} archive")
+
+def _timestamp_or_now(value, now=None) -> str:
+    """
+    Formats a date for storage. When it is None, returns the already formatted `now`,
+    or the current UTC time (as CURRENT_TIMESTAMP would) if that isn't given either
+    """
+    if value is None:
+        if now is not None:
+            return now
+        value = datetime.now(timezone.utc).replace(tzinfo=None)
+    return _format_timestamp(value)
+
+def _expense_row(expense, now=None) -> tuple:
+    """Builds the INSERT_EXPENSE parameters for an expense, dated `now` (default the current time) if it has no date"""
+    date = _timestamp_or_now(getattr(expense, "date", None), now)
+    pence = _to_pence(expense.amount)
+    return (expense.name, expense.category, pence, date, content_hash(date, pence, expense.name))
+
+def _hashed_expense_rows(rows) -> Iterator[tuple]:
+    """Adds the content hash to stored-form (name, category, amount_pence, date) expense rows"""
+    return ((name, category, pence, date, content_hash(date, pence, name)) for name, category, pence, date in rows)
+
+def _income_row(description, amount, date=None, now=None) -> tuple:
+    """Builds the INSERT_INCOME parameters for an income entry, dated `now` (default: the current time) if undated"""
+    date = _timestamp_or_now(date, now)
+    pence = _to_pence(amount)
+    return (description, pence, date, content_hash(date, pence, description))
 
 
 def add_expense(expense) -> None:
-    """Adds a new expense to the database"""
-    expense_cursor.execute("""
-        INSERT INTO expenses (name, category, amount) VALUES (?, ?, ?)
-    """, (expense.name, expense.category, expense.amount))
-    expense_db.commit()
-
-def get_all_expenses() -> list[str]:
-    """Retrieves all expenses from the database"""
-    expense_cursor.execute("SELECT * FROM expenses")
-    rows = expense_cursor.fetchall()
-    formatted = []
-    for row in rows:
-        formatted.append(f"{row[0]}: {row[1]} ({row[2]}) - £{row[3]:.2f} on [{row[4]}]")
-    return formatted
+    """Adds a new expense to the database, dated now unless the expense has a date"""
+    get_connection().execute(INSERT_EXPENSE, _expense_row(expense))
+    _commit()
+    _changed("expenses")
+
+def add_expenses_bulk(expenses: Iterable, chunk_size=BULK_CHUNK_SIZE, skip_duplicates=False) -> int:
+    """
+    Adds many expenses in one transaction using executemany.
+    Items need name, category and amount; an optional date is kept, otherwise the current time is used.
+    An ExpenseBatch is read column-wise, without creating an object per expense.
+    With skip_duplicates, expenses whose date, amount and name are already stored are left out.
+    Returns the number of expenses added
+    """
+    now = _timestamp_or_now(None) # Undated items are all dated when the call started
+    if isinstance(expenses, ExpenseBatch):
+        rows = _hashed_expense_rows(expenses.rows(now))
+    else:
+        rows = (_expense_row(expense, now) for expense in expenses)
+    if skip_duplicates:
+        rows = _skip_existing(rows, "expenses", chunk_size)
+    count = _insert_many("expenses", INSERT_EXPENSE, rows, chunk_size)
+    if count:
+        _changed("expenses")
+    return count
+
+def get_all_expenses() -> list[ExpenseRecord]:
+    """Retrieves all expenses from the database. Not cached, so a large ledger isn't kept in memory"""
+    rows = get_connection().execute(f"SELECT {EXPENSE_COLUMNS} FROM expenses").fetchall()
+    return [
+        ExpenseRecord(row_id, name, category, amount, parse_timestamp(date))
+        for row_id, name, category, amount, date in rows
+    ]
+
+def iter_expenses(start=None, end=None, category=None, limit=None, batch_size=BATCH_SIZE) -> Iterator[ExpenseRecord]:
+    """
+    Streams expenses in id order, fetching `batch_size` rows at a time.
+    Optionally filters by a [start, end) date range and category and stops after `limit` rows.
+    """
+    conditions, params = _filters(start, end, category)
+    rows = _iter_pages(f"SELECT {EXPENSE_COLUMNS} FROM expenses", conditions, params, limit, batch_size)
+    for row_id, name, category, amount, when in rows:
+        yield ExpenseRecord(row_id, name, category, amount, parse_timestamp(when))
 
 def remove_expense(expense_id) -> None:
-    """Removes an expense by its ID"""
-    expense_cursor.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
-    expense_db.commit()
-
-def summarise_expenses() -> list[tuple[str, float]]:
-    """Returns a summary of expenses grouped by category"""
-    expense_cursor.execute("SELECT category, SUM(amount) FROM expenses GROUP BY category")
-    return expense_cursor.fetchall()
-
-
-def add_income(description, amount) -> None:
-    """Adds a new income entry to the database"""
-    expense_cursor.execute("""
-        INSERT INTO income (description, amount) VALUES (?, ?)
-    """, (description, amount))
-    expense_db.commit()
-
-def get_all_income() -> list[str]:
-    """Retrieves all income entries from the database"""
-    expense_cursor.execute("SELECT * FROM income")
-    rows = expense_cursor.fetchall()
-    formatted = []
-    for row in rows:
-        formatted.append(f"{row[0]}: {row[1]} - £{row[2]:.2f} on [{row[3]}]")
-    return formatted
+    """Removes an expense by its ID. Raises ValueError if it has been archived, as archives are read-only"""
+    if get_connection().execute("DELETE FROM expenses WHERE id = ?", (expense_id,)).rowcount == 0:
+        _check_not_archived("expenses", expense_id)
+    _commit()
+    _changed("expenses")
+
+@cached("expenses")
+def summarise_expenses(start=None, end=None) -> list[tuple[str, float]]:
+    """
+    Returns a summary of expenses grouped by category, read from the category rollup,
+    or for an optional [start, end) period, aggregated from just that period's rows
+    """
+    if start is None and end is None:
+        totals = _merge_totals(
+            connection.execute(
+                f"SELECT category, total_pence FROM {schema}.category_totals ORDER BY category"
+            ).fetchall()
+            for connection, schema in _sources()
+        )
+        return [(category, pence / 100) for category, pence in totals]
+    return [(category, total) for category, total, _ in aggregate_expenses("category", start, end)]
+
+
+def add_income(description, amount, date=None) -> None:
+    """
+    Adds a new income entry to the database, dated now unless a date is given.
+    Raises ValueError for an amount or date the Income model rejects
+    """
+    income = Income(description, amount, date)
+    get_connection().execute(INSERT_INCOME, _income_row(income.description, income.amount, income.date))
+    _commit()
+    _changed("income")
+
+def add_income_bulk(income: Iterable, chunk_size=BULK_CHUNK_SIZE, skip_duplicates=False) -> int:
+    """
+    Adds many income entries in one transaction using executemany.
+    Items need description and amount; an optional date is kept, otherwise the current time is used.
+    With skip_duplicates, entries whose date, amount and description are already stored are left out.
+    Returns the number of entries added
+    """
+    now = _timestamp_or_now(None) # Undated entries are all dated when the call started
+    rows = (_income_row(entry.description, entry.amount, getattr(entry, "date", None), now) for entry in income)
+    if skip_duplicates:
+        rows = _skip_existing(rows, "income", chunk_size)
+    count = _insert_many("income", INSERT_INCOME, rows, chunk_size)
+    if count:
+        _changed("income")
+    return count
+
+def get_all_income() -> list[IncomeRecord]:
+    """Retrieves all income entries from the database. Not cached, so a large ledger isn't kept in memory"""
+    rows = get_connection().execute(f"SELECT {INCOME_COLUMNS} FROM income").fetchall()
+    return [
+        IncomeRecord(row_id, description, amount, parse_timestamp(date))
+        for row_id, description, amount, date in rows
+    ]
+
+def iter_income(start=None, end=None, limit=None, batch_size=BATCH_SIZE) -> Iterator[IncomeRecord]:
+    """
+    Streams income entries in id order, fetching `batch_size` rows at a time.
+    Optionally filters by a [start, end) date range and stops after `limit` rows.
+    """
+    conditions, params = _filters(start, end)
+    rows = _iter_pages(f"SELECT {INCOME_COLUMNS} FROM income", conditions, params, limit, batch_size)
+    for row_id, description, amount, when in rows:
+        yield IncomeRecord(row_id, description, amount, parse_timestamp(when))
 
 def remove_income(income_id) -> None:
-    """Removes an income entry by its ID"""
-    expense_cursor.execute("DELETE FROM income WHERE id = ?", (income_id,))
-    expense_db.commit()
+    """Removes an income entry by its ID. Raises ValueError if it has been archived, as archives are read-only"""
+    if get_connection().execute("DELETE FROM income WHERE id = ?", (income_id,)).rowcount == 0:
+        _check_not_archived("income", income_id)
+    _commit()
+    _changed("income")
+
+@cached("income")
+def get_total_income(start=None, end=None) -> float:
+    """Returns the total income amount, optionally for a [start, end) period only"""
+    if start is None and end is None:
+        total = sum(
+            connection.execute(
+                f"SELECT COALESCE(SUM(income_pence), 0) FROM {schema}.monthly_totals"
+            ).fetchone()[0]
+            for connection, schema in _sources()
+        )
+        return total / 100 if total else 0.0
+    return sum(total for _, total, _ in aggregate_income("month", start, end))
+
+
+def load_rows(kind, rows: Iterable, chunk_size=BULK_CHUNK_SIZE) -> int:
+    """
+    Bulk loads rows that are already in stored form, without building model objects:
+    expenses as (name, category, amount_pence, 'YYYY-MM-DD HH:MM:SS') and income as
+    (description, amount_pence, 'YYYY-MM-DD HH:MM:SS'). Content hashes are added here.
+    Returns the number of rows added
+    """
+    if kind == "expenses":
+        count = _insert_many("expenses", INSERT_EXPENSE, _hashed_expense_rows(rows), chunk_size)
+    elif kind == "income":
+        rows = ((description, pence, date, content_hash(date, pence, description)) for description, pence, date in rows)
+        count = _insert_many("income", INSERT_INCOME, rows, chunk_size)
+    else:
+        raise ValueError(f"Unknown kind '{kind}', expected 'expenses' or 'income'")
+    if count:
+        _changed(kind)
+    return count
+
+
+@cached("expenses", "income")
+def get_daily_totals(start=None, end=None) -> list[tuple[date, float, float]]:
+    """
+    Returns (day, expenses, income) for every day with transactions, oldest first,
+    optionally only for the days from `start` up to but not including `end`
+    """
+    conditions, params = _day_filters(start, end)
+    rows = _merge_totals(
+        connection.execute(
+            f"SELECT day, expense_pence, income_pence FROM {schema}.daily_totals{_where(conditions)} ORDER BY day",
+            params,
+        ).fetchall()
+        for connection, schema in _sources(start, end)
+    )
+    return [(date.fromisoformat(day), expense / 100, income / 100) for day, expense, income in rows]
+
+@cached("expenses", "income")
+def get_monthly_totals() -> list[tuple[str, float, float]]:
+    """Returns ('YYYY-MM', expenses, income) for every month with transactions, oldest first"""
+    rows = _merge_totals(
+        connection.execute(
+            f"SELECT month, expense_pence, income_pence FROM {schema}.monthly_totals ORDER BY month"
+        ).fetchall()
+        for connection, schema in _sources()
+    )
+    return [(month, expense / 100, income / 100) for month, expense, income in rows]
+
+def get_data_version() -> int:
+    """Returns a counter that changes whenever any expense or income row is added, removed or edited"""
+    return get_connection().execute("SELECT version FROM data_version").fetchone()[0]
+
+def iter_export_batches(
+    kind, start=None, end=None, category=None, batch_size=EXPORT_BATCH_SIZE, formatted=True
+) -> Iterator[list[tuple]]:
+    """
+    Streams rows for an export straight from one cursor, `batch_size` rows at a time.
+    Expenses come as (id, name, category, amount, date), income as (id, description, amount, date),
+    with amounts as '12.50' strings ready for CSV, or as integer pence when not `formatted`.
+    Optionally filters by a [start, end) date range and, for expenses, category.
+    """
+    amount = "printf('%.2f', amount_pence / 100.0)" if formatted else "amount_pence"
+    if kind == "expenses":
+        select = f"SELECT id, name, category, {amount}, date FROM {{schema}}.expenses"
+    elif kind == "income":
+        if category is not None:
+            raise ValueError("Income entries have no category to filter on")
+        select = f"SELECT id, description, {amount}, date FROM {{schema}}.income"
+    else:
+        raise ValueError(f"Unknown export kind '{kind}', expected 'expenses' or 'income'")
+    conditions, params = _filters(start, end, category)
+    for connection, schema in _sources(start, end): # Archived years first, each in id order
+        cursor = connection.execute(f"{select.format(schema=schema)}{_where(conditions)} ORDER BY id", params)
+        try:
+            while batch := cursor.fetchmany(batch_size):
+                yield batch
+        finally:
+            cursor.close()
+
+@cached("expenses")
+def get_categories() -> list[str]:
+    """Returns every category that has expenses, alphabetically"""
+    categories = set()
+    for connection, schema in _sources():
+        rows = connection.execute(f"SELECT category FROM {schema}.category_totals")
+        categories.update(category for (category,) in rows)
+    return sorted(categories)
+
+
+# How each grouping is computed from a row's 'YYYY-MM-DD HH:MM:SS' date (or category).
+# Weeks are keyed by the Monday they start on.
+GROUPINGS = {
+    "day": "substr({date}, 1, 10)",
+    "week": "date({date}, '-6 days', 'weekday 1')",
+    "month": "substr({date}, 1, 7)",
+    "category": "category",
+}
+
+def _day_filters(start=None, end=None) -> tuple[list[str], list]:
+    """Builds WHERE conditions on the rollup tables' 'YYYY-MM-DD' day column for a [start, end) range"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("day >= ?")
+        params.append(_format_timestamp(start)[:10])
+    if end is not None:
+        conditions.append("day < ?")
+        params.append(_format_timestamp(end)[:10])
+    return conditions, params
+
+def _is_whole_day(value) -> bool:
+    """True if `value` is absent or falls exactly on midnight, so daily rollups cover the range exactly"""
+    return value is None or _format_timestamp(value).endswith(" 00:00:00")
+
+def _aggregate_schema(
+    connection, schema, table, by, start, end, category=None, min_amount=None, max_amount=None
+) -> list[tuple[str, int, int]]:
+    """
+    Groups `table` in one schema by day, week, month or category inside SQLite. Date ranges are
+    answered from the date (or category, date) index. Unfiltered totals over whole days are
+    read from the daily/category rollups instead, without touching the transactions.
+    Returns (key, pence, count) rows in key order
+    """
+    prefix = "expense" if table == "expenses" else "income"
+    if category is None and min_amount is None and max_amount is None and _is_whole_day(start) and _is_whole_day(end):
+        if by != "category":
+            conditions, params = _day_filters(start, end)
+            key = GROUPINGS[by].format(date="day")
+            return connection.execute(
+                f"SELECT {key} AS bucket, SUM({prefix}_pence), SUM({prefix}_count) FROM {schema}.daily_totals"
+                f"{_where(conditions + [f'{prefix}_count > 0'])} GROUP BY bucket ORDER BY bucket", params
+            ).fetchall()
+        if start is None and end is None:
+            return connection.execute(
+                f"SELECT category, total_pence, entries FROM {schema}.category_totals ORDER BY category"
+            ).fetchall()
+
+    conditions, params = _filters(start, end, category, min_amount, max_amount)
+    key = GROUPINGS[by].format(date="date")
+    return connection.execute(
+        f"SELECT {key} AS bucket, SUM(amount_pence), COUNT(*) FROM {schema}.{table}{_where(conditions)}"
+        " GROUP BY bucket ORDER BY bucket", params
+    ).fetchall()
+
+def _aggregate(table, by, start, end, category=None, min_amount=None, max_amount=None) -> list[tuple[str, float, int]]:
+    """Groups `table` across the live file and the archives the range needs, as (key, total, count) rows"""
+    if by not in GROUPINGS or (table == "income" and by == "category"):
+        raise ValueError(f"Cannot group {table} by '{by}'")
+    rows = _merge_totals(
+        _aggregate_schema(connection, schema, table, by, start, end, category, min_amount, max_amount)
+        for connection, schema in _sources(start, end)
+    )
+    return [(key, pence / 100, count) for key, pence, count in rows]
+
+@cached("expenses")
+def aggregate_expenses(
+    by="category", start=None, end=None, category=None, min_amount=None, max_amount=None
+) -> list[tuple[str, float, int]]:
+    """
+    Totals expenses grouped by "day", "week" (keyed by its Monday), "month" or "category",
+    optionally within a [start, end) date range, one category and a [min, max] amount range.
+    Returns (key, total, count) rows in key order
+    """
+    return _aggregate("expenses", by, start, end, category, min_amount, max_amount)
+
+@cached("income")
+def aggregate_income(
+    by="month", start=None, end=None, min_amount=None, max_amount=None
+) -> list[tuple[str, float, int]]:
+    """Like aggregate_expenses for income, grouped by "day", "week" or "month" """
+    return _aggregate("income", by, start, end, min_amount=min_amount, max_amount=max_amount)
+
+def query_expenses(
+    start=None, end=None, category=None, min_amount=None, max_amount=None, limit=None
+) -> list[ExpenseRecord]:
+    """
+    Returns the expenses matching every given filter, oldest first. Rows are found
+    through the date index, so a month's report reads only that month's rows.
+    """
+    conditions, params = _filters(start, end, category, min_amount, max_amount)
+    rows = _merge_by_date((
+        connection.execute(
+            f"SELECT {EXPENSE_COLUMNS} FROM {schema}.expenses{_where(conditions)} ORDER BY date, id"
+            f"{' LIMIT ?' if limit is not None else ''}", params + ([limit] if limit is not None else [])
+        ).fetchall()
+        for connection, schema in _sources(start, end)
+    ), limit)
+    return [
+        ExpenseRecord(row_id, name, category, amount, parse_timestamp(date))
+        for row_id, name, category, amount, date in rows
+    ]
+
+def query_income(start=None, end=None, min_amount=None, max_amount=None, limit=None) -> list[IncomeRecord]:
+    """Like query_expenses for income entries"""
+    conditions, params = _filters(start, end, min_amount=min_amount, max_amount=max_amount)
+    rows = _merge_by_date((
+        connection.execute(
+            f"SELECT {INCOME_COLUMNS} FROM {schema}.income{_where(conditions)} ORDER BY date, id"
+            f"{' LIMIT ?' if limit is not None else ''}", params + ([limit] if limit is not None else [])
+        ).fetchall()
+        for connection, schema in _sources(start, end)
+    ), limit)
+    return [
+        IncomeRecord(row_id, description, amount, parse_timestamp(date))
+        for row_id, description, amount, date in rows
+    ]
+
+def _match_query(text) -> str | None:
+    """
+    Turns free text into an FTS5 query where every word must match as a prefix,
+    so "cof sho" finds "Coffee Shop". Returns None if the text has no words.
+    """
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+def _search(table, columns, text, start, end, conditions, params, limit) -> list[tuple]:
+    """
+    Runs a full-text search on the FTS5 index of `table` in the live file and in each
+    yearly archive overlapping [start, end), with extra WHERE conditions applied to the
+    matched rows. Each index ranks its own matches, best first (by bm25 rank, then newest);
+    as ranks from different indexes don't compare, the live file's come first, then each
+    archive's, newest year first. Past RANK_LIMIT matches in all, the newest matches
+    (by id, which `columns` must start with) are returned instead.
+    """
+    query = _match_query(text)
+    if query is None:
+        return []
+    matches = sum(
+        connection.execute(f"SELECT COUNT(*) FROM {schema}.{table}_fts WHERE {table}_fts MATCH ?", (query,))
+        .fetchone()[0]
+        for connection, schema in _sources(start, end)
+    )
+    ranked = matches <= RANK_LIMIT
+    matched = f"SELECT rowid AS match_id, rank AS score FROM {{schema}}.{table}_fts WHERE {table}_fts MATCH ?"
+    order = "score, date DESC, id DESC" if ranked else "match_id DESC"
+    results = [
+        connection.execute(
+            f"SELECT {columns} FROM ({matched.format(schema=schema)}) JOIN {schema}.{table} ON id = match_id"
+            f"{_where(conditions)} ORDER BY {order} LIMIT ?",
+            [query, *params, limit],
+        ).fetchall()
+        for connection, schema in _sources(start, end)
+    ]
+    rows = list(itertools.chain.from_iterable(reversed(results))) # Live file first, then the newest archive
+    if not ranked:
+        rows.sort(key=lambda row: row[0], reverse=True)
+    return rows[:limit]
+
+def search_expenses(text, start=None, end=None, category=None, limit=SEARCH_LIMIT) -> list[ExpenseRecord]:
+    """
+    Finds expenses whose name contains words starting with each word of `text`
+    (case and accent insensitive), best match first, archived years included.
+    Optionally limited to a [start, end) date range and a category.
+    """
+    conditions, params = _filters(start, end, category)
+    rows = _search("expenses", EXPENSE_COLUMNS, text, start, end, conditions, params, limit)
+    return [
+        ExpenseRecord(row_id, name, category, amount, parse_timestamp(date))
+        for row_id, name, category, amount, date in rows
+    ]
+
+def search_income(text, start=None, end=None, limit=SEARCH_LIMIT) -> list[IncomeRecord]:
+    """Like search_expenses for income descriptions"""
+    conditions, params = _filters(start, end)
+    rows = _search("income", INCOME_COLUMNS, text, start, end, conditions, params, limit)
+    return [
+        IncomeRecord(row_id, description, amount, parse_timestamp(date))
+        for row_id, description, amount, date in rows
+    ]
+
+
+def get_journal(limit=20) -> list[JournalEntry]:
+    """Returns the latest `limit` adds and removes from the change journal (None for all), newest first"""
+    return journal.entries(get_connection(), limit)
+
+def checkpoint(force=False) -> int | None:
+    """
+    Snapshots the ledger if journal.SNAPSHOT_INTERVAL entries have been added since
+    the last snapshot (or always, with `force`), so later replays start from here.
+    Returns the journal position of the new snapshot, or None if none was due
+    """
+    connection = get_connection()
+    if not force and journal.last_seq(connection) - journal.latest_snapshot(connection) < journal.SNAPSHOT_INTERVAL:
+        return None
+    with transaction():
+        return journal.take_snapshot(connection)
+
+def _journal_position(seq=None, at=None) -> int:
+    """The journal position to rebuild the ledger at: `seq`, the last change at or before `at`, or the latest"""
+    if seq is not None:
+        return seq
+    if at is not None:
+        return journal.seq_at(get_connection(), _format_timestamp(at))
+    return journal.last_seq(get_connection())
+
+def ledger_at(seq=None, at=None) -> tuple[list[ExpenseRecord], list[IncomeRecord]]:
+    """
+    Rebuilds the expenses and income as they were just after journal entry `seq`,
+    or at time `at` (UTC), by replaying the journal from the nearest earlier
+    snapshot, including rows since moved into yearly archives. Nothing is changed.
+    Returns (expenses, income), each in id order
+    """
+    connection = get_connection()
+    with transaction(): # One consistent read of the journal; the temp table is dropped on commit
+        journal.replay(connection, _journal_position(seq, at))
+        rows = connection.execute(
+            "SELECT kind, row_id, name, category, amount_pence / 100.0, date FROM replayed ORDER BY kind, row_id"
+        ).fetchall()
+        connection.execute("DROP TABLE temp.replayed")
+    expenses = [
+        ExpenseRecord(row_id, name, category, amount, parse_timestamp(date))
+        for kind, row_id, name, category, amount, date in rows if kind == "expenses"
+    ]
+    income = [
+        IncomeRecord(row_id, name, amount, parse_timestamp(date))
+        for kind, row_id, name, _, amount, date in rows if kind == "income"
+    ]
+    return expenses, income
+
+def restore(seq=None, at=None) -> tuple[int, int]:
+    """
+    Puts the ledger back as it was just after journal entry `seq`, or at time `at` (UTC),
+    by removing rows added since and adding back rows removed since, with their ids.
+    The restore is itself journalled, so it can be undone. Returns (rows added, rows removed)
+    """
+    connection = get_connection()
+    with transaction():
+        journal.replay(connection, _journal_position(seq, at))
+        added, removed = journal.apply_replayed(connection)
+        connection.execute("DROP TABLE temp.replayed")
+    _changed("expenses", "income")
+    return added, removed
 
-def get_total_income() -> float:
-    """`Returns the total income amount"""
-    expense_cursor.execute("SELECT SUM(amount) FROM income")
-    total = expense_cursor.fetchone()[0]
-    return total if total else 0.0
+def undo(steps=1) -> list[JournalEntry]:
+    """
+    Undoes the latest `steps` adds and removes (skipping undos and what they already undid),
+    newest first, in one transaction. Returns the journal entries that were undone
+    """
+    with transaction():
+        undone = journal.undo(get_connection(), steps)
+    if undone:
+        _changed("expenses", "income")
+    return undone
 
+def recover(path, seq=None, at=None) -> tuple[int, int]:
+    """
+    Writes the ledger as rebuilt from the journal (as of `seq` or `at`, default the latest)
+    into a new database file at `path`, e.g. to salvage a ledger whose tables were damaged.
+    The yearly archives are copied alongside it and registered there, and rows moved into
+    them stay in them, as restore() leaves them. Returns (expenses, income entries) written
+    to the new file's live tables
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f"'{path}' already exists")
+    fresh = connect(path)
+    migrate(fresh)
+    fresh.close()
+    recovered_folder = os.path.dirname(os.path.abspath(path))
+    archives = get_archives()
+    copies = []
+    if archives:
+        os.makedirs(archive.folder(os.path.abspath(path)), exist_ok=True)
+    for year, source, _, _ in archives:
+        copy = os.path.join(archive.folder(os.path.abspath(path)), os.path.basename(source))
+        shutil.copy(source, copy) # Keeps it read-only
+        copies.append((os.path.relpath(copy, recovered_folder), year))
+    connection = get_connection()
+    connection.execute("ATTACH DATABASE ? AS recovered", (path,))
+    try:
+        with transaction():
+            connection.executemany(
+                "INSERT INTO recovered.archives (year, path, generation, expenses, income)"
+                " SELECT year, ?, generation, expenses, income FROM archives WHERE year = ?", copies
+            )
+            journal.replay(connection, _journal_position(seq, at))
+            journal.apply_replayed(connection, "recovered")
+            counts = connection.execute(
+                "SELECT (SELECT COUNT(*) FROM recovered.expenses), (SELECT COUNT(*) FROM recovered.income)"
+            ).fetchone()
+            connection.execute("DROP TABLE temp.replayed")
+    finally:
+        connection.execute("DETACH DATABASE recovered")
+    return counts
 
+def get_archives() -> list[tuple[int, str, int, int]]:
+    """Returns (year, file path, expenses, income entries) for every archived year, oldest first"""
+    folder = os.path.dirname(os.path.abspath(get_db_path()))
+    rows = get_connection().execute("SELECT year, path, expenses, income FROM archives ORDER BY year").fetchall()
+    return [(year, os.path.join(folder, path), expenses, income) for year, path, expenses, income in rows]
 
+def archive_closed_years(before=None) -> list[tuple[int, int, int]]:
+    """
+    Moves every year before `before` (default: the current year) out of the live file
+    into its own read-only archive file with precomputed rollups. Reports attach an
+    archive only when their date range reaches into its year. A year archived before
+    that has gained late entries is rewritten as a new generation including them.
+    Call it outside a transaction() block, as only committed rows are archived.
+    Returns (year, expenses, income entries) for each year moved
+    """
+    before = before if before is not None else datetime.now().year
+    connection = get_connection()
+    years = [int(year) for (year,) in connection.execute(
+        "SELECT DISTINCT substr(day, 1, 4) FROM daily_totals WHERE day < ? ORDER BY day", (f"{before:04d}-01-01",)
+    )]
+    db_folder = os.path.dirname(os.path.abspath(get_db_path()))
+    archive_folder = archive.folder(os.path.abspath(get_db_path()))
+    os.makedirs(archive_folder, exist_ok=True)
+    moved = []
+    for year in years:
+        previous = connection.execute("SELECT path, generation FROM archives WHERE year = ?", (year,)).fetchone()
+        generation = previous[1] + 1 if previous else 1
+        path = os.path.join(archive_folder, archive.file_name(year, generation))
+        if os.path.exists(path): # Left behind by an archive run that never committed
+            archive.remove(connection, year, path)
+        previous_path = os.path.join(db_folder, previous[0]) if previous else None
+        expenses, income = archive.write(path, get_db_path(), year, previous_path)
 
+        # Only rows that made it into the new file are removed, in case others were added meanwhile
+        connection.execute("ATTACH DATABASE ? AS archiving", (archive.read_only_uri(path),))
+        try:
+            with transaction():
+                first, last = archive.year_range(year)
+                seq = journal.last_seq(connection)
+                for table in ["expenses", "income"]:
+                    connection.execute(
+                        f"DELETE FROM {table} WHERE date >= ? AND date < ?"
+                        f" AND id IN (SELECT id FROM archiving.{table})",
+                        (first, last),
+                    )
+                connection.execute("UPDATE journal SET op = 'archive' WHERE seq > ? AND op = 'remove'", (seq,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO archives (year, path, generation, expenses, income) VALUES (?, ?, ?, ?, ?)",
+                    (year, os.path.relpath(path, db_folder), generation, expenses, income),
+                )
+        finally:
+            connection.execute("DETACH DATABASE archiving")
+        if previous:
+            archive.remove(connection, year, os.path.join(db_folder, previous[0]))
+        moved.append((year, expenses, income))
+    if moved:
+        _changed("expenses", "income")
+    return moved
@@ -0,0 +1,206 @@
+from datetime import datetime
+from typing import NamedTuple
+from database.migrations import content_hash
+
+"""
+Reads and replays the change journal. Every added or removed row is appended to the
+journal table by triggers (see migrations._add_journal). Snapshots copy the whole
+ledger at a journal position, so rebuilding the ledger as of any position replays
+only the events after the nearest snapshot before it.
+"""
+
+SNAPSHOT_INTERVAL = 50_000 # Journal events after which checkpoint() takes a new snapshot
+SNAPSHOTS_KEPT = 2 # Older snapshots are dropped; the journal itself is never trimmed
+
+NAME_COLUMNS = {"expenses": "name", "income": "description"}
+JOURNAL_COLUMNS = "seq, at, op, kind, row_id, name, category, amount_pence / 100.0, date, reverts"
+# Excludes rows that have been moved to a yearly archive (their removal is journalled as op 'archive')
+ARCHIVED = (
+    " AND NOT EXISTS (SELECT 1 FROM journal AS moved"
+    " WHERE moved.op = 'archive' AND moved.kind = replayed.kind AND moved.row_id = replayed.row_id)"
+)
+
+
+class JournalEntry(NamedTuple):
+    """One add or remove recorded in the journal, with the content of the row"""
+    seq: int
+    at: datetime # When the change was made (UTC)
+    op: str # "add", "remove", or "archive" for a row moved to a yearly archive
+    kind: str # "expenses" or "income"
+    row_id: int
+    name: str # The expense name or income description
+    category: str | None
+    amount: float
+    date: datetime | None
+    reverts: int | None # The seq of the entry this change undid, if it was an undo
+
+    def __str__(self) -> str:
+        """Formats the entry for display"""
+        category = f" ({self.category})" if self.category else ""
+        undo = f", undoing #{self.reverts}" if self.reverts else ""
+        return (
+            f"#{self.seq} {self.at:%Y-%m-%d %H:%M:%S} {self.op} {self.kind} {self.row_id}: "
+            f"{self.name}{category} - £{self.amount:,.2f}{undo}"
+        )
+
+
+def _entry(row) -> JournalEntry:
+    """Builds a JournalEntry from a row of JOURNAL_COLUMNS"""
+    seq, at, op, kind, row_id, name, category, amount, date, reverts = row
+    return JournalEntry(
+        seq, datetime.fromisoformat(at), op, kind, row_id, name, category, amount,
+        datetime.fromisoformat(date) if date else None, reverts,
+    )
+
+def last_seq(connection) -> int:
+    """Position of the latest journal entry, or 0 for an empty journal"""
+    return connection.execute("SELECT COALESCE(MAX(seq), 0) FROM journal").fetchone()[0]
+
+def seq_at(connection, at) -> int:
+    """
+    Position of the latest entry made at or before `at` (a 'YYYY-MM-DD HH:MM:SS' UTC time).
+    Entries are stamped to the millisecond, so they are compared to the second like `at`
+    """
+    return connection.execute(
+        "SELECT COALESCE(MAX(seq), 0) FROM journal WHERE substr(at, 1, 19) <= ?", (at,)
+    ).fetchone()[0]
+
+def entries(connection, limit=None) -> list[JournalEntry]:
+    """The latest `limit` journal entries (or all of them), newest first"""
+    rows = connection.execute(
+        f"SELECT {JOURNAL_COLUMNS} FROM journal ORDER BY seq DESC{' LIMIT ?' if limit is not None else ''}",
+        () if limit is None else (limit,),
+    ).fetchall()
+    return [_entry(row) for row in rows]
+
+def latest_snapshot(connection, seq=None) -> int:
+    """Position of the latest snapshot at or before `seq` (default: any), or 0 if there is none"""
+    seq = seq if seq is not None else last_seq(connection)
+    return connection.execute(
+        "SELECT COALESCE(MAX(seq), 0) FROM journal_snapshots WHERE seq <= ?", (seq,)
+    ).fetchone()[0]
+
+def take_snapshot(connection) -> int:
+    """
+    Copies the ledger into a snapshot at the latest journal position, dropping all but
+    the newest SNAPSHOTS_KEPT snapshots. Returns the snapshot's position
+    """
+    seq = last_seq(connection)
+    if connection.execute("SELECT 1 FROM journal_snapshots WHERE seq = ?", (seq,)).fetchone():
+        return seq
+    connection.execute("INSERT INTO journal_snapshots (seq) VALUES (?)", (seq,))
+    connection.execute(
+        "INSERT INTO journal_snapshot_rows (snapshot, kind, row_id, name, category, amount_pence, date)"
+        " SELECT ?, 'expenses', id, name, category, amount_pence, date FROM expenses", (seq,)
+    )
+    connection.execute(
+        "INSERT INTO journal_snapshot_rows (snapshot, kind, row_id, name, category, amount_pence, date)"
+        " SELECT ?, 'income', id, description, NULL, amount_pence, date FROM income", (seq,)
+    )
+    connection.execute(
+        "DELETE FROM journal_snapshots WHERE seq NOT IN (SELECT seq FROM journal_snapshots ORDER BY seq DESC LIMIT ?)",
+        (SNAPSHOTS_KEPT,),
+    )
+    connection.execute("DELETE FROM journal_snapshot_rows WHERE snapshot NOT IN (SELECT seq FROM journal_snapshots)")
+    return seq
+
+def replay(connection, seq) -> None:
+    """
+    Rebuilds the ledger as it was just after journal entry `seq` into the TEMP table
+    `replayed`, starting from the latest snapshot at or before it. Only the last event
+    of each row after the snapshot matters: a row is present if that was an add, or a
+    move into a yearly archive, which isn't a delete. Snapshots only copy the live file,
+    so rows archived before the snapshot are added back from their archive entries.
+    """
+    base = latest_snapshot(connection, seq)
+    connection.execute("DROP TABLE IF EXISTS temp.replayed")
+    connection.execute("""
+    CREATE TEMP TABLE replayed (
+        kind TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        category TEXT,
+        amount_pence INTEGER NOT NULL,
+        date TEXT,
+        PRIMARY KEY (kind, row_id)
+    ) WITHOUT ROWID
+    """)
+    connection.execute(
+        "INSERT INTO replayed SELECT kind, row_id, name, category, amount_pence, date"
+        " FROM journal_snapshot_rows WHERE snapshot = ?",
+        (base,),
+    )
+    connection.execute(
+        "INSERT OR IGNORE INTO replayed SELECT kind, row_id, name, category, amount_pence, date"
+        " FROM journal WHERE op = 'archive' AND seq <= ?",
+        (base,),
+    )
+    connection.execute(
+        "DELETE FROM replayed WHERE (kind, row_id) IN (SELECT kind, row_id FROM journal WHERE seq > ? AND seq <= ?)",
+        (base, seq),
+    )
+    connection.execute("""
+    INSERT INTO replayed
+    SELECT kind, row_id, name, category, amount_pence, date FROM journal
+    WHERE op IN ('add', 'archive')
+      AND seq IN (SELECT MAX(seq) FROM journal WHERE seq > ? AND seq <= ? GROUP BY kind, row_id)
+    """, (base, seq))
+
+def apply_replayed(connection, schema="main") -> tuple[int, int]:
+    """
+    Makes the expenses and income tables in `schema` match the `replayed` table:
+    rows missing from it are removed and rows missing from the tables are added back
+    with their original ids. The triggers journal every change this makes.
+    Rows since moved to a yearly archive are left there rather than added back to the live file.
+    Returns (rows added, rows removed)
+    """
+    connection.create_function("content_hash", 3, content_hash, deterministic=True)
+    added = removed = 0
+    for table, name in NAME_COLUMNS.items():
+        category = "category, " if table == "expenses" else ""
+        removed += connection.execute(
+            f"DELETE FROM {schema}.{table} WHERE id NOT IN (SELECT row_id FROM replayed WHERE kind = ?)", (table,)
+        ).rowcount
+        added += connection.execute(f"""
+        INSERT INTO {schema}.{table} (id, {name}, {category}amount_pence, date, content_hash)
+        SELECT row_id, name, {category}amount_pence, date, content_hash(date, amount_pence, name) FROM replayed
+        WHERE kind = ? AND row_id NOT IN (SELECT id FROM {schema}.{table}){ARCHIVED}
+        """, (table,)).rowcount
+    return added, removed
+
+def undo(connection, steps) -> list[JournalEntry]:
+    """
+    Reverts the latest `steps` journal entries that are neither undos themselves nor
+    already undone, newest first: an add is removed again and a remove is added back.
+    Archiving, and adds of rows that have since been archived, can't be undone.
+    Each revert is journalled, marked with the seq of the entry it undid.
+    Returns the entries that were undone
+    """
+    connection.create_function("content_hash", 3, content_hash, deterministic=True)
+    rows = connection.execute(f"""
+    SELECT {JOURNAL_COLUMNS} FROM journal AS entry
+    WHERE reverts IS NULL AND op != 'archive' AND NOT EXISTS (SELECT 1 FROM journal WHERE reverts = entry.seq)
+      AND NOT EXISTS (
+          SELECT 1 FROM journal AS moved
+          WHERE moved.op = 'archive' AND moved.kind = entry.kind AND moved.row_id = entry.row_id
+      )
+    ORDER BY seq DESC LIMIT ?
+    """, (steps,)).fetchall()
+    undone = []
+    for entry in map(_entry, rows):
+        name = NAME_COLUMNS[entry.kind]
+        if entry.op == "add":
+            cursor = connection.execute(f"DELETE FROM {entry.kind} WHERE id = ?", (entry.row_id,))
+        else:
+            category = "category, " if entry.kind == "expenses" else ""
+            cursor = connection.execute(f"""
+            INSERT OR IGNORE INTO {entry.kind} (id, {name}, {category}amount_pence, date, content_hash)
+            SELECT row_id, name, {category}amount_pence, date, content_hash(date, amount_pence, name)
+            FROM journal WHERE seq = ?
+            """, (entry.seq,))
+        if cursor.rowcount:
+            connection.execute(
+                "UPDATE journal SET reverts = ? WHERE seq = (SELECT MAX(seq) FROM journal)", (entry.seq,)
+            )
+            undone.append(entry)
+    return undone
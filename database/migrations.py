@@ -0,0 +1,387 @@
+import hashlib
+import re
+import sqlite3
+
+"""Versioned schema migrations for the expenses database"""
+
+# Each migration upgrades the schema by one version. The current version is
+# kept in SQLite's PRAGMA user_version, so an existing expenses.db is upgraded
+# in place the first time it is opened by a newer version of the app.
+
+
+def content_hash(date, amount_pence, name) -> str:
+    """
+    Fingerprint of a transaction's content (date + amount + name/description),
+    used to spot rows that are already in the ledger when importing statements
+    """
+    key = f"{date}|{amount_pence}|{name.strip().casefold()}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _create_tables(connection) -> None:
+    """Version 1: the original expenses and income tables"""
+    connection.execute("""
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount REAL NOT NULL,
+        date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    connection.execute("""
+    CREATE TABLE IF NOT EXISTS income (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        amount REAL NOT NULL,
+        date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _rebuild_table(connection, table, create_sql, columns, select) -> None:
+    """
+    Copies `table` into a new table created by `create_sql` and swaps it in,
+    keeping the AUTOINCREMENT counter so deleted ids are never reused
+    """
+    sequence = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    connection.execute(create_sql.format(table=f"{table}_new"))
+    connection.execute(f"INSERT INTO {table}_new ({columns}) SELECT {select} FROM {table}")
+    connection.execute(f"DROP TABLE {table}")
+    connection.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    if sequence is not None:
+        connection.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table)
+        )
+
+def _store_amounts_in_pence(connection) -> None:
+    """
+    Version 2: amounts become exact integer pence and dates are normalised
+    to 'YYYY-MM-DD HH:MM:SS' so they sort and compare correctly as text
+    """
+    _rebuild_table(connection, "expenses", """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount_pence INTEGER NOT NULL,
+        date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """, "id, name, category, amount_pence, date",
+        "id, name, category, CAST(ROUND(amount * 100) AS INTEGER), COALESCE(datetime(date), date)")
+    _rebuild_table(connection, "income", """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        amount_pence INTEGER NOT NULL,
+        date TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """, "id, description, amount_pence, date",
+        "id, description, CAST(ROUND(amount * 100) AS INTEGER), COALESCE(datetime(date), date)")
+
+def _add_indexes(connection) -> None:
+    """Version 3: indexes for date filters and per-category queries"""
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date)")
+    # Also serves lookups on category alone, as category is its leading column
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category_date ON expenses (category, date)")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_income_date ON income (date)")
+
+def _rollup_statements(kind, row, sign) -> list[str]:
+    """
+    SQL that adds (sign=1) or removes (sign=-1) one `row` (NEW or OLD) of an
+    expenses/income table to/from the daily and monthly rollups and, for
+    expenses, the category rollup. Rows whose counts reach zero are dropped.
+    """
+    statements = []
+    periods = [("daily_totals", "day", 10), ("monthly_totals", "month", 7)]
+    for table, key, length in periods:
+        statements.append(f"""
+        INSERT INTO {table} ({key}, {kind}_pence, {kind}_count)
+        SELECT substr({row}.date, 1, {length}), {sign} * {row}.amount_pence, {sign}
+        WHERE {row}.date IS NOT NULL
+        ON CONFLICT({key}) DO UPDATE SET
+            {kind}_pence = {kind}_pence + excluded.{kind}_pence,
+            {kind}_count = {kind}_count + excluded.{kind}_count""")
+        if sign < 0:
+            statements.append(f"""
+        DELETE FROM {table}
+        WHERE {key} = substr({row}.date, 1, {length}) AND expense_count = 0 AND income_count = 0""")
+    if kind == "expense":
+        statements.append(f"""
+        INSERT INTO category_totals (category, total_pence, entries)
+        VALUES ({row}.category, {sign} * {row}.amount_pence, {sign})
+        ON CONFLICT(category) DO UPDATE SET
+            total_pence = total_pence + excluded.total_pence,
+            entries = entries + excluded.entries""")
+        if sign < 0:
+            statements.append(f"DELETE FROM category_totals WHERE category = {row}.category AND entries = 0")
+    return statements
+
+def create_rollup_tables(connection, schema="main") -> None:
+    """Creates the per-category, per-day and per-month totals tables in `schema`"""
+    connection.execute(f"""
+    CREATE TABLE {schema}.category_totals (
+        category TEXT PRIMARY KEY,
+        total_pence INTEGER NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    for table, key in [("daily_totals", "day"), ("monthly_totals", "month")]:
+        connection.execute(f"""
+        CREATE TABLE {schema}.{table} (
+            {key} TEXT PRIMARY KEY,
+            expense_pence INTEGER NOT NULL DEFAULT 0,
+            expense_count INTEGER NOT NULL DEFAULT 0,
+            income_pence INTEGER NOT NULL DEFAULT 0,
+            income_count INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+
+def backfill_rollups(connection, schema="main") -> None:
+    """Fills the empty rollup tables in `schema` from the expenses and income rows there"""
+    connection.execute(f"""
+    INSERT INTO {schema}.category_totals (category, total_pence, entries)
+    SELECT category, SUM(amount_pence), COUNT(*) FROM {schema}.expenses GROUP BY category
+    """)
+    for table, key, length in [("daily_totals", "day", 10), ("monthly_totals", "month", 7)]:
+        connection.execute(f"""
+        INSERT INTO {schema}.{table} ({key}, expense_pence, expense_count, income_pence, income_count)
+        SELECT period, SUM(expense_pence), SUM(expense_count), SUM(income_pence), SUM(income_count) FROM (
+            SELECT substr(date, 1, {length}) AS period, amount_pence AS expense_pence, 1 AS expense_count,
+                   0 AS income_pence, 0 AS income_count
+            FROM {schema}.expenses WHERE date IS NOT NULL
+            UNION ALL
+            SELECT substr(date, 1, {length}), 0, 0, amount_pence, 1 FROM {schema}.income WHERE date IS NOT NULL
+        ) GROUP BY period
+        """)
+
+def create_search_index(connection) -> None:
+    """
+    Creates the FTS5 indexes over expense names and income descriptions and indexes the
+    rows already there. They index the tables' own text rather than storing a copy.
+    Prefix indexes on 2 and 3 characters keep short prefix searches fast.
+    """
+    for table, column in [("expenses", "name"), ("income", "description")]:
+        connection.execute(f"""
+        CREATE VIRTUAL TABLE {table}_fts USING fts5(
+            {column}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """)
+        connection.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+def bulk_insert_statements(table) -> list[str]:
+    """
+    SQL doing set-based, for the rows of `table` with an id above :after, what the
+    per-row insert triggers do, which are switched off during a bulk load: one
+    grouped upsert into each rollup, one data version bump, and the search index
+    and journal entries for all the rows at once
+    """
+    kind, name, category = ("expense", "name", "category") if table == "expenses" else ("income", "description", "NULL")
+    statements = []
+    for rollup, key, length in [("daily_totals", "day", 10), ("monthly_totals", "month", 7)]:
+        statements.append(f"""
+        INSERT INTO {rollup} ({key}, {kind}_pence, {kind}_count)
+        SELECT substr(date, 1, {length}) AS period, SUM(amount_pence), COUNT(*) FROM {table}
+        WHERE id > :after AND date IS NOT NULL GROUP BY period
+        ON CONFLICT({key}) DO UPDATE SET
+            {kind}_pence = {kind}_pence + excluded.{kind}_pence,
+            {kind}_count = {kind}_count + excluded.{kind}_count""")
+    if table == "expenses":
+        # Grouping by +category stops SQLite walking the whole (category, date) index to group a few rows
+        statements.append("""
+        INSERT INTO category_totals (category, total_pence, entries)
+        SELECT category, SUM(amount_pence), COUNT(*) FROM expenses WHERE id > :after GROUP BY +category
+        ON CONFLICT(category) DO UPDATE SET
+            total_pence = total_pence + excluded.total_pence,
+            entries = entries + excluded.entries""")
+    statements.append("UPDATE data_version SET version = version + 1")
+    statements.append(f"INSERT INTO {table}_fts (rowid, {name}) SELECT id, {name} FROM {table} WHERE id > :after")
+    statements.append(f"""
+        INSERT INTO journal (op, kind, row_id, name, category, amount_pence, date)
+        SELECT 'add', '{table}', id, {name}, {category}, amount_pence, date FROM {table}
+        WHERE id > :after ORDER BY id""")
+    return statements
+
+def _add_rollup_tables(connection) -> None:
+    """
+    Version 4: per-category, per-day and per-month totals kept current by
+    triggers, so summaries and charts read O(categories) or O(days) rows
+    """
+    create_rollup_tables(connection)
+    tables = [("expenses", "expense", "amount_pence, date, category"), ("income", "income", "amount_pence, date")]
+    for table, kind, columns in tables:
+        add = ";".join(_rollup_statements(kind, "NEW", 1))
+        remove = ";".join(_rollup_statements(kind, "OLD", -1))
+        connection.execute(f"CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table} BEGIN {add}; END")
+        connection.execute(f"CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table} BEGIN {remove}; END")
+        connection.execute(
+            f"CREATE TRIGGER {table}_rollup_update AFTER UPDATE OF {columns} ON {table} BEGIN {remove}; {add}; END"
+        )
+    backfill_rollups(connection) # From the rows already in the ledger
+
+def _add_data_version(connection) -> None:
+    """
+    Version 5: a counter bumped by every change to the ledger, so caches of
+    derived results (such as rendered charts) can tell when they are stale
+    """
+    connection.execute("CREATE TABLE data_version (version INTEGER NOT NULL)")
+    connection.execute("INSERT INTO data_version (version) VALUES (0)")
+    for table in ["expenses", "income"]:
+        for event in ["INSERT", "DELETE", "UPDATE"]:
+            connection.execute(f"""
+            CREATE TRIGGER {table}_version_{event.lower()} AFTER {event} ON {table}
+            BEGIN UPDATE data_version SET version = version + 1; END
+            """)
+
+def _add_content_hashes(connection) -> None:
+    """Version 6: an indexed content hash on every row, so imports can skip duplicates in O(1) per row"""
+    connection.create_function("content_hash", 3, content_hash, deterministic=True)
+    for table, name in [("expenses", "name"), ("income", "description")]:
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+        connection.execute(f"UPDATE {table} SET content_hash = content_hash(date, amount_pence, {name})")
+        connection.execute(f"CREATE INDEX idx_{table}_content_hash ON {table} (content_hash)")
+
+def _add_search_index(connection) -> None:
+    """
+    Version 7: FTS5 full-text indexes over expense names and income descriptions
+    (see create_search_index), kept in sync by triggers
+    """
+    create_search_index(connection) # Indexes the rows already there
+    for table, column in [("expenses", "name"), ("income", "description")]:
+        add = f"INSERT INTO {table}_fts (rowid, {column}) VALUES (NEW.id, NEW.{column})"
+        remove = f"INSERT INTO {table}_fts ({table}_fts, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column})"
+        connection.execute(f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN {add}; END")
+        connection.execute(f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN {remove}; END")
+        connection.execute(
+            f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF {column} ON {table} BEGIN {remove}; {add}; END"
+        )
+
+def _add_journal(connection) -> None:
+    """
+    Version 8: an append-only journal of every added and removed row, with its content,
+    written by triggers inside the writer's own transaction, plus tables for the
+    compacted ledger snapshots that replays start from. Rows already in the ledger
+    are journalled as added, so replaying the whole journal rebuilds the ledger.
+    """
+    connection.execute("""
+    CREATE TABLE journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        op TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        category TEXT,
+        amount_pence INTEGER NOT NULL,
+        date TEXT,
+        reverts INTEGER
+    )
+    """)
+    connection.execute("CREATE INDEX idx_journal_reverts ON journal (reverts) WHERE reverts IS NOT NULL")
+    connection.execute(
+        "CREATE TABLE journal_snapshots (seq INTEGER PRIMARY KEY, at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    connection.execute("""
+    CREATE TABLE journal_snapshot_rows (
+        snapshot INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        category TEXT,
+        amount_pence INTEGER NOT NULL,
+        date TEXT,
+        PRIMARY KEY (snapshot, kind, row_id)
+    ) WITHOUT ROWID
+    """)
+
+    columns = "op, kind, row_id, name, category, amount_pence, date"
+    for table, name, category in [("expenses", "name", "{row}.category"), ("income", "description", "NULL")]:
+        for event, op, row in [("INSERT", "add", "NEW"), ("DELETE", "remove", "OLD")]:
+            connection.execute(f"""
+            CREATE TRIGGER {table}_journal_{event.lower()} AFTER {event} ON {table} BEGIN
+                INSERT INTO journal ({columns}) VALUES (
+                    '{op}', '{table}', {row}.id, {row}.{name}, {category.format(row=row)},
+                    {row}.amount_pence, {row}.date
+                );
+            END
+            """)
+        connection.execute(f"""
+        INSERT INTO journal ({columns})
+        SELECT 'add', '{table}', id, {name}, {category.format(row=table)}, amount_pence, date FROM {table} ORDER BY id
+        """)
+
+def _add_archive_registry(connection) -> None:
+    """
+    Version 9: the yearly archive files that closed years have been moved into,
+    and an index for telling journal entries of archived rows apart
+    """
+    connection.execute("""
+    CREATE TABLE archives (
+        year INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        generation INTEGER NOT NULL DEFAULT 1,
+        expenses INTEGER NOT NULL,
+        income INTEGER NOT NULL,
+        archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    connection.execute("CREATE INDEX idx_journal_archived ON journal (kind, row_id) WHERE op = 'archive'")
+
+def _add_bulk_load_flag(connection) -> None:
+    """
+    Version 10: a bulk_load flag that switches off the per-row insert triggers (rollups,
+    data version, search index and journal) while a bulk load writes, so it can do
+    their work set-based once per chunk instead (see bulk_insert_statements).
+    The flag is only ever set inside the bulk load's own transaction.
+    """
+    connection.execute("CREATE TABLE bulk_load (active INTEGER NOT NULL)")
+    connection.execute("INSERT INTO bulk_load (active) VALUES (0)")
+    triggers = connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ('expenses', 'income')"
+        " AND name LIKE '%\\_insert' ESCAPE '\\'"
+    ).fetchall()
+    for name, sql in triggers:
+        connection.execute(f"DROP TRIGGER {name}")
+        connection.execute(re.sub(r"\bBEGIN\b", "WHEN (SELECT active FROM bulk_load) = 0 BEGIN", sql, count=1))
+
+
+MIGRATIONS = [
+    _create_tables,
+    _store_amounts_in_pence,
+    _add_indexes,
+    _add_rollup_tables,
+    _add_data_version,
+    _add_content_hashes,
+    _add_search_index,
+    _add_journal,
+    _add_archive_registry,
+    _add_bulk_load_flag,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection) -> int:
+    """Returns the schema version recorded in the database file"""
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(connection) -> int:
+    """
+    Applies any migrations the database has not seen yet, each in its own transaction.
+    Returns the schema version the database was at before migrating
+    """
+    start_version = get_schema_version(connection)
+    if start_version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(
+            f"Database schema version {start_version} is newer than this app supports ({SCHEMA_VERSION})"
+        )
+    for version in range(start_version + 1, SCHEMA_VERSION + 1):
+        connection.execute("BEGIN")
+        try:
+            MIGRATIONS[version - 1](connection)
+            connection.execute(f"PRAGMA user_version = {version}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    return start_version
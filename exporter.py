@@ -0,0 +1,186 @@
+import csv
+import gzip
+import database.database as database
+
+"""Streaming export of expenses and income to CSV files and columnar snapshots"""
+
+EXPENSE_HEADER = ["ID", "Name", "Category", "Amount (£)", "Date"]
+INCOME_HEADER = ["ID", "Description", "Amount (£)", "Date"]
+
+
+def _open_output(path, compress):
+    """Opens `path` for CSV writing, gzip-compressed if asked for or if it ends in .gz"""
+    if compress or path.endswith(".gz"):
+        return gzip.open(path, mode="wt", newline="", encoding="utf-8")
+    return open(path, mode="w", newline="", encoding="utf-8")
+
+def output_path(path, compress=False) -> str:
+    """Returns the path an export will be written to, adding .gz when compressing"""
+    return f"{path}.gz" if compress and not path.endswith(".gz") else path
+
+def export_csv(kind, path, start=None, end=None, category=None, compress=False) -> int:
+    """
+    Writes every expense or income row (optionally within a [start, end) date range
+    and, for expenses, one category) to a CSV file in constant memory, streaming
+    batches from the database cursor straight into the writer.
+    Returns the number of rows written
+    """
+    header = EXPENSE_HEADER if kind == "expenses" else INCOME_HEADER
+    count = 0
+    with _open_output(output_path(path, compress), compress) as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for batch in database.iter_export_batches(kind, start, end, category):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+SNAPSHOT_FORMATS = ("arrow", "npz")
+
+
+def _pyarrow():
+    """Returns the pyarrow module, or None when it is not installed"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        return None
+    return pyarrow
+
+def snapshot_path(path, fmt) -> str:
+    """Returns the path a snapshot will be written to, adding the format's extension"""
+    return path if path.endswith(f".{fmt}") else f"{path}.{fmt}"
+
+def _batch_columns(batch, kind, category_index) -> dict:
+    """
+    Converts one batch of export rows into typed columns: int64 ids, a list of text,
+    int32 category codes (expenses only), float64 amounts and datetime64[s] dates
+    """
+    import numpy as np
+
+    columns = list(zip(*batch))
+    text = "name" if kind == "expenses" else "description"
+    arrays = {"id": np.array(columns[0], dtype=np.int64), text: list(columns[1])}
+    if kind == "expenses":
+        arrays["category"] = np.fromiter((category_index[c] for c in columns[2]), dtype=np.int32, count=len(batch))
+    arrays["amount"] = np.array(columns[-2], dtype=np.int64) / 100
+    arrays["date"] = np.array(columns[-1], dtype="datetime64[s]")
+    return arrays
+
+def _write_arrow(path, kind, batches, categories) -> None:
+    """Streams batches into an uncompressed Arrow IPC file, which can be memory-mapped"""
+    pa = _pyarrow()
+    fields = [("id", pa.int64())]
+    if kind == "expenses":
+        fields += [("name", pa.string()), ("category", pa.dictionary(pa.int32(), pa.string()))]
+    else:
+        fields += [("description", pa.string())]
+    schema = pa.schema(fields + [("amount", pa.float64()), ("date", pa.timestamp("s"))])
+    dictionary = pa.array(categories, type=pa.string())
+
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for columns in batches:
+            arrays = []
+            for name in schema.names:
+                if name == "category":
+                    arrays.append(pa.DictionaryArray.from_arrays(columns[name], dictionary))
+                else:
+                    arrays.append(pa.array(columns[name], type=schema.field(name).type))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+def _write_npz(path, kind, batches, categories) -> None:
+    """Writes the columns to an uncompressed .npz file, categories stored as codes plus labels"""
+    import numpy as np
+
+    text = "name" if kind == "expenses" else "description"
+    parts = {}
+    for columns in batches:
+        for name, values in columns.items():
+            parts.setdefault(name, []).append(values)
+    arrays = {}
+    dtypes = [("id", np.int64), (text, str), ("category", np.int32), ("amount", np.float64), ("date", "datetime64[s]")]
+    for name, empty in dtypes:
+        if name == "category" and kind != "expenses":
+            continue
+        values = parts.get(name, [])
+        if name == text:
+            arrays[name] = np.array([value for part in values for value in part], dtype=str)
+        else:
+            arrays[name] = np.concatenate(values) if values else np.array([], dtype=empty)
+    if kind == "expenses":
+        arrays["categories"] = np.array(categories, dtype=str)
+    # np.savez appends .npz itself when missing, so write through an open file to keep the path exact
+    with open(path, "wb") as file:
+        np.savez(file, **arrays)
+
+def export_snapshot(kind, path, start=None, end=None, category=None, fmt=None) -> str:
+    """
+    Writes expenses or income (optionally filtered like export_csv) to a columnar
+    snapshot: typed id/name/category/amount/date columns with dictionary-encoded
+    categories. Uses the Arrow IPC file format when pyarrow is installed, otherwise
+    NumPy .npz. Returns the path written.
+    """
+    fmt = fmt or ("arrow" if _pyarrow() else "npz")
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format '{fmt}', expected one of {', '.join(SNAPSHOT_FORMATS)}")
+    if fmt == "arrow" and _pyarrow() is None:
+        raise ValueError("The arrow snapshot format needs pyarrow installed; use npz instead")
+
+    categories = database.get_categories() if kind == "expenses" else []
+    category_index = {name: code for code, name in enumerate(categories)}
+    batches = (
+        _batch_columns(batch, kind, category_index)
+        for batch in database.iter_export_batches(kind, start, end, category, formatted=False)
+    )
+    path = snapshot_path(path, fmt)
+    (_write_arrow if fmt == "arrow" else _write_npz)(path, kind, batches, categories)
+    return path
+
+def load_snapshot(path, memory_map=True, decode_categories=True, chunked=False) -> dict:
+    """
+    Loads a snapshot written by export_snapshot into a dict of NumPy column arrays.
+    Arrow files are memory-mapped by default and hold one record batch per export batch
+    (EXPORT_BATCH_SIZE rows). With chunked=True each column is a list of per-batch arrays,
+    and numeric ones are views of the mapped file, read without copying; otherwise the
+    batches of larger snapshots are joined into one array per column, which copies them.
+    Categories are decoded to labels, or with decode_categories=False returned as int32
+    codes in "category" with their labels in "categories".
+    """
+    import numpy as np
+
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+        if chunked: # The whole file is one batch
+            columns = {name: values if name == "categories" else [values] for name, values in columns.items()}
+    else:
+        pa = _pyarrow()
+        if pa is None:
+            raise ValueError(f"Reading '{path}' needs pyarrow installed")
+        source = pa.memory_map(path) if memory_map else pa.OSFile(path)
+        with source:
+            table = pa.ipc.open_file(source).read_all()
+        columns = {}
+        for name in table.column_names:
+            column = table.column(name)
+            encoded = pa.types.is_dictionary(column.type)
+            if encoded:
+                chunks = [chunk.indices.to_numpy(zero_copy_only=False) for chunk in column.chunks]
+                labels = column.chunks[0].dictionary if column.num_chunks else pa.array([], pa.string())
+                columns["categories"] = labels.to_numpy(zero_copy_only=False)
+            else:
+                chunks = [chunk.to_numpy(zero_copy_only=False) for chunk in column.chunks]
+            if chunked:
+                columns[name] = chunks
+            elif len(chunks) == 1:
+                columns[name] = chunks[0]
+            elif chunks:
+                columns[name] = np.concatenate(chunks)
+            else: # An empty snapshot
+                columns[name] = np.array([], dtype=np.int32) if encoded else column.to_numpy()
+
+    if decode_categories and "categories" in columns:
+        labels = columns.pop("categories")
+        codes = columns["category"]
+        columns["category"] = [labels[chunk] for chunk in codes] if chunked else labels[codes]
+    return columns
@@ -1,18 +1,88 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
-from matplotlib import pyplot as plt
+import glob
+import hashlib
+import os
+import shutil
 from database import database
-from utils import get_user_choice, parse_date, input_with_exit
+from utils import get_user_choice, input_with_exit
 
 """Functions for plotting graphs related to expenses and income"""
 
-def plot_expense_summary() -> None:
+# matplotlib, NumPy and the timeseries module are imported inside the functions
+# that need them, so importing this module (and main) stays fast.
+
+MAX_LINE_POINTS = 1000 # Line chart series are downsampled to at most this many points
+MARKER_THRESHOLD = 100 # Point markers are only drawn on series with this many points or fewer
+
+# Rendered chart files are cached here, keyed on the ledger's data version
+CHART_CACHE_DIR = os.environ.get("EXPENSE_TRACKER_CHART_CACHE", ".chart_cache")
+CHART_TYPES = ("pie", "bar", "line")
+CHART_FORMATS = ("png", "svg")
+FIGURE_SIZES = {"pie": (6, 6), "bar": (8, 5), "line": (10, 5)}
+
+
+def _draw_pie(ax, summary) -> None:
+    """Draws expenses by category as a pie chart"""
+    categories = [category for category, total in summary]
+    totals = [total for category, total in summary]
+    ax.pie(totals, labels=categories, autopct='%1.1f%%', startangle=140)
+    ax.set_title("Expenses by Category")
+
+def _draw_bar(ax, summary) -> None:
+    """Draws expenses by category as a bar chart"""
+    categories = [category for category, total in summary]
+    totals = [total for category, total in summary]
+    ax.bar(categories, totals)
+    ax.set_xlabel("Category")
+    ax.set_ylabel("Total Spent (£)")
+    ax.set_title("Expenses by Category (Bar Chart)")
+
+def _draw_line(ax, daily_totals, resolution="day", max_points=MAX_LINE_POINTS) -> None:
+    """Draws running income and expense totals over time"""
+    import timeseries
+
+    # Running totals per day/week/month, aggregated with NumPy
+    full_range, expense_values, income_values = timeseries.income_vs_expenses(daily_totals, resolution)
+
+    # Keep the chart fast and readable over long ranges
+    expense_dates, expense_values = timeseries.downsample(full_range, expense_values, max_points)
+    income_dates, income_values = timeseries.downsample(full_range, income_values, max_points)
+    show_markers = max(len(expense_dates), len(income_dates)) <= MARKER_THRESHOLD
+
+    ax.plot(expense_dates, expense_values, label="Expenses", marker='o' if show_markers else None, color='tab:blue')
+    ax.plot(income_dates, income_values, label="Income", marker='s' if show_markers else None, color='tab:orange')
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Amount (£)")
+    ax.set_title("Income vs Expenses Over Time")
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.tick_params(axis='x', labelrotation=45)
+
+def _load_chart_data(chart, start=None, end=None):
+    """
+    Returns the rows a chart is drawn from, optionally for a [start, end) period only,
+    or None if there is nothing to draw
     """
-    Plots a summary of expenses by category using matplotlib.
+    if chart == "line":
+        return database.get_daily_totals(start, end) or None
+    return database.summarise_expenses(start, end) or None
+
+def _draw_chart(ax, chart, data, resolution, max_points) -> None:
+    """Draws the named chart type onto `ax`"""
+    if chart == "pie":
+        _draw_pie(ax, data)
+    elif chart == "bar":
+        _draw_bar(ax, data)
+    else:
+        _draw_line(ax, data, resolution, max_points)
+
+def plot_expense_summary(resolution="day", max_points=MAX_LINE_POINTS, start=None, end=None) -> None:
+    """
+    Plots a summary of expenses by category using matplotlib, optionally for a [start, end) period.
     Offers the user a choice of chart types:
       1. Pie Chart (Expenses by Category %)
       2. Bar Chart (Expenses by Category £)
-      3. Line Chart (Income vs Expenses over Time)
+      3. Line Chart (Income vs Expenses over Time), bucketed by day, week or month
+         and downsampled to at most `max_points` points per series
     """
     print("\nChoose a chart type:")
     print(" 1. Pie Chart (Expenses by Category %)")
@@ -27,74 +97,75 @@ def plot_expense_summary() -> None:
         print("Invalid choice. Please select 1, 2, or 3.")
         return
 
-    summary = database.summarise_expenses()
-    if not summary and choice in [1, 2]:
-        print("No expenses to plot.")
+    chart = CHART_TYPES[choice - 1]
+    data = _load_chart_data(chart, start, end)
+    if data is None:
+        print("No income or expenses to plot." if chart == "line" else "No expenses to plot.")
         return
 
-    categories = [category for category, total in summary]
-    totals = [total for category, total in summary]
+    from matplotlib import pyplot as plt
+
+    fig, ax = plt.subplots(figsize=FIGURE_SIZES[chart])
+    _draw_chart(ax, chart, data, resolution, max_points)
+    fig.tight_layout()
+    plt.show()
+
+def chart_cache_path(chart, fmt="png", resolution="day", max_points=MAX_LINE_POINTS, cache_dir=CHART_CACHE_DIR,
+                     start=None, end=None) -> str:
+    """
+    Returns where a chart for the current state of the ledger is cached. The name
+    holds a digest of the database file and the chart options, then the ledger's
+    data version, so any add or remove produces a new path.
+    """
+    key = "|".join(map(str, [os.path.abspath(database.get_db_path()), chart, resolution, max_points, start, end]))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{chart}-{digest}-{database.get_data_version()}.{fmt}")
+
+def _remove_older_versions(cached) -> None:
+    """Deletes the cached files of the same chart and options rendered from earlier versions of the ledger"""
+    stem, fmt = os.path.splitext(cached)
+    for path in glob.glob(f"{glob.escape(stem.rpartition('-')[0])}-*{fmt}"):
+        if path != cached:
+            try:
+                os.remove(path)
+            except OSError: # Still open elsewhere (e.g. on Windows); tried again after the next change
+                pass
+
+def render_chart(chart, path=None, fmt="png", resolution="day", max_points=MAX_LINE_POINTS, cache_dir=CHART_CACHE_DIR,
+                 start=None, end=None) -> str | None:
+    """
+    Renders a chart ("pie", "bar" or "line") to a PNG or SVG file without a display,
+    using matplotlib's Agg canvas directly rather than pyplot.
+    With `start`/`end`, only that [start, end) period is charted.
+    If the ledger has not changed since the chart was last rendered, the cached file is
+    reused without querying the chart data or drawing anything.
+    Returns the path written (a copy at `path` if given, otherwise the cache file),
+    or None if there is no data to plot.
+    """
+    if chart not in CHART_TYPES:
+        raise ValueError(f"Unknown chart '{chart}', expected one of {', '.join(CHART_TYPES)}")
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(CHART_FORMATS)}")
+
+    cached = chart_cache_path(chart, fmt, resolution, max_points, cache_dir, start, end)
+    if not os.path.exists(cached):
+        data = _load_chart_data(chart, start, end)
+        if data is None:
+            return None
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=FIGURE_SIZES[chart])
+        FigureCanvasAgg(fig)
+        _draw_chart(fig.add_subplot(), chart, data, resolution, max_points)
+        fig.tight_layout()
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = f"{cached}.{os.getpid()}.tmp"
+        fig.savefig(temporary, format=fmt)
+        os.replace(temporary, cached) # Never leave a half-written file under the cache name
+        _remove_older_versions(cached)
 
-    # Pie Chart
-    if choice == 1:
-        plt.figure(figsize=(6,6))
-        plt.pie(totals, labels=categories, autopct='%1.1f%%', startangle=140)
-        plt.title("Expenses by Category")
-        plt.show()
-
-    # Bar Chart
-    elif choice == 2:
-        plt.figure(figsize=(8,5))
-        plt.bar(categories, totals)
-        plt.xlabel("Category")
-        plt.ylabel("Total Spent (£)")
-        plt.title("Expenses by Category (Bar Chart)")
-        plt.show()
-
-    # Line Chart
-    elif choice == 3:
-        expenses = database.get_all_expenses()
-        income = database.get_all_income()
-        if not expenses and not income:
-            print("No income or expenses to plot.")
-            return
-    
-        def sum_by_date(rows):
-            totals = defaultdict(float)
-            for row in rows:
-                date, amount = parse_date(row)
-                totals[date.date()] += amount
-            return totals
-        
-        expense_totals = sum_by_date(expenses)
-        income_totals = sum_by_date(income)
-
-        # Full date range
-        all_dates = sorted(set(expense_totals) | set(income_totals))
-        if not all_dates:
-            print("No valid dates to plot.")
-            return
-        start, end = all_dates[0], all_dates[-1]
-        full_range = [start + timedelta(days=i) for i in range((end - start).days + 1)]
-
-        # Cumulative sums
-        expense_values, income_values = [], []
-        running_expense = running_income = 0
-        for d in full_range:
-            running_expense += expense_totals.get(d, 0)
-            running_income += income_totals.get(d, 0)
-            expense_values.append(running_expense)
-            income_values.append(running_income)
-
-        # Plot line chart
-        plt.figure(figsize=(10,5))
-        plt.plot(full_range, expense_values, label="Expenses", marker='o', color='tab:blue')
-        plt.plot(full_range, income_values, label="Income", marker='s', color='tab:orange')
-        plt.xlabel("Date")
-        plt.ylabel("Amount (£)")
-        plt.title("Income vs Expenses Over Time")
-        plt.legend()
-        plt.grid(True, linestyle='--', alpha=0.6)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.show()
+    if path is None:
+        return cached
+    shutil.copyfile(cached, path)
+    return path
@@ -0,0 +1,143 @@
+import csv
+import gzip
+import math
+import time
+from dataclasses import dataclass, field
+import database.database as database
+from models.expense import Expense
+from models.income import Income
+from utils import to_datetime
+
+"""Streaming CSV import of bank statements and exported ledgers, with validation and dedupe"""
+
+# Default column mappings (field -> CSV header), matching the files written by export_to_csv
+EXPENSE_COLUMNS = {"name": "Name", "category": "Category", "amount": "Amount (£)", "date": "Date"}
+INCOME_COLUMNS = {"description": "Description", "amount": "Amount (£)", "date": "Date"}
+DEFAULT_COLUMNS = {"expenses": EXPENSE_COLUMNS, "income": INCOME_COLUMNS}
+
+CHUNK_SIZE = 5000 # Rows validated and inserted per batch
+PROGRESS_EVERY = 50000 # Rows between progress reports
+MAX_ERRORS_KEPT = 20 # Invalid-row messages kept for the final report
+
+
+@dataclass
+class ImportStats:
+    """Counts and timing for one imported file"""
+    path: str
+    read: int = 0
+    imported: int = 0
+    invalid: int = 0
+    errors: list[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    seconds: float = 0.0
+
+    @property
+    def duplicates(self) -> int:
+        """Valid rows that were skipped because they were already in the ledger"""
+        return self.read - self.invalid - self.imported
+
+    @property
+    def rows_per_second(self) -> float:
+        """Read throughput so far"""
+        elapsed = self.seconds or (time.perf_counter() - self.started)
+        return self.read / elapsed if elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.path}: {self.imported} imported, {self.duplicates} duplicates skipped, "
+            f"{self.invalid} invalid in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/sec)"
+        )
+
+
+def parse_amount(value) -> float:
+    """Parses an amount such as '£1,234.50', rejecting blanks, negatives and non-numbers"""
+    text = (value or "").strip().replace("£", "").replace(",", "")
+    if not text:
+        raise ValueError("missing amount")
+    amount = float(text)
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError(f"invalid amount '{value}'")
+    return amount
+
+def _open_input(path):
+    """Opens `path` for CSV reading, decompressing it if it ends in .gz (as written by export --gzip)"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode="rt", newline="", encoding="utf-8-sig")
+    return open(path, newline="", encoding="utf-8-sig")
+
+def _column(row, columns, name, required=True) -> str | None:
+    """Reads a mapped field from a CSV row"""
+    header = columns.get(name)
+    if header is None or header not in row:
+        if required:
+            raise ValueError(f"missing column for '{name}'")
+        return None
+    return row[header]
+
+def iter_records(
+    path, kind="expenses", columns=None, date_format=None, default_category=None, skip_invalid=False, stats=None
+):
+    """
+    Streams Expense or Income objects from a CSV file, validating each row.
+    Invalid rows raise ValueError, or are counted and skipped with skip_invalid.
+    """
+    if kind not in DEFAULT_COLUMNS:
+        raise ValueError(f"Unknown import kind '{kind}', expected 'expenses' or 'income'")
+    columns = {**DEFAULT_COLUMNS[kind], **(columns or {})}
+    stats = stats if stats is not None else ImportStats(path)
+    with _open_input(path) as file:
+        for line, row in enumerate(csv.DictReader(file), start=2):
+            stats.read += 1
+            try:
+                amount = parse_amount(_column(row, columns, "amount"))
+                # A row dated 'now' would get a new content hash on every import, so dates are required
+                date = to_datetime(_column(row, columns, "date"), date_format)
+                if date is None:
+                    raise ValueError("missing date")
+                if kind == "expenses":
+                    name = (_column(row, columns, "name") or "").strip()
+                    category = (_column(row, columns, "category", required=default_category is None) or "").strip()
+                    category = category or default_category
+                    if not name:
+                        raise ValueError("missing name")
+                    if not category:
+                        raise ValueError("missing category")
+                    yield Expense(name=name, amount=amount, category=category, date=date)
+                else:
+                    description = (_column(row, columns, "description") or "").strip()
+                    if not description:
+                        raise ValueError("missing description")
+                    yield Income(description=description, amount=amount, date=date)
+            except ValueError as e:
+                message = f"{path}, line {line}: {e}"
+                if not skip_invalid:
+                    raise ValueError(message) from e
+                stats.invalid += 1
+                if len(stats.errors) < MAX_ERRORS_KEPT:
+                    stats.errors.append(message)
+
+def _report_progress(records, stats, progress, every):
+    """Passes records through, calling progress(stats) every `every` rows read"""
+    next_report = every
+    for record in records:
+        yield record
+        if progress is not None and stats.read >= next_report:
+            progress(stats)
+            next_report += every
+
+def import_csv(path, kind="expenses", columns=None, date_format=None, default_category=None, skip_invalid=False,
+               chunk_size=CHUNK_SIZE, progress=None, progress_every=PROGRESS_EVERY) -> ImportStats:
+    """
+    Imports a CSV file in one pass and one transaction, holding only one chunk in memory.
+    `columns` overrides the default field -> header mapping, e.g. {"name": "Payee"}.
+    Rows whose date, amount and name/description are already in the ledger are
+    skipped, so importing an overlapping statement again only adds the new rows.
+    `progress`, if given, is called with the running ImportStats as rows are read.
+    """
+    stats = ImportStats(path)
+    records = iter_records(path, kind, columns, date_format, default_category, skip_invalid, stats)
+    records = _report_progress(records, stats, progress, progress_every)
+    add = database.add_expenses_bulk if kind == "expenses" else database.add_income_bulk
+    stats.imported = add(records, chunk_size=chunk_size, skip_duplicates=True)
+    stats.seconds = time.perf_counter() - stats.started
+    return stats
@@ -0,0 +1,227 @@
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+
+"""
+Opt-in timing instrumentation for the hot paths: database queries, parsing,
+exports and chart data preparation. Enable it with the EXPENSE_TRACKER_PROFILE
+environment variable or the CLI's --profile flag. Nothing is wrapped until it
+is enabled, so a normal session pays no overhead at all.
+"""
+
+PROFILE_ENV = "EXPENSE_TRACKER_PROFILE" # "1" for a summary table on exit, or a file path for a cProfile dump
+HISTOGRAM_BUCKETS = 32 # Latency buckets: [0, 1us), [1us, 2us), [2us, 4us), ... doubling each time
+
+# Functions wrapped when instrumentation is enabled, by module
+INSTRUMENTED = {
+    "database.database": [
+        "add_expense", "add_expenses_bulk", "get_all_expenses", "iter_expenses", "remove_expense",
+        "summarise_expenses", "add_income", "add_income_bulk", "get_all_income", "iter_income",
+        "remove_income", "get_total_income", "load_rows", "get_daily_totals", "get_monthly_totals",
+        "get_data_version", "get_categories", "iter_export_batches",
+        "aggregate_expenses", "aggregate_income", "query_expenses", "query_income",
+        "search_expenses", "search_income", "checkpoint", "ledger_at", "restore", "undo", "recover",
+        "get_archives", "archive_closed_years",
+    ],
+    "utils": ["parse_date", "parse_dates"],
+    "exporter": ["export_csv", "export_snapshot"],
+    "main": ["export_to_csv"],
+    "graphs": ["_load_chart_data", "_draw_chart", "render_chart"],
+    "timeseries": ["income_vs_expenses", "downsample"],
+    "ml_module": ["update", "forecast", "find_anomalies"],
+}
+# Functions whose integer result is the number of rows they processed
+COUNTS_ROWS = {"add_expenses_bulk", "add_income_bulk", "load_rows", "export_csv"}
+
+
+@dataclass
+class CallStats:
+    """Call count, rows processed and a latency histogram for one instrumented function"""
+    name: str
+    calls: int = 0
+    rows: int = 0
+    total: float = 0.0
+    slowest: float = 0.0
+    histogram: list[int] = field(default_factory=lambda: [0] * HISTOGRAM_BUCKETS)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, seconds, rows=0) -> None:
+        """Adds one call that took `seconds` and processed `rows` rows"""
+        bucket = min(int(seconds * 1_000_000).bit_length(), HISTOGRAM_BUCKETS - 1)
+        with self._lock:
+            self.calls += 1
+            self.rows += rows
+            self.total += seconds
+            self.slowest = max(self.slowest, seconds)
+            self.histogram[bucket] += 1
+
+    def percentile(self, fraction) -> float:
+        """Upper bound, in seconds, of the histogram bucket holding the given fraction of calls"""
+        target = fraction * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min((1 << bucket) / 1_000_000, self.slowest)
+        return self.slowest
+
+    @property
+    def mean(self) -> float:
+        """Average seconds per call"""
+        return self.total / self.calls if self.calls else 0.0
+
+
+_stats: dict[str, CallStats] = {}
+_patches = [] # (module, attribute, original) for everything replaced, so disable() can undo it
+_profiler = None
+
+
+def _record_rows(name, result) -> int:
+    """Works out how many rows a call returned or processed"""
+    if isinstance(result, list):
+        return len(result)
+    if name in COUNTS_ROWS and isinstance(result, int):
+        return result
+    return 0
+
+def _timed_iterator(stats, iterator):
+    """
+    Passes items through, timing only the work done producing them.
+    Each item counts as a row, or as len(item) rows when it is a batch (a list).
+    """
+    elapsed, rows = 0.0, 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            rows += len(item) if isinstance(item, list) else 1
+            yield item
+    finally:
+        stats.record(elapsed, rows)
+
+def _wrap(qualified_name, function):
+    """Returns a timing wrapper around `function` that reports into _stats"""
+    import inspect
+
+    stats = _stats.setdefault(qualified_name, CallStats(qualified_name))
+    name = function.__name__
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return _timed_iterator(stats, function(*args, **kwargs))
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            stats.record(time.perf_counter() - start, _record_rows(name, result))
+            return result
+    return wrapper
+
+def _project_modules() -> list:
+    """Loaded modules that belong to this project, where `from x import y` copies may live"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    return [
+        module for module in list(sys.modules.values())
+        if os.path.abspath(getattr(module, "__file__", None) or "/").startswith(root)
+    ]
+
+def _modules(module_name) -> list:
+    """
+    The loaded copies of a module to instrument. main.py may be running as __main__,
+    so that copy is included, and main is never imported just to be instrumented.
+    """
+    import importlib
+
+    if module_name != "main":
+        return [importlib.import_module(module_name)]
+    running = sys.modules.get("__main__")
+    copies = [sys.modules.get("main")]
+    if os.path.basename(getattr(running, "__file__", None) or "") == "main.py":
+        copies.append(running)
+    return [module for module in copies if module is not None]
+
+def is_enabled() -> bool:
+    """Returns True while instrumentation is installed"""
+    return bool(_patches) or _profiler is not None
+
+def enable(profile_path=None, report=True) -> None:
+    """
+    Wraps the INSTRUMENTED functions (including copies imported into other modules)
+    so every call is timed. With `profile_path`, also runs cProfile for the session
+    and writes a pstats file there on exit. With `report`, prints summary() to stderr on exit.
+    """
+    global _profiler
+
+    if is_enabled():
+        return
+    targets = [(module_name, module) for module_name in INSTRUMENTED for module in _modules(module_name)]
+    holders = _project_modules() # After the imports above, so every target module is included
+    for module_name, module in targets:
+        for name in INSTRUMENTED[module_name]:
+            original = getattr(module, name)
+            wrapper = _wrap(f"{module_name.split('.')[-1]}.{name}", original)
+            for holder in holders:
+                for attribute, value in list(vars(holder).items()):
+                    if value is original:
+                        setattr(holder, attribute, wrapper)
+                        _patches.append((holder, attribute, original))
+    if profile_path:
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(_on_exit, profile_path, report)
+
+def enable_from_env() -> None:
+    """Enables instrumentation if the EXPENSE_TRACKER_PROFILE environment variable asks for it"""
+    value = os.environ.get(PROFILE_ENV, "").strip()
+    if value and value != "0":
+        enable(profile_path=None if value.lower() in ("1", "true", "summary") else value)
+
+def disable() -> None:
+    """Restores the original functions and stops any cProfile run, keeping the collected stats"""
+    global _profiler
+    while _patches:
+        holder, attribute, original = _patches.pop()
+        setattr(holder, attribute, original)
+    if _profiler is not None:
+        _profiler.disable()
+    _profiler = None
+    atexit.unregister(_on_exit)
+
+def reset() -> None:
+    """Clears the collected stats"""
+    _stats.clear()
+
+def get_stats() -> dict[str, CallStats]:
+    """Returns the collected stats of every function called at least once"""
+    return {name: stats for name, stats in _stats.items() if stats.calls}
+
+def summary() -> str:
+    """Formats the collected stats as a table, slowest total first"""
+    lines = [f"{'function':<32} {'calls':>7} {'rows':>10} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for stats in sorted(get_stats().values(), key=lambda stats: stats.total, reverse=True):
+        lines.append(
+            f"{stats.name:<32} {stats.calls:>7,} {stats.rows:>10,} {stats.total * 1000:>10.2f} "
+            f"{stats.mean * 1000:>9.3f} {stats.percentile(0.95) * 1000:>9.3f} {stats.slowest * 1000:>9.3f}"
+        )
+    return "\n".join(lines)
+
+def _on_exit(profile_path, report) -> None:
+    """Writes the pstats file and/or prints the summary when the process exits"""
+    if profile_path and _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(profile_path)
+        print(f"Profile written to '{profile_path}' (view with: python -m pstats {profile_path})", file=sys.stderr)
+    if report and get_stats():
+        print(f"\n{summary()}", file=sys.stderr)
@@ -1,23 +1,47 @@
 from models.expense import Expense
-import csv
+import itertools
+import os
+import sys
 from models.income import Income
+from models.fields import validate_amount
 import database.database as database
-import matplotlib.pyplot as plt
+import exporter
 from typing import List, Tuple, Dict
 from collections import defaultdict
 from datetime import datetime, timedelta
 from graphs import plot_expense_summary
 from utils import (
     format_currency, 
-    print_formatted_entry, 
     get_user_choice, 
     get_float_input, 
     get_int_input, 
     safe_remove, 
     parse_date, 
+    print_paged,
     input_with_exit
 )
 
+PAGE_SIZE = 20 # Entries shown per page when listing expenses or income
+
+EXPENSE_CATEGORIES = [
+    "Food",
+    "Home",
+    "Work",
+    "Fun",
+    "Misc"
+]
+
+
+def input_amount(prompt) -> float | None:
+    """Prompts for an amount until a non-negative number is entered, or returns None if cancelled"""
+    while True:
+        amount = input_with_exit(prompt, cast=float)
+        if amount is None:
+            return None
+        try:
+            return validate_amount(amount)
+        except ValueError as error:
+            print(f"{error}. Please try again.")
 
 def get_expense_from_user() -> Expense | None:
     """
@@ -33,19 +57,13 @@ def get_expense_from_user() -> Expense | None:
     if expense_name is None:
         return None
 
-    expense_amount = input_with_exit("Enter expense amount", cast=float)
+    expense_amount = input_amount("Enter expense amount")
     if expense_amount is None:
         return None
 
     print(f"Expense name: {expense_name}, Expense amount: {expense_amount}")
     
-    expense_categories = [
-        "Food",
-        "Home",
-        "Work",
-        "Fun",
-        "Misc"
-    ]
+    expense_categories = EXPENSE_CATEGORIES
 
     while True:
         print("Select a category: ")
@@ -58,25 +76,27 @@ def get_expense_from_user() -> Expense | None:
             if selected_index is None:
                 return None
             selected_index -= 1
-        except ValueError:
-            print("Please enter a valid number.")
-            continue
-
-        if selected_index in range(len(expense_categories)):
+            if selected_index not in range(len(expense_categories)):
+                print(f"Invalid input. Please enter a number {value_range}.")
+                continue
             selected_category = expense_categories[selected_index]
             new_expense = Expense(
                 name=expense_name, category=selected_category, amount=expense_amount
             )
             return new_expense
-        else:
-            print(f"Invalid input. Please enter a number {value_range}.")
+        except ValueError as error:
+            print(f"{error}. Please try again.")
+            expense_amount = input_amount("Enter expense amount")
+            if expense_amount is None:
+                return None
 
 
-def summarise_expenses() -> None:
+def summarise_expenses(start=None, end=None) -> None:
     """
-    Retrieves and prints a summary of expenses grouped by category
+    Retrieves and prints a summary of expenses grouped by category,
+    optionally for a [start, end) period only
     """
-    summary = database.summarise_expenses()
+    summary = database.summarise_expenses(start, end)
     print("\nExpense Summary:")
     for category, total in summary:
         print(f"{category}: {format_currency(total)}")
@@ -86,10 +106,8 @@ def remove_expense_from_user() -> None:
     Displays all expenses and prompts the user to select one to remove by its ID
     Deleted the selected expense from the database
     """
-    all_expenses = database.get_all_expenses()
     print("\nAll Expenses:")
-    for exp in all_expenses:
-        print_formatted_entry(exp)
+    print_paged(database.iter_expenses(), PAGE_SIZE)
 
     expense_id = input_with_exit("Enter the ID of the expense to remove", cast=int)
     if expense_id is None:
@@ -98,40 +116,42 @@ def remove_expense_from_user() -> None:
 
     safe_remove(database.remove_expense, expense_id, "expense")
 
-def export_to_csv() -> None: 
-    """"Exports all expenses and income to CSV files"""
-    expenses = database.get_all_expenses()
-    income = database.get_all_income()
-
-    #Export expenses
-    with open("expenses.csv", mode="w", newline= "", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["ID", "Name", "Category", "Amount (£)", "Date"])
-        for exp in expenses:
-            try:
-                exp_id = exp.split(":")[0].strip()
-                name = exp.split(":")[1].split("(")[0].strip()
-                category = exp.split("(")[1].split(")")[0].strip()
-                amount = exp.split("£")[1].split("on")[0].strip()
-                date = exp.split("on")[1].strip(" []")
-                writer.writerow([exp_id, name, category, amount, date])
-            except Exception as e:
-                print(f"Failed to parse expense entry '{exp}': {e}")
-            
-    with open("income.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer =csv.writer(file)
-        writer.writerow(["ID", "Description", "Amount (£)", "Date"])
-        for inc in income:
-            try:
-                inc_id = inc.split(":")[0].strip()
-                description = inc.split(":")[1].split("-")[0].strip()
-                amount = inc.split("£")[1].split("on")[0].strip()
-                date = inc.split("on")[1].strip(" []")
-                writer.writerow([inc_id, description, amount, date])
-            except Exception as e:
-                print(f"Failed to parse income entry '{inc}': {e}")
-        
-    print("Exported expenses to 'expenses.csv' and income to 'income.csv'.")
+def export_to_csv(
+    expenses_path="expenses.csv", income_path="income.csv", start=None, end=None, category=None, compress=False
+) -> None:
+    """
+    Exports expenses and income to CSV files, streaming rows from the database.
+    Optionally limits both to a [start, end) date range and expenses to one category,
+    and gzip-compresses the output.
+    """
+    expense_count = exporter.export_csv("expenses", expenses_path, start, end, category, compress)
+    income_count = exporter.export_csv("income", income_path, start, end, compress=compress)
+    print(
+        f"Exported {expense_count} expenses to '{exporter.output_path(expenses_path, compress)}' "
+        f"and {income_count} income entries to '{exporter.output_path(income_path, compress)}'."
+    )
+
+def search_transactions() -> None:
+    """
+    Prompts for search text and prints the best matching expenses and income entries.
+    Words match as prefixes, so "cof" finds "Coffee".
+    """
+    text = input_with_exit("Enter words to search for", cast=str)
+    if text is None:
+        print("Cancelled search.")
+        return
+
+    expenses = database.search_expenses(text)
+    income = database.search_income(text)
+    if not expenses and not income:
+        print(f"Nothing matches '{text}'.")
+        return
+    if expenses:
+        print("\nMatching Expenses:")
+        print_paged(expenses, PAGE_SIZE)
+    if income:
+        print("\nMatching Income:")
+        print_paged(income, PAGE_SIZE)
 
 def manage_income() -> None:
     """
@@ -151,10 +171,8 @@ def manage_income() -> None:
 
         choice = get_user_choice("Select an option (1-4): ", options)
         if choice == '1':
-            all_income = database.get_all_income()
             print("\nAll Income:")
-            for inc in all_income:
-                print_formatted_entry(inc)
+            print_paged(database.iter_income(), PAGE_SIZE)
             total_income = database.get_total_income()
             print(f"Total Income: {format_currency(total_income)}")
         elif choice == '2':
@@ -163,18 +181,17 @@ def manage_income() -> None:
                 print("Cancelled adding income.")
                 continue
 
-            amount = input_with_exit("Enter income amount", cast=float)
+            amount = input_amount("Enter income amount")
             if amount is None:
                 print("Cancelled adding income.")
                 continue
 
-            database.add_income(description, amount)
+            income = Income(description, amount)
+            database.add_income(income.description, income.amount)
             print("Income added.")
         elif choice == '3':
-            all_income = database.get_all_income()
             print("\nAll Income:")
-            for inc in all_income:
-                print_formatted_entry(inc)
+            print_paged(database.iter_income(), PAGE_SIZE)
 
             income_id = input_with_exit("Enter the ID of the income to remove", cast=int)
             if income_id is None:
@@ -201,8 +218,9 @@ def main_menu() -> None:
         print("6. Manage Income")
         print("7. Export Data to CSV")
         print("8. Exit")
+        print("9. Search Transactions")
 
-        choice = get_user_choice("Select an option (1-8): ", [str(i) for i in range(1, 9)])
+        choice = get_user_choice("Select an option (1-9): ", [str(i) for i in range(1, 10)])
 
         if choice == "1":
             expense = get_expense_from_user()
@@ -216,13 +234,13 @@ def main_menu() -> None:
             remove_expense_from_user()
 
         elif choice == "3":
-            expenses = database.get_all_expenses()
-            if not expenses:
+            expenses = database.iter_expenses()
+            first = next(expenses, None)
+            if first is None:
                 print("No expenses recorded yet.")
             else:
                 print("\nAll Expenses:")
-                for exp in expenses:
-                    print(exp)
+                print_paged(itertools.chain([first], expenses), PAGE_SIZE)
 
         elif choice == "4":
             summary = database.summarise_expenses()
@@ -246,17 +264,32 @@ def main_menu() -> None:
             print("Exiting the Expense Tracker. Goodbye!")
             break
 
+        elif choice == "9": # After Exit, so scripted sessions that exit with 8 keep working
+            search_transactions()
+
         else:
-            print("❌ Invalid choice. Please select a number between 1 and 8.")
+            print("❌ Invalid choice. Please select a number between 1 and 9.")
 
-def main() -> None:
+def main(argv=None) -> int:
     """
-    Entry point for the Expense Tracker application
+    Entry point for the Expense Tracker application.
+    With command line arguments, runs the non-interactive CLI (see cli.py);
+    otherwise starts the interactive menu. Set EXPENSE_TRACKER_PROFILE to time
+    the session (see instrumentation.py).
     """
+    argv = sys.argv[1:] if argv is None else argv
+    if os.environ.get("EXPENSE_TRACKER_PROFILE"):
+        import instrumentation
+        instrumentation.enable_from_env()
+    if argv:
+        import cli
+        return cli.main(argv)
     print(f"Running Expense Tracker!")
     main_menu()
+    database.checkpoint() # Snapshot the ledger if enough has changed since the last snapshot
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
@@ -0,0 +1,267 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import numpy as np
+import database.database as database
+from models.expense import ExpenseRecord
+
+"""
+Spending forecasts and anomaly detection with NumPy only.
+The fitted state is folded in incrementally (only expenses added since the last update are
+read) and persisted next to the database, so scoring a fresh import never rereads the history.
+"""
+
+MODEL_VERSION = 1
+LOG_BINS = 360 # Histogram bins over log10(amount in pence) from 0 to LOG_MAX
+LOG_MAX = 9.0
+TREND_WEEKS = 26 # Recent complete weeks the trend line is fitted to
+MIN_SAMPLES = 20 # Expenses a category needs before its amounts are scored
+ANOMALY_THRESHOLD = 3.5 # |robust z| above this is flagged (Iglewicz and Hoaglin's cut-off)
+FOLD_BATCH_SIZE = 50_000
+
+BIN_WIDTH = LOG_MAX / LOG_BINS
+BIN_CENTRES = (np.arange(LOG_BINS) + 0.5) * BIN_WIDTH
+
+
+@dataclass
+class CategoryState:
+    """What has been learnt about one category: a log-amount histogram and weekly totals in pence"""
+    histogram: np.ndarray = field(default_factory=lambda: np.zeros(LOG_BINS, dtype=np.int64))
+    first_week: int | None = None
+    weekly: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    @property
+    def count(self) -> int:
+        """Expenses folded into this category"""
+        return int(self.histogram.sum())
+
+    def add_weeks(self, weeks, pence) -> None:
+        """Adds amounts into their weekly totals, growing the series to cover every week given"""
+        first, last = int(weeks.min()), int(weeks.max())
+        if self.first_week is not None:
+            first, last = min(first, self.first_week), max(last, self.first_week + len(self.weekly) - 1)
+        series = np.zeros(last - first + 1, dtype=np.int64)
+        if self.first_week is not None:
+            offset = self.first_week - first
+            series[offset:offset + len(self.weekly)] = self.weekly
+        np.add.at(series, weeks - first, pence)
+        self.first_week, self.weekly = first, series
+
+    def location_and_spread(self) -> tuple[float, float]:
+        """Median and median absolute deviation of log10(pence), read off the histogram"""
+        median = _weighted_median(BIN_CENTRES, self.histogram)
+        mad = _weighted_median(np.abs(BIN_CENTRES - median), self.histogram)
+        return median, max(mad, BIN_WIDTH)
+
+
+@dataclass
+class ModelState:
+    """Everything the forecasts and anomaly scores are computed from"""
+    last_expense_id: int = 0
+    last_day: int | None = None # Latest transaction day folded in, as days since 1970-01-01
+    categories: dict[str, CategoryState] = field(default_factory=dict)
+
+    @property
+    def count(self) -> int:
+        """Expenses folded in so far"""
+        return sum(category.count for category in self.categories.values())
+
+
+def _weighted_median(values, weights) -> float:
+    """Median of `values` repeated `weights` times"""
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    if cumulative[-1] == 0:
+        return 0.0
+    return float(values[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+def _log_bins(pence) -> np.ndarray:
+    """Histogram bin of each amount"""
+    logs = np.log10(np.maximum(pence, 1))
+    return np.minimum((logs / BIN_WIDTH).astype(np.int64), LOG_BINS - 1)
+
+def _week(days) -> np.ndarray:
+    """Week number (weeks start on Monday) of each day counted from 1970-01-01, a Thursday"""
+    return (np.asarray(days) + 3) // 7
+
+def _week_start(week) -> date:
+    """Monday that starts a week number"""
+    return date(1970, 1, 1) + timedelta(days=int(week) * 7 - 3)
+
+def model_path() -> str:
+    """Where the fitted state of the configured database is kept"""
+    return os.environ.get("EXPENSE_TRACKER_MODEL") or f"{database.get_db_path()}.model.json"
+
+def load_state(path=None) -> ModelState:
+    """Loads the persisted state, or returns an empty one if there is none yet"""
+    path = path or model_path()
+    if not os.path.exists(path):
+        return ModelState()
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    if data.get("version") != MODEL_VERSION:
+        return ModelState()
+    return ModelState(
+        last_expense_id=data["last_expense_id"],
+        last_day=data["last_day"],
+        categories={
+            name: CategoryState(
+                np.asarray(category["histogram"], dtype=np.int64),
+                category["first_week"],
+                np.asarray(category["weekly"], dtype=np.int64),
+            )
+            for name, category in data["categories"].items()
+        },
+    )
+
+def save_state(state, path=None) -> None:
+    """Persists the state atomically, so an interrupted save keeps the previous one"""
+    path = path or model_path()
+    data = {
+        "version": MODEL_VERSION,
+        "last_expense_id": state.last_expense_id,
+        "last_day": state.last_day,
+        "categories": {
+            name: {
+                "histogram": category.histogram.tolist(),
+                "first_week": category.first_week,
+                "weekly": category.weekly.tolist(),
+            }
+            for name, category in state.categories.items()
+        },
+    }
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+def _fold(state, rows) -> None:
+    """Adds (category, amount_pence, day) rows to the histograms and weekly totals"""
+    categories, pence, days = zip(*rows)
+    pence, days = np.asarray(pence, dtype=np.int64), np.asarray(days, dtype=np.int64)
+    labels, codes = np.unique(np.asarray(categories), return_inverse=True)
+    bins, weeks = _log_bins(pence), _week(days)
+    for code, label in enumerate(labels.tolist()):
+        mine = codes == code
+        category = state.categories.setdefault(label, CategoryState())
+        category.histogram += np.bincount(bins[mine], minlength=LOG_BINS)
+        category.add_weeks(weeks[mine], pence[mine])
+    state.last_day = int(days.max()) if state.last_day is None else max(state.last_day, int(days.max()))
+
+def update(state=None, path=None, save=True) -> ModelState:
+    """
+    Folds expenses added since the last update into the state and persists it.
+    Undated expenses can't be placed in a week, so they are left out.
+    If expenses that were already folded in have since been removed, the state
+    is rebuilt from scratch instead, since they can't be taken back out.
+    Expenses moved into yearly archives still count as stored and are read from there.
+    """
+    state = state if state is not None else load_state(path)
+    folded_still_stored = sum(
+        cursor.fetchone()[0]
+        for cursor in database.query_sources(
+            "SELECT COUNT(*) FROM {schema}.expenses WHERE id <= ? AND date IS NOT NULL", (state.last_expense_id,)
+        )
+    )
+    if folded_still_stored != state.count:
+        state = ModelState()
+
+    last_expense_id = state.last_expense_id
+    for cursor in database.query_sources(
+        "SELECT id, category, amount_pence, CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER)"
+        " FROM {schema}.expenses WHERE id > ? AND date IS NOT NULL ORDER BY id", (state.last_expense_id,)
+    ):
+        while batch := cursor.fetchmany(FOLD_BATCH_SIZE):
+            _fold(state, [row[1:] for row in batch])
+            last_expense_id = max(last_expense_id, batch[-1][0])
+    state.last_expense_id = last_expense_id
+    if save:
+        save_state(state, path)
+    return state
+
+def _month_factors(category) -> np.ndarray:
+    """
+    Relative spending in each calendar month (mean week in that month / mean week),
+    or all ones until a category has a full year of history
+    """
+    if len(category.weekly) < 52:
+        return np.ones(12)
+    months = np.asarray([_week_start(category.first_week + i).month - 1 for i in range(len(category.weekly))])
+    overall = category.weekly.mean()
+    if overall == 0:
+        return np.ones(12)
+    sums = np.bincount(months, weights=category.weekly, minlength=12)
+    counts = np.bincount(months, minlength=12)
+    return np.where(counts > 0, sums / np.maximum(counts, 1) / overall, 1.0)
+
+def forecast(weeks=4, state=None) -> dict[str, list[tuple[date, float]]]:
+    """
+    Forecasts each category's spending for `weeks` weeks, starting with the week of
+    the latest data unless it has ended (the partial week is forecast in full).
+    Fits a straight line to the last TREND_WEEKS complete weeks with monthly seasonality
+    removed, then projects it forward and puts the seasonality back.
+    Returns {category: [(week start Monday, forecast in pounds), ...]}
+    """
+    state = state if state is not None else load_state()
+    if state.last_day is None:
+        return {}
+    current_week = int(_week(state.last_day))
+    complete = current_week if (state.last_day + 3) % 7 != 6 else current_week + 1 # Sunday ends a week
+    future = np.arange(complete, complete + weeks)
+    result = {}
+    for name, category in sorted(state.categories.items()):
+        factors = _month_factors(category)
+        end = complete - category.first_week
+        start = max(0, end - TREND_WEEKS)
+        # A category that has gone quiet spent nothing in the weeks since its last expense
+        weekly = np.pad(category.weekly, (0, max(0, end - len(category.weekly))))
+        history = weekly[start:end].astype(np.float64)
+        x = np.arange(start, end)
+        months = np.asarray([_week_start(category.first_week + i).month - 1 for i in x], dtype=np.int64)
+        history = history / factors[months] if len(x) else history
+        if len(history) >= 2:
+            slope, intercept = np.polyfit(x, history, 1)
+        else:
+            slope, intercept = 0.0, float(history.mean()) if len(history) else 0.0
+        steps = future - category.first_week
+        future_months = np.asarray([_week_start(week).month - 1 for week in future], dtype=np.int64)
+        values = np.maximum(intercept + slope * steps, 0) * factors[future_months] / 100
+        result[name] = [(_week_start(week), round(float(value), 2)) for week, value in zip(future, values)]
+    return result
+
+def robust_z(category, amounts, state=None) -> np.ndarray:
+    """
+    Robust z-scores of amounts (in pounds) against a category's history, in log space:
+    0.6745 * (log10(pence) - median) / MAD. NaN where the category has too little history.
+    """
+    state = state if state is not None else load_state()
+    pence = np.round(np.asarray(amounts, dtype=np.float64) * 100)
+    known = state.categories.get(category)
+    if known is None or known.count < MIN_SAMPLES:
+        return np.full(len(pence), np.nan)
+    median, mad = known.location_and_spread()
+    return 0.6745 * (np.log10(np.maximum(pence, 1)) - median) / mad
+
+def find_anomalies(since_id=0, threshold=ANOMALY_THRESHOLD, state=None) -> list[tuple[ExpenseRecord, float]]:
+    """
+    Scores expenses with an id above `since_id` (e.g. a fresh import), including those
+    moved into yearly archives, against the fitted state without refitting, and returns
+    those with |robust z| > threshold, most unusual first
+    """
+    state = state if state is not None else load_state()
+    records = []
+    for cursor in database.query_sources(
+        f"SELECT {database.EXPENSE_COLUMNS} FROM {{schema}}.expenses WHERE id > ? ORDER BY id", (since_id,)
+    ):
+        while batch := cursor.fetchmany(FOLD_BATCH_SIZE):
+            by_category = {}
+            for row in batch:
+                by_category.setdefault(row[2], []).append(row)
+            for category, rows in by_category.items():
+                scores = robust_z(category, [row[3] for row in rows], state)
+                for row, score in zip(rows, scores.tolist()):
+                    if abs(score) > threshold: # NaN (too little history) never compares greater
+                        record = ExpenseRecord(*row[:4], database.parse_timestamp(row[4]))
+                        records.append((record, round(score, 2)))
+    return sorted(records, key=lambda pair: -abs(pair[1]))
@@ -1,13 +1,141 @@
-class Expense:
-    """Class representing an expense entry"""
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, NamedTuple
+from models.fields import validate_amount, validate_date
+
 
-    def __init__(self, name, amount, category) -> None:
-        """Initializes an Expense instance with name, amount, and category"""
-        self.name = name
-        self.amount = float(amount)
-        self.category = category
+@dataclass(frozen=True, slots=True)
+class Expense:
+    """Class representing an expense entry: an immutable value with a validated amount and date"""
+    name: str
+    amount: float
+    category: str
+    date: datetime | None = None
 
+    def __post_init__(self) -> None:
+        """Coerces the amount to a non-negative float and the date to a datetime"""
+        object.__setattr__(self, "amount", validate_amount(self.amount))
+        object.__setattr__(self, "date", validate_date(self.date))
 
     def __repr__(self) -> str:
         """Provides a string representation of the Expense instance"""
         return f"<Expense: {self.name}, {self.category}, £{self.amount:.2f} >"
+
+
+class ExpenseRecord(NamedTuple):
+    """A stored expense row with native field types"""
+    id: int
+    name: str
+    category: str
+    amount: float
+    date: datetime | None
+
+    def __str__(self) -> str:
+        """Formats the record for display"""
+        date = self.date if self.date is not None else ""
+        return f"{self.id}: {self.name} ({self.category}) - £{self.amount:,.2f} on [{date}]"
+
+
+class ExpenseBatch:
+    """
+    Column-oriented expenses for bulk work. Instead of one object per expense it
+    holds a list of names, int32 category codes into a list of category labels,
+    amounts as int64 pence and dates as int64 seconds since 1970-01-01 (naive, like
+    the stored dates, UNDATED for 'now'), each numeric column in one compact array.
+    """
+    UNDATED = -(2 ** 63) # Timestamp of rows without a date
+    __slots__ = ("names", "category_codes", "categories", "amounts_pence", "timestamps", "_category_index")
+
+    def __init__(self) -> None:
+        """Creates an empty batch"""
+        self.names = []
+        self.category_codes = array("i")
+        self.categories = []
+        self.amounts_pence = array("q")
+        self.timestamps = array("q")
+        self._category_index = {}
+
+    def _code(self, category) -> int:
+        """Returns the code for a category label, adding it the first time it is seen"""
+        code = self._category_index.get(category)
+        if code is None:
+            code = self._category_index[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    def append(self, name, amount, category, date=None) -> None:
+        """Adds one expense, validating its amount and date like Expense does"""
+        date = validate_date(date)
+        self.names.append(name)
+        self.category_codes.append(self._code(category))
+        self.amounts_pence.append(round(validate_amount(amount) * 100))
+        self.timestamps.append(self.UNDATED if date is None else int(date.replace(tzinfo=timezone.utc).timestamp()))
+
+    @classmethod
+    def from_expenses(cls, expenses: Iterable) -> "ExpenseBatch":
+        """Builds a batch from Expense objects (or anything with name, amount, category and date)"""
+        batch = cls()
+        for expense in expenses:
+            batch.append(expense.name, expense.amount, expense.category, getattr(expense, "date", None))
+        return batch
+
+    @classmethod
+    def from_columns(cls, names, categories, amounts_pence, timestamps) -> "ExpenseBatch":
+        """
+        Builds a batch straight from columns without creating an object per row.
+        `categories` holds one label per row; amounts are whole pence and dates epoch seconds,
+        as lists or NumPy arrays. Amounts must already be valid.
+        """
+        batch = cls()
+        batch.names = list(names)
+        batch.category_codes = array("i", [batch._code(category) for category in categories])
+        batch.amounts_pence = array("q", amounts_pence)
+        batch.timestamps = array("q", timestamps)
+        if not len(batch.names) == len(batch.category_codes) == len(batch.amounts_pence) == len(batch.timestamps):
+            raise ValueError("ExpenseBatch columns must all have the same length")
+        if batch.amounts_pence and min(batch.amounts_pence) < 0:
+            raise ValueError("Invalid amount, expected non-negative pence")
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[Expense]:
+        """Yields each row as an Expense, for code that needs objects"""
+        for name, code, pence, stamp in zip(self.names, self.category_codes, self.amounts_pence, self.timestamps):
+            date = None if stamp == self.UNDATED else datetime.fromtimestamp(stamp, timezone.utc).replace(tzinfo=None)
+            yield Expense(name, pence / 100, self.categories[code], date)
+
+    def total(self) -> float:
+        """Sum of every amount in pounds"""
+        return sum(self.amounts_pence) / 100
+
+    def rows(self, now=None) -> Iterator[tuple]:
+        """
+        Yields (name, category, amount_pence, 'YYYY-MM-DD HH:MM:SS') tuples ready for
+        database.load_rows; undated rows get `now`, or the current UTC time
+        """
+        now = now or datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        days = {} # Most rows share a day with others, so format each day once
+        for name, code, pence, stamp in zip(self.names, self.category_codes, self.amounts_pence, self.timestamps):
+            if stamp == self.UNDATED:
+                yield name, self.categories[code], pence, now
+                continue
+            day, seconds = divmod(stamp, 86400)
+            text = days.get(day)
+            if text is None:
+                text = days[day] = time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+            hours, seconds = divmod(seconds, 3600)
+            yield name, self.categories[code], pence, f"{text} {hours:02d}:{seconds // 60:02d}:{seconds % 60:02d}"
+
+    def to_numpy(self) -> dict:
+        """Returns the numeric columns as NumPy arrays sharing this batch's memory"""
+        import numpy as np
+
+        return {
+            "category_codes": np.frombuffer(self.category_codes, dtype=np.int32),
+            "amounts_pence": np.frombuffer(self.amounts_pence, dtype=np.int64),
+            "timestamps": np.frombuffer(self.timestamps, dtype=np.int64),
+        }
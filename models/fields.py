@@ -0,0 +1,20 @@
+import math
+from datetime import datetime
+from utils import to_datetime
+
+"""Validation shared by the expense and income models"""
+
+
+def validate_amount(value) -> float:
+    """Converts an amount to float, rejecting negative, infinite and NaN amounts"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount {value!r}") from None
+    if not math.isfinite(amount) or amount < 0:
+        raise ValueError(f"Invalid amount {value!r}, expected a non-negative number")
+    return amount
+
+def validate_date(value) -> datetime | None:
+    """Converts a date/datetime or ISO date string to a datetime; None (or blank) means 'now' when stored"""
+    return to_datetime(value)
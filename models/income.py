@@ -1,7 +1,33 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import NamedTuple
+from models.fields import validate_amount, validate_date
+
+
+@dataclass(frozen=True, slots=True)
 class Income:
-    def __init__(self, description, amount) -> None:
-        self.description = description
-        self.amount = amount
+    """An income entry: an immutable value with a validated amount and date"""
+    description: str
+    amount: float
+    date: datetime | None = None
+
+    def __post_init__(self) -> None:
+        """Coerces the amount to a non-negative float and the date to a datetime"""
+        object.__setattr__(self, "amount", validate_amount(self.amount))
+        object.__setattr__(self, "date", validate_date(self.date))
 
     def __repr__(self) -> str:
-        return f"Income(description={self.description}, amount={self.amount})"
\ No newline at end of file
+        return f"Income(description={self.description}, amount={self.amount})"
+
+
+class IncomeRecord(NamedTuple):
+    """A stored income row with native field types"""
+    id: int
+    description: str
+    amount: float
+    date: datetime | None
+
+    def __str__(self) -> str:
+        """Formats the record for display"""
+        date = self.date if self.date is not None else ""
+        return f"{self.id}: {self.description} - £{self.amount:,.2f} on [{date}]"
@@ -9,6 +9,7 @@ mock_db = MockDatabase(ne=500, ni=250)
 db.get_all_expenses = mock_db.get_all_expenses
 db.get_all_income = mock_db.get_all_income
 db.summarise_expenses = mock_db.summarise_expenses
+db.get_daily_totals = mock_db.get_daily_totals
 
 plt.show = plt.show  
 
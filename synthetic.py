@@ -0,0 +1,129 @@
+import argparse
+import numpy as np
+import database.database as database
+
+"""
+Vectorised synthetic ledger generator. Builds realistic expenses and income with NumPy
+and bulk loads them into a database file with the app's schema.
+Run from the project root: python -m synthetic --rows 1000000 --db data/synthetic.db
+"""
+
+# Each category has its own pool of names and a log-normal amount distribution
+# (median in pounds, spread), and is picked with the given probability.
+CATEGORY_PROFILES = {
+    "Food": (
+        ["Groceries", "Coffee", "Lunch", "Takeaway", "Bakery", "Supermarket", "Restaurant", "Snacks"], 0.38, 9.0, 0.8
+    ),
+    "Home": (
+        ["Rent", "Electricity", "Gas", "Water", "Council Tax", "Internet", "Furniture", "Cleaning"], 0.17, 60.0, 1.1
+    ),
+    "Work": (["Train", "Bus", "Parking", "Stationery", "Software", "Fuel"], 0.15, 12.0, 0.9),
+    "Fun": (["Cinema", "Concert", "Pub", "Books", "Games", "Gym", "Streaming", "Holiday"], 0.18, 18.0, 1.0),
+    "Misc": (["Gift", "Pharmacy", "Haircut", "Post Office", "Charity", "Clothes"], 0.12, 15.0, 1.0),
+}
+INCOME_SOURCES = ["Freelance", "Refund", "Interest", "Sold Item", "Cashback"]
+
+# Relative spending by month (Jan-Dec: a January lull, a summer bump, a December peak),
+# by weekday (Monday-Sunday) and by hour of the day
+MONTH_WEIGHTS = [0.85, 0.9, 0.95, 1.0, 1.0, 1.05, 1.15, 1.15, 1.0, 1.0, 1.1, 1.4]
+WEEKDAY_WEIGHTS = [0.85, 0.9, 0.95, 1.0, 1.2, 1.35, 1.1]
+HOUR_WEIGHTS = [0.1, 0.05, 0.02, 0.02, 0.02, 0.1, 0.4, 0.9, 1.3, 1.0, 0.9, 1.2,
+                1.8, 1.5, 1.0, 0.9, 1.0, 1.4, 1.7, 1.5, 1.2, 0.9, 0.5, 0.25]
+
+SALARY = 2400.0 # Paid on the 25th of every month, before any other income
+SALARY_DAY = 25
+
+
+def _day_weights(days) -> np.ndarray:
+    """Probability of a transaction falling on each datetime64[D] day"""
+    months = days.astype("datetime64[M]").astype(np.int64) % 12
+    weekdays = (days.astype(np.int64) + 3) % 7 # 1970-01-01 was a Thursday
+    weights = np.asarray(MONTH_WEIGHTS)[months] * np.asarray(WEEKDAY_WEIGHTS)[weekdays]
+    return weights / weights.sum()
+
+def _timestamps(rng, days, rows) -> np.ndarray:
+    """Draws `rows` sorted datetime64[s] timestamps on the weighted days and hours"""
+    day = rng.choice(days, size=rows, p=_day_weights(days))
+    hours = np.asarray(HOUR_WEIGHTS) / sum(HOUR_WEIGHTS)
+    seconds = rng.choice(24, size=rows, p=hours) * 3600 + rng.integers(0, 3600, rows)
+    return np.sort(day.astype("datetime64[s]") + seconds.astype("timedelta64[s]"))
+
+def _to_text(stamps) -> list[str]:
+    """Formats datetime64[s] values in the stored 'YYYY-MM-DD HH:MM:SS' form"""
+    return np.char.replace(np.datetime_as_string(stamps, unit="s"), "T", " ").tolist()
+
+def _pick(rng, pool_sizes, groups) -> np.ndarray:
+    """For each row, picks an index into the pool of its group, as an offset into the pools laid end to end"""
+    sizes = np.asarray(pool_sizes)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    return offsets[groups] + (rng.random(len(groups)) * sizes[groups]).astype(np.int64)
+
+def generate_expenses(rows, rng, days) -> tuple[list, list, np.ndarray, list]:
+    """Returns (names, categories, amounts in pence, dates) columns for `rows` expenses"""
+    categories = list(CATEGORY_PROFILES)
+    profiles = list(CATEGORY_PROFILES.values())
+    probabilities = np.asarray([profile[1] for profile in profiles])
+    category = rng.choice(len(categories), size=rows, p=probabilities / probabilities.sum())
+
+    vocabulary = np.asarray([name for profile in profiles for name in profile[0]])
+    names = vocabulary[_pick(rng, [len(profile[0]) for profile in profiles], category)]
+
+    medians = np.log([profile[2] for profile in profiles])
+    spreads = np.asarray([profile[3] for profile in profiles])
+    pence = np.maximum(np.round(rng.lognormal(medians[category], spreads[category]) * 100), 1).astype(np.int64)
+
+    return names.tolist(), np.asarray(categories)[category].tolist(), pence, _to_text(_timestamps(rng, days, rows))
+
+def generate_income(rows, rng, days) -> tuple[list, np.ndarray, list]:
+    """Returns (descriptions, amounts in pence, dates) columns: monthly salary, then occasional extras"""
+    month_starts = np.unique(days.astype("datetime64[M]")).astype("datetime64[D]")
+    paydays = month_starts + (SALARY_DAY - 1)
+    paydays = paydays[(paydays >= days[0]) & (paydays <= days[-1])][:rows]
+    extras = rows - len(paydays)
+
+    stamps = np.concatenate([paydays.astype("datetime64[s]") + np.timedelta64(9, "h"), _timestamps(rng, days, extras)])
+    sources = np.asarray(INCOME_SOURCES)[rng.integers(0, len(INCOME_SOURCES), extras)]
+    descriptions = np.concatenate([np.full(len(paydays), "Salary"), sources])
+    amounts = np.round(rng.lognormal(np.log(80), 1.0, extras) * 100)
+    pence = np.concatenate([np.full(len(paydays), round(SALARY * 100)), amounts]).astype(np.int64)
+
+    order = np.argsort(stamps, kind="stable")
+    return descriptions[order].tolist(), pence[order], _to_text(stamps[order])
+
+def generate_ledger(expenses=100_000, income=None, seed=42, start="2022-01-01", years=3) -> tuple[int, int]:
+    """
+    Generates a seeded synthetic ledger and bulk loads it into the configured database.
+    Transactions fall between `start` and `years` years later, weighted by season, weekday and
+    time of day. Income defaults to one entry per 20 expenses, salary first.
+    The same seed and arguments always produce the same ledger.
+    Returns (expenses added, income entries added)
+    """
+    income = max(expenses // 20, 1) if income is None else income
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(start, "D")
+    days = np.arange(first, first + np.timedelta64(round(365.25 * years), "D"))
+
+    names, categories, pence, dates = generate_expenses(expenses, rng, days)
+    descriptions, income_pence, income_dates = generate_income(income, rng, days)
+    with database.transaction():
+        added = database.load_rows("expenses", zip(names, categories, pence.tolist(), dates))
+        added_income = database.load_rows("income", zip(descriptions, income_pence.tolist(), income_dates))
+    return added, added_income
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic ledger into a database file")
+    parser.add_argument("--rows", type=int, default=100_000, help="expenses to generate")
+    parser.add_argument("--income", type=int, help="income entries to generate (default: rows / 20)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--start", default="2022-01-01", help="first day of the ledger")
+    parser.add_argument("--years", type=int, default=3, help="years the ledger spans")
+    parser.add_argument("--db", default=database.DEFAULT_DB_PATH, help="database file to load into")
+    args = parser.parse_args()
+
+    database.configure(args.db)
+    added, added_income = generate_ledger(args.rows, args.income, args.seed, args.start, args.years)
+    print(f"Added {added:,} expenses and {added_income:,} income entries to '{args.db}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import os
+import tempfile
+import unittest
+import database.database as db
+
+"""Shared set-up for tests that work against database files"""
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Gives each test a temporary folder and points the database module at a fresh
+    file named DB_NAME in it, restoring the previous path afterwards.
+    With DB_NAME set to None, tests choose their own files with db.configure
+    """
+    DB_NAME: str | None = "test.db"
+
+    def setUp(self) -> None:
+        """Create the temporary folder and configure the database file"""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.db_path = os.path.join(self.folder, self.DB_NAME) if self.DB_NAME else None
+        self.addCleanup(db.configure, db.get_db_path())
+        if self.db_path:
+            db.configure(self.db_path)
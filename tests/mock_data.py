@@ -1,6 +1,8 @@
 from faker import Faker
 import random
 from datetime import datetime
+from models.expense import ExpenseRecord
+from models.income import IncomeRecord
 
 fake = Faker()
 
@@ -39,16 +41,20 @@ def generate_fake_income(n=250):
 #simulate without touching real database
 def format_expenses_for_db(expenses):
     return [
-        f"{e['id']}: {e['name']} ({e['category']}) - £{e['amount']:.2f} on [{e['date']}]"
+        ExpenseRecord(e['id'], e['name'], e['category'], e['amount'], datetime.fromisoformat(e['date']))
         for e in expenses
     ]
 
 def format_income_for_db(income):
     return [
-        f"{i['id']}: {i['description']} - £{i['amount']:.2f} on [{i['date']}]"
+        IncomeRecord(i['id'], i['description'], i['amount'], datetime.fromisoformat(i['date']))
         for i in income
     ]
 
+def in_period(timestamp, start=None, end=None):
+    moment = datetime.fromisoformat(timestamp)
+    return (start is None or moment >= start) and (end is None or moment < end)
+
 class MockDatabase:
     def __init__(self, ne=500, ni=250):
         self._expenses = generate_fake_expenses(ne)
@@ -60,9 +66,25 @@ class MockDatabase:
     def get_all_income(self):
         return format_income_for_db(self._income)
 
-    def summarise_expenses(self):
+    def get_daily_totals(self, start=None, end=None):
+        days = {}
+        for e in self._expenses:
+            if not in_period(e["date"], start, end):
+                continue
+            day = datetime.fromisoformat(e["date"]).date()
+            days.setdefault(day, [0.0, 0.0])[0] += e["amount"]
+        for i in self._income:
+            if not in_period(i["date"], start, end):
+                continue
+            day = datetime.fromisoformat(i["date"]).date()
+            days.setdefault(day, [0.0, 0.0])[1] += i["amount"]
+        return [(day, expense, income) for day, (expense, income) in sorted(days.items())]
+
+    def summarise_expenses(self, start=None, end=None):
         sums = {}
         for e in self._expenses:
+            if not in_period(e["date"], start, end):
+                continue
             sums.setdefault(e["category"], 0.0)
             sums[e["category"]] += e["amount"]
         return list(sums.items())
@@ -0,0 +1,142 @@
+import contextlib
+import sqlite3
+import threading
+import unittest
+import database.database as db
+from database.cache import MISSING, QueryCache
+from models.expense import Expense
+from tests.base import DatabaseTestCase
+
+"""Unit tests for the query cache in cache.py and its use in database.py"""
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_lru_eviction_and_counters(self) -> None:
+        """Test the least recently used entry is evicted and hits/misses are counted"""
+        cache = QueryCache(maxsize=2)
+        cache.put("a", ["expenses"], 1)
+        cache.put("b", ["income"], 2)
+        self.assertEqual(cache.get("a"), 1) # "b" is now least recently used
+        cache.put("c", ["income"], 3)
+        self.assertIs(cache.get("b"), MISSING)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.evictions, info.size), (1, 1, 1, 2))
+
+    def test_invalidate_only_drops_affected_tables(self) -> None:
+        """Test invalidating one table keeps results read from others"""
+        cache = QueryCache()
+        cache.put("expenses", ["expenses"], 1)
+        cache.put("income", ["income"], 2)
+        cache.put("both", ["expenses", "income"], 3)
+        self.assertEqual(cache.invalidate("expenses"), 2)
+        self.assertEqual(cache.get("income"), 2)
+        self.assertIs(cache.get("both"), MISSING)
+
+    def test_result_computed_across_a_write_is_not_cached(self) -> None:
+        """Test a result whose tables were invalidated while it was computed is dropped, not cached"""
+        cache = QueryCache()
+        generation = cache.generation(["expenses"])
+        cache.invalidate("expenses") # A writer commits while the reader is still querying
+        cache.put("stale", ["expenses"], 1, generation)
+        self.assertIs(cache.get("stale"), MISSING)
+        generation = cache.generation(["income"])
+        cache.invalidate("expenses") # Other tables don't matter
+        cache.put("fresh", ["income"], 2, generation)
+        self.assertEqual(cache.get("fresh"), 2)
+        generation = cache.generation(["income"])
+        cache.clear()
+        cache.put("cleared", ["income"], 3, generation)
+        self.assertIs(cache.get("cleared"), MISSING)
+
+    def test_zero_size_disables(self) -> None:
+        """Test a maxsize of 0 caches nothing"""
+        cache = QueryCache(maxsize=0)
+        cache.put("a", ["expenses"], 1)
+        self.assertIs(cache.get("a"), MISSING)
+
+
+class TestCachedQueries(DatabaseTestCase):
+    DB_NAME = "cache.db"
+
+    def test_repeated_reads_hit_the_cache(self) -> None:
+        """Test a second read is served from the cache and returns an independent list"""
+        db.add_expense(Expense("Lunch", 10, "Food"))
+        first = db.get_categories()
+        first.clear()
+        before = db.cache_info()
+        self.assertEqual(db.get_categories(), ["Food"])
+        self.assertEqual(db.cache_info().hits, before.hits + 1)
+
+    def test_whole_ledger_reads_are_not_cached(self) -> None:
+        """Test get_all_expenses and get_all_income don't keep the ledger in the cache"""
+        db.add_expense(Expense("Lunch", 10, "Food"))
+        db.add_income("Salary", 100)
+        db.get_all_expenses()
+        db.get_all_income()
+        self.assertEqual(db.cache_info().size, 0)
+
+    def test_writes_invalidate_affected_queries(self) -> None:
+        """Test adding an expense refreshes expense reads but keeps income reads cached"""
+        db.add_income("Salary", 100)
+        self.assertEqual(db.summarise_expenses(), [])
+        self.assertEqual(db.get_total_income(), 100)
+        db.add_expense(Expense("Lunch", 10, "Food"))
+        before = db.cache_info()
+        self.assertEqual(db.summarise_expenses(), [("Food", 10.0)])
+        self.assertEqual(db.get_total_income(), 100)
+        after = db.cache_info()
+        self.assertEqual((after.misses - before.misses, after.hits - before.hits), (1, 1))
+        db.remove_expense(1)
+        self.assertEqual(db.summarise_expenses(), [])
+
+    def test_rolled_back_reads_are_dropped(self) -> None:
+        """Test reads made inside a rolled back transaction are not served afterwards"""
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.add_expense(Expense("Lunch", 10, "Food"))
+                self.assertEqual(db.summarise_expenses(), [("Food", 10.0)])
+                raise RuntimeError("abort")
+        self.assertEqual(db.summarise_expenses(), [])
+
+    def test_uncommitted_reads_are_not_shared(self) -> None:
+        """Test a read made inside another thread's open transaction isn't served to this one"""
+        db.add_expense(Expense("Tea", 1, "Food"))
+        read, checked = threading.Event(), threading.Event()
+        inside = []
+
+        def add_then_roll_back() -> None:
+            with contextlib.suppress(RuntimeError), db.transaction():
+                db.add_expense(Expense("Dinner", 100, "Food"))
+                inside.append(db.summarise_expenses())
+                read.set()
+                checked.wait(5)
+                raise RuntimeError("abort")
+
+        thread = threading.Thread(target=add_then_roll_back)
+        thread.start()
+        read.wait(5)
+        self.assertEqual(db.summarise_expenses(), [("Food", 1.0)])
+        checked.set()
+        thread.join()
+        self.assertEqual(inside, [[("Food", 101.0)]])
+        self.assertEqual(db.summarise_expenses(), [("Food", 1.0)])
+
+    def test_writes_from_other_connections_clear_the_cache(self) -> None:
+        """Test commits by another thread or process are noticed"""
+        self.assertEqual(db.get_total_income(), 0)
+        thread = threading.Thread(target=db.add_income, args=("Salary", 100))
+        thread.start()
+        thread.join()
+        self.assertEqual(db.get_total_income(), 100)
+
+        other = sqlite3.connect(self.db_path)
+        self.addCleanup(other.close)
+        other.execute(
+            "INSERT INTO income (description, amount_pence, date) VALUES ('Bonus', 500, '2025-01-01 00:00:00')"
+        )
+        other.commit()
+        self.assertEqual(db.get_total_income(), 105)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+import cli
+import database.database as db
+from tests.base import DatabaseTestCase
+
+"""Unit tests for the non-interactive CLI in cli.py"""
+
+class TestCli(DatabaseTestCase):
+    DB_NAME = "cli.db" # Passed to every command with --db
+
+    def run_cli(self, *args) -> tuple[int, str]:
+        """Runs the CLI and returns (exit code, stdout + stderr)"""
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(output):
+            code = cli.main(["--db", self.db_path, *args])
+        return code, output.getvalue()
+
+    def add_expense(self, name, amount, category, date) -> tuple[int, str]:
+        """Adds a dated expense through the CLI"""
+        return self.run_cli(
+            "add", "expense", "--name", name, "--amount", amount, "--category", category, "--date", date
+        )
+
+    def write_csv(self, name, text) -> str:
+        """Writes a CSV file into the test folder"""
+        path = os.path.join(self.folder, name)
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        return path
+
+    def test_add_and_summary(self) -> None:
+        """Test adding entries from arguments and printing a summary"""
+        code, _ = self.run_cli("add", "expense", "--name", "Lunch", "--amount", "10.5", "--category", "Food")
+        self.assertEqual(code, 0)
+        self.run_cli("add", "income", "--description", "Pay", "--amount", "1000", "--date", "2025-01-31 09:00:00")
+        code, output = self.run_cli("summary")
+        self.assertEqual(code, 0)
+        self.assertIn("Food: £10.50", output)
+        self.assertIn("Total Income: £1,000.00", output)
+        self.assertEqual(str(db.get_all_income()[0].date), "2025-01-31 09:00:00")
+
+    def test_negative_income_rejected(self) -> None:
+        """Test income goes through the Income model's validation like expenses do"""
+        code, output = self.run_cli("add", "income", "--description", "Refund", "--amount", "-50")
+        self.assertEqual(code, 1)
+        self.assertIn("Invalid amount", output)
+        self.assertEqual(db.get_all_income(), [])
+
+    def test_invalid_date_rejected(self) -> None:
+        """Test a malformed --date is reported by argparse instead of being stored"""
+        with self.assertRaises(SystemExit), redirect_stderr(io.StringIO()) as error:
+            cli.main([
+                "--db", self.db_path, "add", "expense",
+                "--name", "Lunch", "--amount", "10", "--category", "Food", "--date", "05/01/2025",
+            ])
+        self.assertIn("Invalid date '05/01/2025'", error.getvalue())
+
+    def test_summary_for_a_period(self) -> None:
+        """Test summaries can be limited to a month and grouped by day"""
+        self.add_expense("Lunch", "10", "Food", "2025-01-05")
+        self.add_expense("Rent", "500", "Home", "2025-02-01")
+        code, output = self.run_cli("summary", "--period", "2025-01", "--by", "day")
+        self.assertEqual(code, 0)
+        self.assertIn("2025-01-05: £10.00 (1 expenses)", output)
+        self.assertNotIn("2025-02-01", output)
+        self.assertIn("Total Income: £0.00", output)
+
+    def test_import_files_in_one_transaction(self) -> None:
+        """Test importing several exported-shape CSV files"""
+        first = self.write_csv("a.csv", "ID,Name,Category,Amount (£),Date\n1,Lunch,Food,10.00,2025-01-01 12:00:00\n")
+        second = self.write_csv("b.csv", "ID,Name,Category,Amount (£),Date\n2,Gym,Fun,40.00,2025-01-02\n")
+        code, output = self.run_cli("import", "expenses", first, second)
+        self.assertEqual(code, 0)
+        self.assertIn("Imported 2 expenses rows.", output)
+        self.assertEqual(db.summarise_expenses(), [("Food", 10.0), ("Fun", 40.0)])
+
+    def test_import_rolls_back_on_bad_row(self) -> None:
+        """Test a bad row in any file leaves the database unchanged"""
+        good = self.write_csv("good.csv", "ID,Description,Amount (£),Date\n1,Pay,100,2025-01-01\n")
+        bad = self.write_csv("bad.csv", "ID,Description,Amount (£),Date\n2,Pay,lots,2025-01-02\n")
+        code, output = self.run_cli("import", "income", good, bad)
+        self.assertEqual(code, 1)
+        self.assertIn("bad.csv, line 2", output)
+        self.assertEqual(db.get_all_income(), [])
+
+    def test_plot_without_data(self) -> None:
+        """Test plotting an empty ledger reports there is nothing to plot"""
+        self.assertEqual(self.run_cli("plot", "pie"), (1, "No data to plot.\n"))
+
+    def test_search(self) -> None:
+        """Test prefix search across expenses and income, with filters"""
+        self.add_expense("Coffee Shop", "3", "Food", "2025-01-05")
+        self.add_expense("Coffee Beans", "9", "Home", "2025-02-05")
+        self.run_cli("add", "income", "--description", "Coffee refund", "--amount", "3")
+        code, output = self.run_cli("search", "cof sho")
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            output.splitlines(), ["Expenses:", "  1: Coffee Shop (Food) - £3.00 on [2025-01-05 00:00:00]"]
+        )
+        code, output = self.run_cli("search", "coffee", "--category", "Home")
+        self.assertIn("Coffee Beans", output)
+        self.assertNotIn("Coffee Shop", output)
+        self.assertIn("Coffee refund", output)
+        self.assertEqual(self.run_cli("search", "tea"), (1, "Nothing matches 'tea'.\n"))
+
+    def test_journal_undo_and_restore(self) -> None:
+        """Test listing the journal, undoing a removal and restoring an earlier point"""
+        self.add_expense("Lunch", "10", "Food", "2025-01-05")
+        self.add_expense("Rent", "500", "Home", "2025-01-06")
+        code, output = self.run_cli("journal", "list")
+        self.assertEqual(code, 0)
+        self.assertRegex(output, r"^#1 .* add expenses 1: Lunch \(Food\) - £10.00\n#2 ")
+        self.assertIn("Undid #2", self.run_cli("journal", "undo")[1])
+        self.assertEqual(
+            self.run_cli("journal", "restore", "--seq", "2")[1], "Restored: 1 rows added back and 0 rows removed.\n"
+        )
+        self.assertEqual([r.name for r in db.get_all_expenses()], ["Lunch", "Rent"])
+
+    def test_archive(self) -> None:
+        """Test archiving closed years and listing the archives"""
+        self.assertEqual(self.run_cli("archive", "--list"), (0, "No years have been archived.\n"))
+        self.add_expense("Lunch", "10", "Food", "2023-01-05")
+        self.run_cli("add", "income", "--description", "Pay", "--amount", "1000", "--date", "2024-01-31")
+        self.assertEqual(self.run_cli("archive", "--before", "2025")[1], (
+            "Archived 2023: 1 expenses and 0 income entries.\n"
+            "Archived 2024: 0 expenses and 1 income entries.\n"
+        ))
+        self.assertEqual(self.run_cli("archive", "--before", "2025")[1], "No closed years left to archive.\n")
+        self.assertIn("2023: 1 expenses and 0 income entries in '", self.run_cli("archive", "--list")[1])
+        self.assertIn("Total Income: £1,000.00", self.run_cli("summary")[1])
+
+    def test_forecast_and_anomalies(self) -> None:
+        """Test forecasting, then scoring only the expenses added since the last run"""
+        self.assertEqual(self.run_cli("forecast"), (1, "No expenses to forecast from.\n"))
+        for day in range(1, 29):
+            self.add_expense("Lunch", str(9 + day % 3), "Food", f"2025-02-{day:02d}")
+        code, output = self.run_cli("forecast", "--weeks", "2")
+        self.assertEqual(code, 0)
+        self.assertIn("Food: w/c 2025-02-24: £", output)
+        self.assertEqual(self.run_cli("anomalies"), (0, "No unusual expenses found.\n"))
+        self.add_expense("Banquet", "300", "Food", "2025-03-01")
+        code, output = self.run_cli("anomalies")
+        self.assertIn("Banquet (Food) - £300.00", output)
+        self.assertEqual(self.run_cli("anomalies")[1], "No unusual expenses found.\n") # Already folded in
+
+
+if __name__ == "__main__":
+    unittest.main()
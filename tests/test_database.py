@@ -0,0 +1,587 @@
+import os
+import sqlite3
+import threading
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+import database.database as db
+from database import archive
+from database.migrations import MIGRATIONS, SCHEMA_VERSION, content_hash, get_schema_version, migrate
+from models.expense import Expense, ExpenseBatch, ExpenseRecord
+from models.income import Income, IncomeRecord
+from tests.base import DatabaseTestCase
+
+"""Unit tests for database.py functions"""
+
+class TestDatabase(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        """Point the database module at a fresh database file"""
+        super().setUp()
+        self.conn = db.get_connection()
+
+    def test_get_all_expenses_returns_records(self) -> None:
+        """Test expenses come back as typed records"""
+        db.add_expense(Expense("Lunch: on the go (large)", 10.5, "Food"))
+        records = db.get_all_expenses()
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertIsInstance(record, ExpenseRecord)
+        self.assertEqual(record.name, "Lunch: on the go (large)") # Separators survive
+        self.assertEqual(record.category, "Food")
+        self.assertEqual(record.amount, 10.5)
+        self.assertIsInstance(record.date, datetime)
+
+    def test_get_all_income_returns_records(self) -> None:
+        """Test income comes back as typed records"""
+        db.add_income("Salary - on time", 1500)
+        record = db.get_all_income()[0]
+        self.assertIsInstance(record, IncomeRecord)
+        self.assertEqual(record.description, "Salary - on time")
+        self.assertEqual(record.amount, 1500.0)
+        self.assertIsInstance(record.date, datetime)
+
+    def test_add_income_validates_amount(self) -> None:
+        """Test add_income rejects amounts the Income model rejects"""
+        for amount in (-50, float("nan"), "ten"):
+            with self.assertRaises(ValueError):
+                db.add_income("Refund", amount)
+        self.assertEqual(db.get_total_income(), 0.0)
+
+    def _insert_expenses(self) -> None:
+        """Insert a small ledger with fixed dates"""
+        self.conn.executemany(
+            "INSERT INTO expenses (name, category, amount_pence, date) VALUES (?, ?, ?, ?)",
+            [(f"Item {i}", "Food" if i % 2 else "Fun", i * 100, f"2025-01-{i:02d} 12:00:00") for i in range(1, 11)],
+        )
+
+    def test_iter_expenses_pages_through_all_rows(self) -> None:
+        """Test streaming returns every row in id order across batches"""
+        self._insert_expenses()
+        records = list(db.iter_expenses(batch_size=3))
+        self.assertEqual([r.id for r in records], list(range(1, 11)))
+
+    def test_iter_expenses_filters(self) -> None:
+        """Test date range, category and limit filters"""
+        self._insert_expenses()
+        records = list(db.iter_expenses(start=datetime(2025, 1, 3), end="2025-01-08", category="Food", batch_size=2))
+        self.assertEqual([r.id for r in records], [3, 5, 7])
+        limited = list(db.iter_expenses(limit=4, batch_size=3))
+        self.assertEqual([r.id for r in limited], [1, 2, 3, 4])
+
+    def test_iter_income_filters(self) -> None:
+        """Test streaming income with a date range"""
+        self.conn.executemany(
+            "INSERT INTO income (description, amount_pence, date) VALUES (?, ?, ?)",
+            [("Pay", 10000, "2025-01-01 09:00:00"), ("Pay", 20000, "2025-02-01 09:00:00")],
+        )
+        records = list(db.iter_income(start="2025-01-15"))
+        self.assertEqual([r.amount for r in records], [200.0])
+
+    def test_search_ranks_prefix_matches(self) -> None:
+        """Test search matches word prefixes, ranks closer matches first and follows removals"""
+        db.add_expenses_bulk([
+            ExpenseRecord(0, "Coffee beans and coffee filters", "Home", 12, datetime(2025, 1, 1)),
+            ExpenseRecord(0, "Coffee", "Food", 3, datetime(2025, 1, 2)),
+            ExpenseRecord(0, "Café Nero", "Food", 4, datetime(2025, 1, 3)),
+            ExpenseRecord(0, "Tea", "Food", 2, datetime(2025, 1, 4)),
+        ])
+        self.assertEqual([r.id for r in db.search_expenses("COF")], [2, 1])
+        self.assertEqual([r.name for r in db.search_expenses("cafe ne")], ["Café Nero"]) # Accents ignored
+        self.assertEqual([r.id for r in db.search_expenses("coffee", category="Home")], [1])
+        self.assertEqual([r.id for r in db.search_expenses("coffee", end="2025-01-02")], [1])
+        self.assertEqual(db.search_expenses("\"*"), []) # No words to search for
+        db.remove_expense(2)
+        self.assertEqual([r.id for r in db.search_expenses("coffee")], [1])
+        db.add_income("Coffee refund", 3)
+        self.assertEqual([r.description for r in db.search_income("ref")], ["Coffee refund"])
+
+    def test_search_lists_newest_when_too_many_match(self) -> None:
+        """Test very common words skip ranking and return the newest matches"""
+        db.add_expenses_bulk(ExpenseRecord(0, "Lunch", "Food", 5, datetime(2025, 1, 1)) for _ in range(30))
+        with patch.object(db, "RANK_LIMIT", 10):
+            self.assertEqual([r.id for r in db.search_expenses("lunch", limit=3)], [30, 29, 28])
+
+    def test_search_reads_archived_years(self) -> None:
+        """Test search finds rows moved into yearly archives, listed after the live ones, newest year first"""
+        db.add_expense(Expense("Coffee", 3, "Food", datetime(2023, 5, 1)))
+        db.add_expense(Expense("Coffee beans and coffee filters", 12, "Home", datetime(2024, 5, 1)))
+        db.add_expense(Expense("Coffee", 4, "Food", datetime(2025, 5, 1)))
+        db.add_income("Café refund", 3, datetime(2023, 6, 1))
+        db.archive_closed_years(before=2025)
+        self.assertEqual([r.id for r in db.search_expenses("coffee")], [3, 2, 1])
+        self.assertEqual([r.id for r in db.search_expenses("coffee", limit=2)], [3, 2])
+        self.assertEqual([r.id for r in db.search_expenses("coffee", category="Food")], [3, 1])
+        self.assertEqual([r.id for r in db.search_expenses("coffee", start="2024-01-01")], [3, 2])
+        self.assertEqual([r.description for r in db.search_income("cafe")], ["Café refund"])
+        with patch.object(db, "RANK_LIMIT", 2):
+            self.assertEqual([r.id for r in db.search_expenses("coffee")], [3, 2, 1])
+
+    def test_search_index_backfilled_on_upgrade(self) -> None:
+        """Test the search migration indexes rows that were already in the ledger"""
+        older = sqlite3.connect(":memory:")
+        self.addCleanup(older.close)
+        for migration in MIGRATIONS[:6]:
+            migration(older)
+        older.execute("PRAGMA user_version = 6")
+        older.execute(
+            "INSERT INTO expenses (name, category, amount_pence, date)"
+            " VALUES ('Train ticket', 'Work', 950, '2025-01-01 08:00:00')"
+        )
+        older.commit()
+        migrate(older)
+        matches = older.execute("SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH 'tick*'").fetchall()
+        self.assertEqual(matches, [(1,)])
+
+    def test_journal_records_adds_and_removes(self) -> None:
+        """Test every add and remove, including bulk loads, is journalled with the row's content"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2025, 1, 1)))
+        db.add_income_bulk([Income("Pay", 1000, datetime(2025, 1, 31))])
+        db.remove_expense(1)
+        entries = db.get_journal()
+        self.assertEqual([(e.seq, e.op, e.kind, e.row_id, e.name) for e in entries], [
+            (3, "remove", "expenses", 1, "Lunch"),
+            (2, "add", "income", 1, "Pay"),
+            (1, "add", "expenses", 1, "Lunch"),
+        ])
+        latest = entries[0]
+        self.assertEqual((latest.category, latest.amount, latest.date), ("Food", 10.0, datetime(2025, 1, 1)))
+        self.assertEqual(len(db.get_journal(limit=1)), 1)
+
+    def test_undo(self) -> None:
+        """Test undo reverts the latest changes in turn, and never undoes its own changes"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2025, 1, 1)))
+        db.add_expense(Expense("Rent", 500, "Home", datetime(2025, 1, 2)))
+        db.remove_expense(1)
+        self.assertEqual([e.seq for e in db.undo()], [3])
+        self.assertEqual(db.summarise_expenses(), [("Food", 10.0), ("Home", 500.0)]) # Lunch back, rollups too
+        self.assertEqual(db.get_all_expenses()[0].id, 1) # With its original id
+        self.assertEqual([e.seq for e in db.undo(5)], [2, 1])
+        self.assertEqual(db.get_all_expenses(), [])
+        self.assertEqual(db.undo(), [])
+        self.assertEqual([e.reverts for e in db.get_journal(3)], [1, 2, 3])
+
+    def test_point_in_time_from_snapshot(self) -> None:
+        """Test rebuilding and restoring earlier ledgers replays from the latest snapshot before them"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2025, 1, 1)))
+        db.add_income("Pay", 1000, datetime(2025, 1, 31))
+        self.assertEqual(db.checkpoint(), None) # Not due yet
+        self.assertEqual(db.checkpoint(force=True), 2)
+        db.remove_expense(1)
+        db.add_expense(Expense("Rent", 500, "Home", datetime(2025, 2, 1)))
+        self.conn.execute("DELETE FROM journal WHERE seq = 2") # Pay is now only reachable through the snapshot
+        self.conn.commit()
+
+        expenses, income = db.ledger_at(seq=3)
+        self.assertEqual((expenses, [r.description for r in income]), ([], ["Pay"]))
+        self.assertEqual([r.name for r in db.ledger_at()[0]], ["Rent"])
+        self.assertEqual([r.name for r in db.ledger_at(seq=1)[0]], ["Lunch"]) # Before the snapshot, from the start
+        self.assertEqual(db.ledger_at(at="2000-01-01"), ([], []))
+
+        self.assertEqual(db.restore(seq=2), (1, 1))
+        self.assertEqual([r.name for r in db.get_all_expenses()], ["Lunch"])
+        self.assertEqual(db.summarise_expenses(), [("Food", 10.0)])
+
+    def test_point_in_time_within_the_same_second(self) -> None:
+        """Test a time in the same second as a change includes it, though the journal keeps milliseconds"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2025, 1, 1)))
+        db.add_expense(Expense("Rent", 500, "Home", datetime(2025, 2, 1)))
+        self.conn.execute("UPDATE journal SET at = '2025-03-01 10:00:00.250' WHERE seq = 1")
+        self.conn.execute("UPDATE journal SET at = '2025-03-01 10:00:01.750' WHERE seq = 2")
+        self.conn.commit()
+        self.assertEqual([r.name for r in db.ledger_at(at="2025-03-01 10:00:00")[0]], ["Lunch"])
+        self.assertEqual(len(db.ledger_at(at="2025-03-01 10:00:01")[0]), 2)
+        self.assertEqual(db.ledger_at(at="2025-03-01 09:59:59"), ([], []))
+
+    def test_recover_into_new_file(self) -> None:
+        """Test the ledger rebuilt from the journal is written to a fresh database file"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2025, 1, 1)))
+        db.add_income("Pay", 1000, datetime(2025, 1, 31))
+        path = os.path.join(os.path.dirname(db.get_db_path()), "recovered.db")
+        self.assertEqual(db.recover(path), (1, 1))
+        with self.assertRaises(FileExistsError):
+            db.recover(path)
+        recovered = sqlite3.connect(path)
+        self.addCleanup(recovered.close)
+        rows = recovered.execute("SELECT id, name, amount_pence FROM expenses").fetchall()
+        self.assertEqual(rows, [(1, "Lunch", 1000)])
+        self.assertEqual(recovered.execute("SELECT * FROM category_totals").fetchall(), [("Food", 1000, 1)])
+
+    def test_recover_keeps_archived_years(self) -> None:
+        """Test rows moved into a yearly archive are rebuilt as archived, not as removed"""
+        db.add_expense(Expense("Lunch", 3.5, "Food", datetime(2023, 3, 1)))
+        db.add_expense(Expense("Dinner", 8, "Food", datetime(2026, 3, 1)))
+        db.archive_closed_years(before=2024)
+        self.assertEqual(db.checkpoint(force=True), 3) # Snapshots only copy the live file
+        self.assertEqual([r.name for r in db.ledger_at()[0]], ["Lunch", "Dinner"])
+        os.makedirs(os.path.join(self.folder, "salvage"))
+        path = os.path.join(self.folder, "salvage", "recovered.db")
+        self.assertEqual(db.recover(path), (1, 0))
+        db.configure(path)
+        self.assertEqual(db.summarise_expenses(), [("Food", 11.5)])
+        [(year, archive_path, expenses, income)] = db.get_archives()
+        self.assertEqual((year, expenses, income), (2023, 1, 0))
+        self.assertTrue(archive_path.startswith(archive.folder(path)))
+
+    def test_journal_backfilled_on_upgrade(self) -> None:
+        """Test the journal migration records the rows already in the ledger as added"""
+        older = sqlite3.connect(":memory:")
+        self.addCleanup(older.close)
+        for migration in MIGRATIONS[:7]:
+            migration(older)
+        older.execute("PRAGMA user_version = 7")
+        older.execute(
+            "INSERT INTO expenses (name, category, amount_pence, date)"
+            " VALUES ('Tea', 'Food', 250, '2025-01-01 08:00:00')"
+        )
+        older.execute(
+            "INSERT INTO income (description, amount_pence, date) VALUES ('Pay', 1000, '2025-01-01 09:00:00')"
+        )
+        older.commit()
+        migrate(older)
+        self.assertEqual(
+            older.execute("SELECT seq, op, kind, row_id, name, category FROM journal").fetchall(),
+            [(1, "add", "expenses", 1, "Tea", "Food"), (2, "add", "income", 1, "Pay", None)],
+        )
+
+    def _add_years(self) -> None:
+        """Adds expenses and income across 2023-2025, plus an undated expense"""
+        for year in [2023, 2024, 2025]:
+            db.add_expense(Expense("Lunch", 10, "Food", datetime(year, 3, 1)))
+            db.add_expense(Expense("Rent", 500, "Home", datetime(year, 12, 31, 23)))
+            db.add_income("Pay", 1000, datetime(year, 6, 30))
+        db.add_expense(Expense("Gift", 20, "Fun"))
+        self.conn.execute("UPDATE expenses SET date = NULL WHERE name = 'Gift'")
+        self.conn.commit()
+        db.clear_cache()
+
+    def test_archive_closed_years(self) -> None:
+        """Test closed years move to read-only files and reports across years are unchanged"""
+        self._add_years()
+        reports = lambda: (
+            db.summarise_expenses(), db.get_total_income(), db.get_monthly_totals(), db.get_categories(),
+            db.aggregate_expenses("month"), db.aggregate_income("month", start=datetime(2024, 6, 1)),
+            db.query_expenses(start=datetime(2023, 12, 1), end=datetime(2025, 4, 1)),
+            [row for batch in db.iter_export_batches("expenses") for row in batch],
+        )
+        before = reports()
+        self.assertEqual(db.archive_closed_years(before=2025), [(2023, 2, 1), (2024, 2, 1)])
+        live = sorted(r.name for r in db.get_all_expenses())
+        self.assertEqual(live, ["Gift", "Lunch", "Rent"]) # The live file keeps 2025
+        self.assertEqual(reports(), before)
+        self.assertEqual(db.get_daily_totals(start=datetime(2025, 1, 1)), [
+            (date(2025, 3, 1), 10.0, 0.0), (date(2025, 6, 30), 0.0, 1000.0), (date(2025, 12, 31), 500.0, 0.0),
+        ])
+        self.assertEqual(db.archive_closed_years(before=2025), []) # Nothing left to move
+
+        (year, path, expenses, income), _ = db.get_archives()
+        self.assertEqual((year, os.path.basename(path), expenses, income), (2023, "2023.db", 2, 1))
+        archived = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.addCleanup(archived.close)
+        totals = archived.execute("SELECT * FROM category_totals ORDER BY category").fetchall()
+        self.assertEqual(totals, [("Food", 1000, 1), ("Home", 50000, 1)])
+        indexes = {name for (name,) in archived.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        # For duplicate checks on import
+        self.assertTrue({"idx_expenses_content_hash", "idx_income_content_hash"} <= indexes)
+        with self.assertRaises(sqlite3.OperationalError):
+            archived.execute("DELETE FROM expenses")
+        # Only queries reaching into a year attach its archive
+        attached = lambda: [
+            name for _, name, _ in self.conn.execute("PRAGMA database_list") if name.startswith("archive_")
+        ]
+        db.configure(db.get_db_path())
+        self.conn = db.get_connection()
+        db.query_expenses(start=datetime(2024, 6, 1))
+        self.assertEqual(attached(), ["archive_2024"])
+
+    def test_archive_again_with_late_entries(self) -> None:
+        """Test entries added to an archived year later are merged into a new generation of its archive"""
+        self._add_years()
+        db.archive_closed_years(before=2024)
+        db.add_expense(Expense("Taxi", 30, "Travel", datetime(2023, 7, 1)))
+        self.assertEqual(db.aggregate_expenses("category", start=datetime(2023, 1, 1), end=datetime(2024, 1, 1)),
+                         [("Food", 10.0, 1), ("Home", 500.0, 1), ("Travel", 30.0, 1)])
+        self.assertEqual(db.archive_closed_years(before=2024), [(2023, 3, 1)])
+        (_, path, _, _), = db.get_archives()
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["2023.2.db"]) # The first generation is gone
+        self.assertEqual(db.aggregate_expenses("category", end=datetime(2024, 1, 1)),
+                         [("Food", 10.0, 1), ("Home", 500.0, 1), ("Travel", 30.0, 1)])
+        self.assertEqual([r.name for r in db.get_all_expenses() if r.date and r.date.year == 2023], [])
+
+    def test_remove_archived_row_is_refused(self) -> None:
+        """Test removing an expense or income entry that was archived reports it as read-only"""
+        self._add_years()
+        db.archive_closed_years(before=2024)
+        with self.assertRaisesRegex(ValueError, "read-only 2023 archive"):
+            db.remove_expense(1)
+        with self.assertRaisesRegex(ValueError, "read-only 2023 archive"):
+            db.remove_income(1)
+        db.remove_expense(999) # Ids that were never stored are still ignored
+        totals = db.summarise_expenses(start=datetime(2023, 1, 1), end=datetime(2024, 1, 1))
+        self.assertEqual(totals, [("Food", 10.0), ("Home", 500.0)])
+
+    def test_archive_uri_is_portable(self) -> None:
+        """Test archive URIs are well-formed file URIs, with special characters escaped"""
+        uri = archive.read_only_uri(os.path.join(os.sep, "my files", "2023#1.db"))
+        self.assertTrue(uri.startswith("file:///"))
+        self.assertTrue(uri.endswith("/my%20files/2023%231.db?mode=ro"))
+
+    def test_archived_rows_not_undone_or_restored(self) -> None:
+        """Test undo and restore leave rows that were archived in their archive"""
+        db.add_expense(Expense("Lunch", 10, "Food", datetime(2023, 3, 1)))
+        db.add_expense(Expense("Tea", 2, "Food", datetime(2025, 3, 1)))
+        db.archive_closed_years(before=2024)
+        self.assertEqual(db.get_journal(1)[0].op, "archive")
+        self.assertEqual([e.name for e in db.undo(5)], ["Tea"]) # Neither the archiving nor Lunch's add
+        self.assertEqual(db.restore(seq=2), (1, 0)) # Tea comes back, Lunch stays archived
+        self.assertEqual([r.name for r in db.get_all_expenses()], ["Tea"])
+        self.assertEqual(db.summarise_expenses(), [("Food", 12.0)])
+
+    def test_amounts_stored_in_pence(self) -> None:
+        """Test amounts are stored as integer pence and summed exactly"""
+        for _ in range(10):
+            db.add_expense(Expense("Sweets", 0.1, "Food"))
+        stored = self.conn.execute("SELECT DISTINCT amount_pence FROM expenses").fetchall()
+        self.assertEqual(stored, [(10,)])
+        self.assertEqual(db.summarise_expenses(), [("Food", 1.0)])
+
+    def test_migrate_upgrades_legacy_database(self) -> None:
+        """Test a version 0 database is upgraded in place"""
+        legacy = sqlite3.connect(":memory:")
+        self.addCleanup(legacy.close)
+        legacy.executescript("""
+            CREATE TABLE expenses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                amount REAL NOT NULL,
+                date TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE income (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                description TEXT NOT NULL,
+                amount REAL NOT NULL,
+                date TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO expenses (name, category, amount, date) VALUES ('Lunch', 'Food', 10.1, '2025-10-04');
+            INSERT INTO expenses (name, category, amount, date) VALUES ('Gym', 'Fun', 400, '2025-10-04 15:15:10');
+            DELETE FROM expenses WHERE id = 2;
+            INSERT INTO income (description, amount) VALUES ('Job', 1300.5);
+        """)
+        self.assertEqual(migrate(legacy), 0)
+        self.assertEqual(get_schema_version(legacy), SCHEMA_VERSION)
+        self.assertEqual(
+            legacy.execute("SELECT id, amount_pence, date FROM expenses").fetchall(),
+            [(1, 1010, "2025-10-04 00:00:00")],
+        )
+        self.assertEqual(legacy.execute("SELECT amount_pence FROM income").fetchall(), [(130050,)])
+        self.assertEqual(
+            legacy.execute("SELECT content_hash FROM expenses").fetchone()[0],
+            content_hash("2025-10-04 00:00:00", 1010, "Lunch"),
+        )
+        indexes = {row[0] for row in legacy.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn("idx_expenses_category_date", indexes)
+        legacy.execute("INSERT INTO expenses (name, category, amount_pence) VALUES ('Tea', 'Food', 250)")
+        self.assertEqual(legacy.execute("SELECT MAX(id) FROM expenses").fetchone(), (3,)) # Deleted id not reused
+        self.assertEqual(migrate(legacy), SCHEMA_VERSION) # Already up to date
+
+    def test_add_expenses_bulk(self) -> None:
+        """Test bulk insert across several chunks keeps given dates"""
+        records = [ExpenseRecord(0, f"Item {i}", "Food", 1.25, datetime(2025, 3, 1, 8, 0)) for i in range(7)]
+        self.assertEqual(db.add_expenses_bulk(records, chunk_size=3), 7)
+        self.assertFalse(self.conn.in_transaction) # Committed once at the end
+        stored = db.get_all_expenses()
+        self.assertEqual(len(stored), 7)
+        self.assertEqual({r.date for r in stored}, {datetime(2025, 3, 1, 8, 0)})
+        self.assertEqual(db.summarise_expenses(), [("Food", 8.75)])
+
+    def _derived_tables(self) -> list[list[tuple]]:
+        """Reads every table the insert triggers maintain"""
+        return [self.conn.execute(sql).fetchall() for sql in [
+            "SELECT * FROM category_totals ORDER BY category", "SELECT * FROM daily_totals ORDER BY day",
+            "SELECT * FROM monthly_totals ORDER BY month",
+            "SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH 'item'",
+            "SELECT rowid FROM income_fts WHERE income_fts MATCH 'pay'",
+            "SELECT op, kind, row_id, name, category, amount_pence, date FROM journal ORDER BY seq",
+        ]]
+
+    def test_bulk_insert_matches_row_by_row(self) -> None:
+        """Test bulk loads keep the rollups, search index and journal as one insert at a time does"""
+        expenses = [
+            Expense(f"Item {i}", i, ["Food", "Fun"][i % 2], datetime(2025, 1 + i % 3, 1 + i % 5)) for i in range(1, 26)
+        ]
+        income = [Income("Pay", 100 * i, datetime(2025, 1 + i % 3, 28)) for i in range(1, 6)]
+        for expense in expenses:
+            db.add_expense(expense)
+        for entry in income:
+            db.add_income(entry.description, entry.amount, entry.date)
+        row_by_row = self._derived_tables()
+
+        db.configure(os.path.join(os.path.dirname(db.get_db_path()), "bulk.db"))
+        self.conn = db.get_connection()
+        version = db.get_data_version()
+        db.add_expenses_bulk(expenses, chunk_size=10)
+        db.add_income_bulk(income, chunk_size=2)
+        self.assertEqual(self._derived_tables(), row_by_row)
+        self.assertGreater(db.get_data_version(), version)
+        db.add_expense(Expense("Item 26", 26, "Food", datetime(2025, 4, 1))) # The triggers are on again
+        self.assertEqual(db.summarise_expenses()[0], ("Food", 182.0))
+
+    def test_failed_bulk_insert_keeps_rollups_consistent(self) -> None:
+        """Test rows a failing chunk did insert are still rolled up, and the triggers come back on"""
+        rows = [("Lunch", "Food", 1000, "2025-01-01 12:00:00"), ("Broken", None, 500, "2025-01-02 12:00:00")]
+        with db.transaction():
+            with self.assertRaises(sqlite3.IntegrityError):
+                db.load_rows("expenses", rows)
+            self.assertEqual(self.conn.execute("SELECT active FROM bulk_load").fetchone(), (0,))
+            self.assertEqual(self.conn.execute("SELECT * FROM category_totals").fetchall(), [("Food", 1000, 1)])
+            self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM journal").fetchone(), (1,))
+
+    def test_add_income_bulk_defaults_date(self) -> None:
+        """Test bulk income insert fills in the current time when no date is given"""
+        self.assertEqual(db.add_income_bulk([Income("Pay", 10), Income("Bonus", 5.5)]), 2)
+        self.assertEqual(db.get_total_income(), 15.5)
+        self.assertTrue(all(r.date is not None for r in db.get_all_income()))
+
+    def test_transaction_commits_once(self) -> None:
+        """Test writes inside transaction() are only committed when the block exits"""
+        with db.transaction():
+            db.add_expense(Expense("Lunch", 10, "Food"))
+            db.add_income("Pay", 100)
+            self.assertTrue(self.conn.in_transaction)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(len(db.get_all_expenses()), 1)
+
+    def test_transaction_rolls_back_on_error(self) -> None:
+        """Test a failing transaction() block leaves no rows behind"""
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.add_expense(Expense("Lunch", 10, "Food"))
+                raise RuntimeError("feed failed")
+        self.assertEqual(db.get_all_expenses(), [])
+
+    def test_rollups_follow_inserts_and_removals(self) -> None:
+        """Test category, daily and monthly rollups are kept current by triggers"""
+        db.add_expenses_bulk([
+            ExpenseRecord(0, "Lunch", "Food", 10, datetime(2025, 1, 1, 12, 0)),
+            ExpenseRecord(0, "Cinema", "Fun", 12.5, datetime(2025, 1, 1, 20, 0)),
+            ExpenseRecord(0, "Dinner", "Food", 20, datetime(2025, 2, 3, 19, 0)),
+        ])
+        db.add_income_bulk([IncomeRecord(0, "Pay", 1000, datetime(2025, 1, 31, 9, 0))])
+        self.assertEqual(db.summarise_expenses(), [("Food", 30.0), ("Fun", 12.5)])
+        self.assertEqual(db.get_daily_totals(), [
+            (date(2025, 1, 1), 22.5, 0.0),
+            (date(2025, 1, 31), 0.0, 1000.0),
+            (date(2025, 2, 3), 20.0, 0.0),
+        ])
+        self.assertEqual(db.get_monthly_totals(), [("2025-01", 22.5, 1000.0), ("2025-02", 20.0, 0.0)])
+        self.assertEqual(db.get_total_income(), 1000.0)
+
+        db.remove_expense(2)
+        db.remove_income(1)
+        self.assertEqual(db.summarise_expenses(), [("Food", 30.0)]) # Empty categories disappear
+        self.assertEqual(db.get_daily_totals(), [(date(2025, 1, 1), 10.0, 0.0), (date(2025, 2, 3), 20.0, 0.0)])
+        self.assertEqual(db.get_total_income(), 0.0)
+
+    def test_rollups_backfilled_on_upgrade(self) -> None:
+        """Test the rollup migration includes rows that were already in the ledger"""
+        older = sqlite3.connect(":memory:")
+        self.addCleanup(older.close)
+        for migration in MIGRATIONS[:3]:
+            migration(older)
+        older.execute("PRAGMA user_version = 3")
+        older.execute(
+            "INSERT INTO expenses (name, category, amount_pence, date)"
+            " VALUES ('Tea', 'Food', 250, '2025-01-01 08:00:00')"
+        )
+        older.execute(
+            "INSERT INTO income (description, amount_pence, date) VALUES ('Pay', 1000, '2025-01-01 09:00:00')"
+        )
+        older.commit()
+        migrate(older)
+        self.assertEqual(older.execute("SELECT * FROM category_totals").fetchall(), [("Food", 250, 1)])
+        self.assertEqual(older.execute("SELECT * FROM daily_totals").fetchall(), [("2025-01-01", 250, 1, 1000, 1)])
+
+    def test_connection_pragmas(self) -> None:
+        """Test connections use WAL journaling and the tuned pragmas"""
+        self.assertEqual(self.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(self.conn.execute("PRAGMA temp_store").fetchone()[0], 2) # MEMORY
+
+    def test_each_thread_gets_own_connection(self) -> None:
+        """Test a reader thread is not blocked by an open write transaction"""
+        results = []
+
+        def read() -> None:
+            results.append((db.get_connection() is self.conn, len(db.get_all_expenses())))
+
+        with db.transaction():
+            db.add_expense(Expense("Lunch", 10, "Food"))
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(timeout=5)
+        self.assertEqual(results, [(False, 0)]) # Reader saw the last committed state
+        self.assertEqual(len(db.get_all_expenses()), 1)
+
+    def test_record_display_format(self) -> None:
+        """Test records keep the familiar display string"""
+        record = ExpenseRecord(12, "Lunch", "Food", 1234.5, datetime(2025, 10, 7, 9, 21, 49))
+        self.assertEqual(str(record), "12: Lunch (Food) - £1,234.50 on [2025-10-07 09:21:49]")
+        income = IncomeRecord(1, "Job", 1300, datetime(2025, 10, 4, 15, 10, 58))
+        self.assertEqual(str(income), "1: Job - £1,300.00 on [2025-10-04 15:10:58]")
+
+
+    def test_bulk_insert_from_batch(self) -> None:
+        """Test an ExpenseBatch is stored like the expenses it holds, including dedupe"""
+        expenses = [
+            Expense("Lunch", 12.5, "Food", datetime(2025, 1, 2, 12, 30)),
+            Expense("Gym", 40, "Fun", datetime(2025, 1, 3)),
+        ]
+        self.assertEqual(db.add_expenses_bulk(ExpenseBatch.from_expenses(expenses)), 2)
+        stored = [(r.name, r.amount, r.date) for r in db.get_all_expenses()]
+        self.assertEqual(stored, [(e.name, e.amount, e.date) for e in expenses])
+        self.assertEqual(db.add_expenses_bulk(expenses, skip_duplicates=True), 0)
+
+    def _insert_ledger(self) -> None:
+        """Insert expenses and income across two months"""
+        db.add_expenses_bulk([
+            Expense("Lunch", 10, "Food", datetime(2025, 1, 6, 12)), # Monday
+            Expense("Dinner", 25, "Food", datetime(2025, 1, 12, 19)), # Sunday, same week
+            Expense("Gym", 40, "Fun", datetime(2025, 1, 13, 7)),
+            Expense("Rent", 500, "Home", datetime(2025, 2, 1)),
+        ])
+        db.add_income_bulk([Income("Pay", 1000, datetime(2025, 1, 31)), Income("Pay", 1000, datetime(2025, 2, 28))])
+
+    def test_aggregate_expenses_groupings(self) -> None:
+        """Test totals by day, week (keyed by Monday), month and category"""
+        self._insert_ledger()
+        self.assertEqual(db.aggregate_expenses("month"), [("2025-01", 75.0, 3), ("2025-02", 500.0, 1)])
+        weeks = db.aggregate_expenses("week", end=datetime(2025, 2, 1))
+        self.assertEqual(weeks, [("2025-01-06", 35.0, 2), ("2025-01-13", 40.0, 1)])
+        self.assertEqual(db.aggregate_expenses("category")[0], ("Food", 35.0, 2))
+        self.assertEqual(db.aggregate_income("month"), [("2025-01", 1000.0, 1), ("2025-02", 1000.0, 1)])
+        with self.assertRaises(ValueError):
+            db.aggregate_income("category")
+
+    def test_rollup_and_sql_aggregates_agree(self) -> None:
+        """Test the rollup fast path gives the same answer as grouping the rows in SQL"""
+        self._insert_ledger()
+        for by in ["day", "week", "month"]:
+            from_rollups = db.aggregate_expenses(by, datetime(2025, 1, 7), datetime(2025, 2, 2))
+            from_rows = db.aggregate_expenses(by, datetime(2025, 1, 7), datetime(2025, 2, 2), min_amount=0)
+            self.assertEqual(from_rollups, from_rows)
+
+    def test_filters_push_down(self) -> None:
+        """Test date, category and amount filters on queries, summaries and totals"""
+        self._insert_ledger()
+        january = (datetime(2025, 1, 1), datetime(2025, 2, 1))
+        self.assertEqual([r.name for r in db.query_expenses(*january, category="Food")], ["Lunch", "Dinner"])
+        self.assertEqual([r.name for r in db.query_expenses(min_amount=25, max_amount=40)], ["Dinner", "Gym"])
+        self.assertEqual([r.name for r in db.query_expenses(limit=1)], ["Lunch"])
+        self.assertEqual(db.summarise_expenses(*january), [("Food", 35.0), ("Fun", 40.0)])
+        self.assertEqual(db.get_total_income(*january), 1000.0)
+        self.assertEqual(db.get_total_income(), 2000.0)
+        self.assertEqual([r.amount for r in db.query_income(start=datetime(2025, 2, 1))], [1000.0])
+        self.assertEqual([day for day, _, _ in db.get_daily_totals(*january)][-1], date(2025, 1, 31))
+
+if __name__ == "__main__":
+    unittest.main()
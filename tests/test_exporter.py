@@ -0,0 +1,127 @@
+import csv
+import gzip
+import os
+import unittest
+from datetime import datetime
+import database.database as db
+import exporter
+import importer
+from models.expense import Expense
+from tests.base import DatabaseTestCase
+
+"""Unit tests for exporter.py functions"""
+
+class TestExporter(DatabaseTestCase):
+    DB_NAME = "export.db"
+
+    def setUp(self) -> None:
+        """Export from a fresh database file"""
+        super().setUp()
+        db.add_expenses_bulk([
+            Expense("Lunch on Friday (team)", 12.5, "Food", datetime(2025, 1, 3, 12, 0)),
+            Expense("Gym", 40, "Fun", datetime(2025, 1, 10)),
+            Expense("Dinner, £ split", 1234.5, "Food", datetime(2025, 2, 1)),
+        ])
+        db.add_income("Salary", 1500, date=datetime(2025, 1, 31))
+
+    def read_rows(self, path, opener=open) -> list[list[str]]:
+        """Reads an exported file back as rows"""
+        with opener(path, "rt", newline="", encoding="utf-8") as file:
+            return list(csv.reader(file))
+
+    def test_export_writes_typed_columns(self) -> None:
+        """Test the header, quoting and two-decimal amounts"""
+        path = os.path.join(self.folder, "expenses.csv")
+        self.assertEqual(exporter.export_csv("expenses", path), 3)
+        rows = self.read_rows(path)
+        self.assertEqual(rows[0], exporter.EXPENSE_HEADER)
+        self.assertEqual(rows[1], ["1", "Lunch on Friday (team)", "Food", "12.50", "2025-01-03 12:00:00"])
+        self.assertEqual(rows[3][1:4], ["Dinner, £ split", "Food", "1234.50"])
+
+    def test_export_filters(self) -> None:
+        """Test the date range is half-open and the category filter applies"""
+        path = os.path.join(self.folder, "expenses.csv")
+        count = exporter.export_csv(
+            "expenses", path, start=datetime(2025, 1, 3), end=datetime(2025, 2, 1), category="Food"
+        )
+        self.assertEqual(count, 1)
+        self.assertEqual([row[1] for row in self.read_rows(path)[1:]], ["Lunch on Friday (team)"])
+        with self.assertRaises(ValueError):
+            exporter.export_csv("income", path, category="Food")
+
+    def test_gzip_export_round_trips(self) -> None:
+        """Test gzip output gets a .gz suffix and both gzip and plain exports import back as duplicates"""
+        path = os.path.join(self.folder, "income.csv")
+        self.assertEqual(exporter.export_csv("income", path, compress=True), 1)
+        rows = self.read_rows(path + ".gz", gzip.open)
+        self.assertEqual(rows[1], ["1", "Salary", "1500.00", "2025-01-31 00:00:00"])
+        stats = importer.import_csv(path + ".gz", kind="income")
+        self.assertEqual((stats.read, stats.imported), (1, 0))
+
+        plain = os.path.join(self.folder, "expenses.csv")
+        exporter.export_csv("expenses", plain)
+        self.assertEqual(importer.import_csv(plain).imported, 0)
+
+    def test_export_streams_in_batches(self) -> None:
+        """Test rows come from the cursor in batches of the requested size"""
+        batches = list(db.iter_export_batches("expenses", batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+
+    def check_snapshot(self, fmt) -> None:
+        """Round-trips a filtered snapshot in the given format"""
+        path = exporter.export_snapshot(
+            "expenses", os.path.join(self.folder, "snap"), start=datetime(2025, 1, 5), fmt=fmt
+        )
+        self.assertTrue(path.endswith(f".{fmt}"))
+        columns = exporter.load_snapshot(path)
+        self.assertEqual(columns["id"].tolist(), [2, 3])
+        self.assertEqual(list(columns["name"]), ["Gym", "Dinner, £ split"])
+        self.assertEqual(list(columns["category"]), ["Fun", "Food"])
+        self.assertEqual(columns["amount"].tolist(), [40.0, 1234.5])
+        self.assertEqual(str(columns["date"][0]), "2025-01-10T00:00:00")
+
+        encoded = exporter.load_snapshot(path, decode_categories=False)
+        self.assertEqual(list(encoded["categories"]), ["Food", "Fun"])
+        self.assertEqual(encoded["category"].tolist(), [1, 0])
+
+    def test_npz_snapshot_round_trips(self) -> None:
+        """Test the NumPy fallback snapshot"""
+        self.check_snapshot("npz")
+
+    def test_arrow_snapshot_round_trips(self) -> None:
+        """Test the Arrow IPC snapshot, read through a memory map"""
+        if exporter._pyarrow() is None:
+            self.skipTest("pyarrow is not installed")
+        self.check_snapshot("arrow")
+
+    def check_chunked_snapshot(self, fmt) -> None:
+        """Loads a snapshot of more than one export batch per batch and joined"""
+        db.add_expenses_bulk(Expense("Coffee", 3, "Food", datetime(2025, 3, 1)) for _ in range(db.EXPORT_BATCH_SIZE))
+        path = exporter.export_snapshot("expenses", os.path.join(self.folder, "big"), fmt=fmt)
+        chunked = exporter.load_snapshot(path, chunked=True)
+        self.assertEqual(len(chunked["id"]), 1 if fmt == "npz" else 2) # npz files are a single batch
+        self.assertEqual(sum(len(chunk) for chunk in chunked["amount"]), db.EXPORT_BATCH_SIZE + 3)
+        self.assertEqual(list(chunked["category"][-1][-2:]), ["Food", "Food"])
+        joined = exporter.load_snapshot(path)
+        self.assertEqual(joined["id"].tolist(), [i for chunk in chunked["id"] for i in chunk.tolist()])
+
+    def test_npz_snapshot_chunks(self) -> None:
+        """Test the NumPy snapshot loads as a single chunk"""
+        self.check_chunked_snapshot("npz")
+
+    def test_arrow_snapshot_chunks(self) -> None:
+        """Test Arrow snapshots load as one chunk per record batch"""
+        if exporter._pyarrow() is None:
+            self.skipTest("pyarrow is not installed")
+        self.check_chunked_snapshot("arrow")
+
+    def test_income_snapshot(self) -> None:
+        """Test income snapshots have a description column and no categories"""
+        path = exporter.export_snapshot("income", os.path.join(self.folder, "income"), fmt="npz")
+        columns = exporter.load_snapshot(path)
+        self.assertEqual(sorted(columns), ["amount", "date", "description", "id"])
+        self.assertEqual(list(columns["description"]), ["Salary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import database.database as db
+import graphs
+from models.expense import Expense, ExpenseRecord
+from models.income import IncomeRecord
+from tests.base import DatabaseTestCase
+
+"""Unit tests for headless chart rendering in graphs.py"""
+
+class TestRenderChart(DatabaseTestCase):
+
+    def setUp(self) -> None:
+        """Use a fresh database file and chart cache for each test"""
+        super().setUp()
+        self.cache_dir = os.path.join(self.folder, "cache")
+        db.add_expenses_bulk([
+            ExpenseRecord(0, "Lunch", "Food", 10, datetime(2025, 1, 1, 12, 0)),
+            ExpenseRecord(0, "Cinema", "Fun", 12.5, datetime(2025, 1, 3, 20, 0)),
+        ])
+        db.add_income_bulk([IncomeRecord(0, "Pay", 100, datetime(2025, 1, 2, 9, 0))])
+
+    def test_renders_each_chart_type(self) -> None:
+        """Test every chart renders to PNG and SVG files"""
+        for chart in graphs.CHART_TYPES:
+            png = graphs.render_chart(chart, cache_dir=self.cache_dir)
+            with open(png, "rb") as file:
+                self.assertEqual(file.read(8), b"\x89PNG\r\n\x1a\n")
+            svg = graphs.render_chart(chart, fmt="svg", cache_dir=self.cache_dir)
+            self.assertTrue(svg.endswith(".svg"))
+
+    def test_unchanged_data_served_from_cache(self) -> None:
+        """Test a second render reuses the file without loading data or drawing"""
+        first = graphs.render_chart("bar", cache_dir=self.cache_dir)
+        with patch("graphs._load_chart_data") as mock_load:
+            second = graphs.render_chart("bar", cache_dir=self.cache_dir)
+        self.assertEqual(first, second)
+        mock_load.assert_not_called()
+
+    def test_changed_data_rerenders(self) -> None:
+        """Test adding an expense invalidates the cached chart"""
+        first = graphs.render_chart("pie", cache_dir=self.cache_dir)
+        db.add_expense(Expense("Rent", 500, "Home"))
+        second = graphs.render_chart("pie", cache_dir=self.cache_dir)
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.exists(second))
+        self.assertFalse(os.path.exists(first)) # The older version is deleted
+
+    def test_other_charts_kept_when_rerendering(self) -> None:
+        """Test replacing a stale chart leaves other charts and options in the cache"""
+        pie = graphs.render_chart("pie", cache_dir=self.cache_dir)
+        weekly = graphs.render_chart("line", resolution="week", cache_dir=self.cache_dir)
+        db.add_expense(Expense("Rent", 500, "Home"))
+        daily = graphs.render_chart("line", cache_dir=self.cache_dir)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), sorted(map(os.path.basename, [pie, weekly, daily])))
+        weekly_again = graphs.render_chart("line", resolution="week", cache_dir=self.cache_dir)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), sorted(map(os.path.basename, [pie, weekly_again, daily])))
+
+    def test_copies_to_output_path(self) -> None:
+        """Test the chart is copied to a requested output path"""
+        target = os.path.join(self.folder, "report.png")
+        self.assertEqual(graphs.render_chart("line", path=target, cache_dir=self.cache_dir), target)
+        self.assertTrue(os.path.getsize(target) > 0)
+
+    def test_no_data(self) -> None:
+        """Test nothing is rendered for an empty ledger"""
+        db.configure(os.path.join(self.folder, "empty.db"))
+        self.assertIsNone(graphs.render_chart("pie", cache_dir=self.cache_dir))
+
+    def test_unknown_chart(self) -> None:
+        """Test invalid chart names are rejected"""
+        with self.assertRaises(ValueError):
+            graphs.render_chart("scatter", cache_dir=self.cache_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
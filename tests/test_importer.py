@@ -0,0 +1,130 @@
+import os
+import unittest
+from datetime import datetime
+import database.archive as archive
+import database.database as db
+import exporter
+import importer
+from models.expense import Expense
+from tests.base import DatabaseTestCase
+
+"""Unit tests for importer.py functions"""
+
+STATEMENT = """Name,Category,Amount (£),Date
+Coffee,Food,3.20,2025-01-01 08:00:00
+Coffee,Food,3.20,2025-01-01 08:00:00
+Train,Work,"£1,204.50",2025-01-02 07:30:00
+"""
+
+class TestImporter(DatabaseTestCase):
+    DB_NAME = "import.db"
+
+    def write_csv(self, name, text) -> str:
+        """Writes a CSV file into the test folder"""
+        path = os.path.join(self.folder, name)
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        return path
+
+    def test_import_coerces_values(self) -> None:
+        """Test amounts with £ and commas and ISO dates are coerced"""
+        stats = importer.import_csv(self.write_csv("s.csv", STATEMENT))
+        self.assertEqual((stats.read, stats.imported, stats.duplicates, stats.invalid), (3, 3, 0, 0))
+        train = db.get_all_expenses()[-1]
+        self.assertEqual((train.amount, train.date), (1204.5, datetime(2025, 1, 2, 7, 30)))
+
+    def test_reimport_is_idempotent(self) -> None:
+        """Test importing the same and an overlapping statement only adds new rows"""
+        path = self.write_csv("s.csv", STATEMENT)
+        importer.import_csv(path)
+        again = importer.import_csv(path)
+        self.assertEqual((again.imported, again.duplicates), (0, 3))
+        overlap = self.write_csv("o.csv", STATEMENT + "Lunch,Food,8.00,2025-01-03 12:00:00\n")
+        stats = importer.import_csv(overlap)
+        self.assertEqual((stats.imported, stats.duplicates), (1, 3))
+        self.assertEqual(len(db.get_all_expenses()), 4) # Both identical coffees kept once each
+
+    def test_duplicates_of_manual_entries_skipped(self) -> None:
+        """Test rows matching expenses added through the app are recognised"""
+        db.add_expense(Expense("Coffee", 3.2, "Food", date=datetime(2025, 1, 1, 8, 0)))
+        stats = importer.import_csv(self.write_csv("s.csv", STATEMENT))
+        self.assertEqual((stats.imported, stats.duplicates), (2, 1))
+
+    def test_reimport_after_archiving_is_idempotent(self) -> None:
+        """Test rows already moved into a yearly archive are recognised as duplicates"""
+        path = self.write_csv("s.csv", STATEMENT + "Lunch,Food,8.00,2026-01-03 12:00:00\n")
+        importer.import_csv(path)
+        self.assertEqual(db.archive_closed_years(before=2026), [(2025, 3, 0)])
+        stats = importer.import_csv(path)
+        self.assertEqual((stats.imported, stats.duplicates), (0, 4))
+        income = self.write_csv("i.csv", "Description,Amount (£),Date\nPay,100,2025-06-30\n")
+        importer.import_csv(income, kind="income")
+        db.archive_closed_years(before=2026)
+        self.assertEqual(importer.import_csv(income, kind="income").imported, 0)
+        self.assertEqual(db.summarise_expenses(), [("Food", 14.4), ("Work", 1204.5)])
+
+    def test_reimport_export_with_many_archived_years(self) -> None:
+        """Test re-importing an export spanning more archived years than stay attached at once"""
+        years = range(2010, 2010 + archive.ARCHIVES_ATTACHED + 3)
+        for year in years:
+            db.add_expense(Expense("Rent", 500, "Home", datetime(year, 6, 1)))
+        db.add_expense(Expense("Lunch", 8, "Food", datetime(2026, 1, 3)))
+        self.assertEqual(len(db.archive_closed_years(before=2026)), len(years))
+        path = os.path.join(self.folder, "all.csv")
+        exporter.export_csv("expenses", path)
+        stats = importer.import_csv(path)
+        self.assertEqual((stats.imported, stats.duplicates), (0, len(years) + 1))
+        with db.transaction(): # Archives are read while a write is still open
+            db.add_expense(Expense("Coffee", 3, "Food", datetime(2026, 1, 4)))
+            with self.assertRaisesRegex(ValueError, "read-only 2010 archive"):
+                db.remove_expense(1)
+            self.assertEqual(len(db.query_expenses()), len(years) + 2)
+
+    def test_column_mapping_and_date_format(self) -> None:
+        """Test a bank statement with its own headers, date format and no category"""
+        path = self.write_csv("bank.csv", "Date,Payee,Debit\n03/02/2025,Corner Shop,4.99\n")
+        stats = importer.import_csv(
+            path, columns={"name": "Payee", "amount": "Debit"}, date_format="%d/%m/%Y", default_category="Misc"
+        )
+        self.assertEqual(stats.imported, 1)
+        record = db.get_all_expenses()[0]
+        self.assertEqual((record.name, record.category, record.date), ("Corner Shop", "Misc", datetime(2025, 2, 3)))
+
+    def test_invalid_rows(self) -> None:
+        """Test invalid rows abort the import, or are skipped and reported with skip_invalid"""
+        path = self.write_csv("bad.csv", STATEMENT + "Refund,Food,-5,2025-01-04\n,Food,1,2025-01-04\n")
+        with self.assertRaises(ValueError):
+            importer.import_csv(path)
+        self.assertEqual(db.get_all_expenses(), []) # Nothing committed
+        stats = importer.import_csv(path, skip_invalid=True)
+        self.assertEqual((stats.imported, stats.invalid), (3, 2))
+        self.assertIn("line 5", stats.errors[0])
+
+    def test_dateless_rows_rejected(self) -> None:
+        """Test rows without a date are invalid, since they could not be recognised on a re-import"""
+        path = self.write_csv(
+            "undated.csv", "Name,Category,Amount (£),Date\nCoffee,Food,3.20,\nTea,Food,2.00,2025-01-01\n"
+        )
+        with self.assertRaisesRegex(ValueError, "line 2: missing date"):
+            importer.import_csv(path)
+        stats = importer.import_csv(path, skip_invalid=True)
+        self.assertEqual((stats.imported, stats.invalid), (1, 1))
+        self.assertEqual(importer.import_csv(path, skip_invalid=True).imported, 0)
+        with self.assertRaisesRegex(ValueError, "missing column for 'date'"):
+            importer.import_csv(self.write_csv("no-dates.csv", "Name,Category,Amount (£)\nCoffee,Food,3.20\n"))
+
+    def test_income_import_and_progress(self) -> None:
+        """Test importing income reports progress as it goes"""
+        rows = "".join(f"Pay {i},{i}.00,2025-01-{i:02d}\n" for i in range(1, 11))
+        path = self.write_csv("income.csv", "Description,Amount (£),Date\n" + rows)
+        reports = []
+        stats = importer.import_csv(
+            path, kind="income", chunk_size=3, progress=lambda s: reports.append(s.read), progress_every=4
+        )
+        self.assertEqual(stats.imported, 10)
+        self.assertEqual(reports, [4, 8])
+        self.assertEqual(db.get_total_income(), 55.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
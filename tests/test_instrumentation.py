@@ -0,0 +1,55 @@
+import unittest
+import database.database as db
+import instrumentation
+import utils
+from models.expense import Expense
+from tests.base import DatabaseTestCase
+
+"""Unit tests for instrumentation.py functions"""
+
+class TestInstrumentation(DatabaseTestCase):
+    DB_NAME = "profile.db"
+
+    def setUp(self) -> None:
+        """Instrument calls against a fresh database file"""
+        super().setUp()
+        self.original = db.get_all_expenses
+        instrumentation.reset()
+        instrumentation.enable(report=False)
+        self.addCleanup(instrumentation.reset)
+        self.addCleanup(instrumentation.disable)
+
+    def test_records_calls_rows_and_latency(self) -> None:
+        """Test calls, returned rows and streamed rows are counted"""
+        db.add_expenses_bulk([Expense("Lunch", 10, "Food"), Expense("Gym", 40, "Fun")])
+        db.get_all_expenses()
+        db.get_all_expenses()
+        self.assertEqual(sum(1 for _ in db.iter_expenses(batch_size=1)), 2)
+        utils.parse_date("1: Lunch (Food) - £10.00 on [2025-01-01]")
+
+        stats = instrumentation.get_stats()
+        self.assertEqual((stats["database.get_all_expenses"].calls, stats["database.get_all_expenses"].rows), (2, 4))
+        self.assertEqual(stats["database.add_expenses_bulk"].rows, 2)
+        self.assertEqual((stats["database.iter_expenses"].calls, stats["database.iter_expenses"].rows), (1, 2))
+        self.assertEqual(stats["utils.parse_date"].calls, 1)
+        self.assertEqual(sum(stats["database.get_all_expenses"].histogram), 2)
+        self.assertIn("database.get_all_expenses", instrumentation.summary())
+
+    def test_disable_restores_originals(self) -> None:
+        """Test disabling puts the unwrapped functions back, so nothing is timed any more"""
+        self.assertIsNot(db.get_all_expenses, self.original)
+        instrumentation.disable()
+        self.assertIs(db.get_all_expenses, self.original)
+        self.assertFalse(instrumentation.is_enabled())
+
+    def test_percentile_uses_histogram_buckets(self) -> None:
+        """Test percentiles come from the doubling latency buckets, capped at the slowest call"""
+        stats = instrumentation.CallStats("example")
+        for seconds in [0.000003] * 19 + [0.010]:
+            stats.record(seconds)
+        self.assertEqual(stats.percentile(0.5), 0.000004)
+        self.assertEqual(stats.percentile(1.0), 0.010)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import unittest
+from datetime import date, datetime, timedelta
+import numpy as np
+import database.database as db
+import ml_module
+from models.expense import Expense
+from tests.base import DatabaseTestCase
+
+"""Unit tests for ml_module.py functions"""
+
+class TestMlModule(DatabaseTestCase):
+    DB_NAME = "ml.db"
+
+    def setUp(self) -> None:
+        """Fit against a fresh database file with a steady weekly Food habit"""
+        super().setUp()
+        self.model_path = os.path.join(self.folder, "model.json")
+        first = datetime(2025, 1, 6, 12) # A Monday
+        rng = np.random.default_rng(1)
+        db.add_expenses_bulk(
+            Expense("Lunch", f"{amount:.2f}", "Food", first + timedelta(days=day))
+            for day, amount in enumerate(rng.lognormal(np.log(10), 0.2, 70))
+        )
+
+    def test_update_is_incremental_and_persisted(self) -> None:
+        """Test only new rows are folded in and the state round-trips through its file"""
+        state = ml_module.update(path=self.model_path)
+        self.assertEqual(state.count, 70)
+        db.add_expense(Expense("Dinner", "20", "Food", datetime(2025, 3, 17, 19)))
+        state = ml_module.update(path=self.model_path)
+        self.assertEqual(state.count, 71)
+        self.assertEqual(state.last_expense_id, 71)
+        loaded = ml_module.load_state(self.model_path)
+        self.assertEqual(loaded.count, 71)
+        np.testing.assert_array_equal(loaded.categories["Food"].weekly, state.categories["Food"].weekly)
+
+    def test_update_rebuilds_after_removal(self) -> None:
+        """Test removing an expense that was folded in triggers a refit without it"""
+        ml_module.update(path=self.model_path)
+        db.remove_expense(1)
+        self.assertEqual(ml_module.update(path=self.model_path).count, 69)
+
+    def test_update_keeps_archived_history(self) -> None:
+        """Test archiving a closed year neither triggers a refit nor loses its expenses from one"""
+        db.add_expenses_bulk(
+            Expense("Lunch", "10", "Food", datetime(2024, 6, 1) + timedelta(days=day)) for day in range(30)
+        )
+        fitted = ml_module.update(path=self.model_path)
+        self.assertEqual(fitted.count, 100)
+        db.archive_closed_years(before=2025)
+        state = ml_module.update(path=self.model_path)
+        self.assertEqual((state.count, state.last_expense_id), (100, 100))
+        np.testing.assert_array_equal(state.categories["Food"].weekly, fitted.categories["Food"].weekly)
+        db.remove_expense(1) # Forces a refit, which reads the archive too
+        self.assertEqual(ml_module.update(path=self.model_path).count, 99)
+
+    def test_forecast_follows_the_weekly_level(self) -> None:
+        """Test a flat habit forecasts a flat week starting after the latest data"""
+        forecast = ml_module.forecast(3, ml_module.update(path=self.model_path))
+        weeks = forecast["Food"]
+        self.assertEqual([week for week, _ in weeks], [date(2025, 3, 17), date(2025, 3, 24), date(2025, 3, 31)])
+        for _, amount in weeks:
+            self.assertAlmostEqual(amount, 70.7, delta=10) # Seven lunches of about £10
+
+    def test_forecast_copes_with_a_category_gone_quiet(self) -> None:
+        """Test a category with no recent weeks is forecast from its empty weeks rather than failing"""
+        first = datetime(2025, 1, 6, 12)
+        db.add_expenses_bulk(Expense("Lunch", "10", "Food", first + timedelta(days=day)) for day in range(70, 120))
+        db.add_expenses_bulk(Expense("Cinema", "15", "Fun", first + timedelta(days=day)) for day in range(0, 56, 2))
+        forecast = ml_module.forecast(2, ml_module.update(path=self.model_path))
+        self.assertEqual(set(forecast), {"Food", "Fun"})
+        self.assertEqual([week for week, _ in forecast["Fun"]], [week for week, _ in forecast["Food"]])
+        for _, amount in forecast["Fun"]:
+            self.assertLess(amount, 15) # Well below the £52.50 a week it spent while active
+
+    def test_find_anomalies_scores_only_new_rows(self) -> None:
+        """Test a large new expense is flagged against the existing fit and a normal one is not"""
+        state = ml_module.update(path=self.model_path)
+        db.add_expense(Expense("Banquet", "400", "Food", datetime(2025, 3, 17)))
+        db.add_expense(Expense("Lunch", "11", "Food", datetime(2025, 3, 18)))
+        db.add_expense(Expense("Gym", "500", "Fun", datetime(2025, 3, 18))) # No history to judge it by
+        anomalies = ml_module.find_anomalies(state.last_expense_id, state=state)
+        self.assertEqual([record.name for record, _ in anomalies], ["Banquet"])
+        self.assertGreater(anomalies[0][1], ml_module.ANOMALY_THRESHOLD)
+        self.assertEqual(len(ml_module.find_anomalies(state.last_expense_id + 1, state=state)), 0)
+
+    def test_find_anomalies_reads_archived_years(self) -> None:
+        """Test expenses moved into a yearly archive are still scored"""
+        db.add_expense(Expense("Banquet", "400", "Food", datetime(2024, 12, 20)))
+        state = ml_module.update(path=self.model_path)
+        db.archive_closed_years(before=2025)
+        anomalies = ml_module.find_anomalies(state=state)
+        self.assertEqual([(record.name, record.date) for record, _ in anomalies], [("Banquet", datetime(2024, 12, 20))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import math
+import unittest
+from dataclasses import FrozenInstanceError
+from datetime import date, datetime
+import numpy as np
+from models.expense import Expense, ExpenseBatch
+from models.income import Income
+
+"""Unit tests for the expense and income models"""
+
+class TestModels(unittest.TestCase):
+
+    def test_expense_coerces_and_validates(self) -> None:
+        """Test amounts become floats, dates datetimes, and bad values are rejected"""
+        expense = Expense("Lunch", "12.5", "Food", "2025-01-02 12:30:00")
+        self.assertEqual((expense.amount, expense.date), (12.5, datetime(2025, 1, 2, 12, 30)))
+        self.assertEqual(Expense("Rent", 500, "Home", date(2025, 1, 1)).date, datetime(2025, 1, 1))
+        for amount in [-1, math.inf, math.nan, "lots", None]:
+            with self.assertRaises(ValueError):
+                Expense("Lunch", amount, "Food")
+        with self.assertRaises(ValueError):
+            Expense("Lunch", 1, "Food", "yesterday")
+
+    def test_income_validates_amount(self) -> None:
+        """Test income amounts are coerced like expenses"""
+        self.assertEqual(Income("Salary", "1500").amount, 1500.0)
+        with self.assertRaises(ValueError):
+            Income("Salary", -5)
+
+    def test_models_are_slotted_values(self) -> None:
+        """Test models have no per-instance dict, can't be changed and compare by value"""
+        expense = Expense("Lunch", 12.5, "Food")
+        self.assertFalse(hasattr(expense, "__dict__"))
+        with self.assertRaises(FrozenInstanceError):
+            expense.amount = 1
+        self.assertEqual(expense, Expense("Lunch", 12.5, "Food"))
+        self.assertEqual(repr(expense), "<Expense: Lunch, Food, £12.50 >")
+
+    def test_batch_round_trips(self) -> None:
+        """Test a batch encodes categories once and gives back the same expenses"""
+        expenses = [
+            Expense("Lunch", 12.5, "Food", datetime(2025, 1, 2, 12, 30, 5)),
+            Expense("Gym", 40, "Fun", datetime(2025, 1, 3)),
+            Expense("Coffee", 3.2, "Food", datetime(2025, 1, 3, 8)),
+        ]
+        batch = ExpenseBatch.from_expenses(expenses)
+        self.assertEqual((len(batch), batch.categories, list(batch.category_codes)), (3, ["Food", "Fun"], [0, 1, 0]))
+        self.assertEqual(list(batch), expenses)
+        self.assertEqual(batch.total(), 55.7)
+        self.assertEqual(next(batch.rows()), ("Lunch", "Food", 1250, "2025-01-02 12:30:05"))
+
+    def test_batch_from_columns_and_numpy(self) -> None:
+        """Test building a batch from columns and viewing it as NumPy arrays"""
+        stamps = np.array(["2025-01-01T09:00:00", "2025-01-02T10:00:00"], dtype="datetime64[s]").astype(np.int64)
+        batch = ExpenseBatch.from_columns(["Rent", "Bus"], ["Home", "Work"], np.array([50000, 250]), stamps)
+        columns = batch.to_numpy()
+        self.assertEqual(columns["amounts_pence"].tolist(), [50000, 250])
+        self.assertEqual(columns["timestamps"].tolist(), stamps.tolist())
+        self.assertEqual([row[3] for row in batch.rows()], ["2025-01-01 09:00:00", "2025-01-02 10:00:00"])
+        with self.assertRaises(ValueError):
+            ExpenseBatch.from_columns(["Rent"], ["Home", "Work"], [1], [0])
+
+    def test_undated_rows_use_now(self) -> None:
+        """Test rows without a date are stored with the given time"""
+        batch = ExpenseBatch()
+        batch.append("Lunch", 1, "Food")
+        self.assertIsNone(next(iter(batch)).date)
+        self.assertEqual(next(batch.rows("2025-05-05 00:00:00"))[3], "2025-05-05 00:00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
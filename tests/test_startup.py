@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+"""Startup regression tests: importing main must stay cheap"""
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous budget for `import main`, well above a normal run, so only a real
+# regression (such as an eager matplotlib import) trips it
+IMPORT_BUDGET_US = 300_000
+
+# Heavy modules that should only load when a chart or analysis is requested
+LAZY_MODULES = ("matplotlib", "numpy", "timeseries")
+
+
+def import_times(module, cwd, env) -> dict[str, int]:
+    """Runs `python -X importtime -c 'import module'` and returns cumulative microseconds per module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """Import from an empty folder, pointing the database at a file that must not be created"""
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.db_path = os.path.join(self.folder, "startup.db")
+        self.env = dict(os.environ, PYTHONPATH=PROJECT_ROOT, EXPENSE_TRACKER_DB=self.db_path)
+
+    def test_import_main_is_fast_and_lazy(self) -> None:
+        """Test importing main skips matplotlib/NumPy, opens no database and stays within budget"""
+        times = import_times("main", self.folder, self.env)
+        loaded = [name for name in times if name.split(".")[0] in LAZY_MODULES]
+        self.assertEqual(loaded, [], f"Imported eagerly: {loaded}")
+        self.assertFalse(os.path.exists(self.db_path), "Database opened at import time")
+        self.assertLess(times["main"], IMPORT_BUDGET_US, f"import main took {times['main']} us")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import unittest
+from collections import Counter
+import database.database as db
+import synthetic
+from tests.base import DatabaseTestCase
+
+"""Unit tests for synthetic.py functions"""
+
+class TestSynthetic(DatabaseTestCase):
+    DB_NAME = None # Each test generates into files of its own
+
+    def generate(self, name, **options) -> list[tuple]:
+        """Generates a ledger into a new file and returns its expense rows"""
+        path = os.path.join(self.folder, name)
+        db.configure(path)
+        self.counts = synthetic.generate_ledger(**options)
+        with sqlite3.connect(path) as connection:
+            return connection.execute(
+                "SELECT name, category, amount_pence, date, content_hash FROM expenses ORDER BY id"
+            ).fetchall()
+
+    def test_same_seed_same_ledger(self) -> None:
+        """Test generation is reproducible and depends on the seed"""
+        first = self.generate("a.db", expenses=2000, seed=7)
+        self.assertEqual(first, self.generate("b.db", expenses=2000, seed=7))
+        self.assertNotEqual(first, self.generate("c.db", expenses=2000, seed=8))
+
+    def test_ledger_shape(self) -> None:
+        """Test counts, vocabulary, date range, ordering and the rollups"""
+        rows = self.generate("ledger.db", expenses=20000, start="2024-01-01", years=1)
+        self.assertEqual(self.counts, (20000, 1000))
+        for name, category, pence, date, digest in rows[:500]:
+            self.assertIn(name, synthetic.CATEGORY_PROFILES[category][0])
+            self.assertGreater(pence, 0)
+            self.assertIsNotNone(digest)
+        dates = [row[3] for row in rows]
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreaterEqual(dates[0], "2024-01-01")
+        self.assertLess(dates[-1], "2025-01-01")
+        summarised = sum(total for _, total in db.summarise_expenses())
+        self.assertAlmostEqual(summarised, sum(row[2] for row in rows) / 100, places=2)
+
+        salaries = [record for record in db.get_all_income() if record.description == "Salary"]
+        self.assertEqual([record.date.day for record in salaries], [synthetic.SALARY_DAY] * 12)
+
+    def test_weekend_and_december_are_busier(self) -> None:
+        """Test the weekday and seasonal weighting shows up in the dates"""
+        rows = self.generate("busy.db", expenses=30000, start="2023-01-01", years=1)
+        weekdays = Counter(db.parse_timestamp(row[3]).weekday() for row in rows)
+        months = Counter(row[3][5:7] for row in rows)
+        self.assertGreater(weekdays[5], weekdays[0] * 1.3) # Saturday vs Monday
+        self.assertGreater(months["12"], months["01"] * 1.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from datetime import date, datetime
+import numpy as np
+from timeseries import bucket_totals, cumulative_totals, downsample, income_vs_expenses, lttb_indices
+
+"""Unit tests for timeseries.py functions"""
+
+class TestTimeseries(unittest.TestCase):
+
+    def test_daily_buckets_fill_gaps(self) -> None:
+        """Test days without transactions are included as zero"""
+        labels, totals = bucket_totals(["2025-01-01", "2025-01-03", "2025-01-03"], [1.0, 2.0, 3.0])
+        self.assertEqual(labels.tolist(), [date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)])
+        self.assertEqual(totals.tolist(), [1.0, 0.0, 5.0])
+
+    def test_weekly_buckets_start_on_monday(self) -> None:
+        """Test weekly buckets are aligned to Monday"""
+        dates = [date(2025, 10, 5), date(2025, 10, 6), date(2025, 10, 12), date(2025, 10, 13)] # Sun, Mon, Sun, Mon
+        labels, totals = bucket_totals(dates, [1, 2, 3, 4], resolution="week")
+        self.assertEqual(labels.tolist(), [date(2025, 9, 29), date(2025, 10, 6), date(2025, 10, 13)])
+        self.assertEqual(totals.tolist(), [1.0, 5.0, 4.0])
+
+    def test_monthly_buckets(self) -> None:
+        """Test monthly buckets accept datetimes and span empty months"""
+        dates = [datetime(2025, 1, 31, 23, 59), datetime(2025, 3, 1, 0, 0)]
+        labels, totals = bucket_totals(dates, [10, 5], resolution="month")
+        self.assertEqual(labels.tolist(), [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)])
+        self.assertEqual(totals.tolist(), [10.0, 0.0, 5.0])
+
+    def test_explicit_range_drops_outside_rows(self) -> None:
+        """Test a start/end range limits the buckets and ignores other rows"""
+        labels, totals = bucket_totals(
+            ["2025-01-01", "2025-01-05", "2025-01-09"], [1, 2, 3], start="2025-01-04", end="2025-01-06"
+        )
+        self.assertEqual(labels.tolist(), [date(2025, 1, 4), date(2025, 1, 5), date(2025, 1, 6)])
+        self.assertEqual(totals.tolist(), [0.0, 2.0, 0.0])
+
+    def test_cumulative_totals(self) -> None:
+        """Test running totals"""
+        _, running = cumulative_totals(["2025-01-01", "2025-01-02", "2025-01-04"], [1, 2, 3])
+        np.testing.assert_array_equal(running, [1, 3, 3, 6])
+
+    def test_income_vs_expenses(self) -> None:
+        """Test the line chart series built from daily rollups"""
+        daily = [(date(2025, 1, 1), 10.0, 0.0), (date(2025, 1, 3), 5.0, 100.0)]
+        labels, expenses, income = income_vs_expenses(daily)
+        self.assertEqual(len(labels), 3)
+        self.assertEqual(expenses.tolist(), [10.0, 10.0, 15.0])
+        self.assertEqual(income.tolist(), [0.0, 0.0, 100.0])
+
+    def test_unknown_resolution(self) -> None:
+        """Test an invalid resolution is rejected"""
+        with self.assertRaises(ValueError):
+            bucket_totals(["2025-01-01"], [1], resolution="year")
+
+    def test_lttb_keeps_endpoints_and_peaks(self) -> None:
+        """Test downsampling caps the point count and keeps a spike"""
+        x = np.arange(10_000)
+        y = np.zeros(10_000)
+        y[4321] = 500.0
+        indices = lttb_indices(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, 9_999))
+        self.assertIn(4321, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0)) # Still in order
+
+    def test_lttb_rejects_too_few_points(self) -> None:
+        """Test a cap below 3 points is rejected rather than ignored"""
+        for threshold in (0, 1, 2):
+            with self.assertRaises(ValueError):
+                lttb_indices(np.arange(10), np.zeros(10), threshold)
+        self.assertEqual(len(lttb_indices(np.arange(10), np.zeros(10), 3)), 3)
+
+    def test_downsample_short_series_unchanged(self) -> None:
+        """Test series already under the cap are returned as they are"""
+        labels, totals = cumulative_totals(["2025-01-01", "2025-01-05"], [1, 2])
+        x, y = downsample(labels, totals, 100)
+        np.testing.assert_array_equal(x, labels)
+        np.testing.assert_array_equal(y, totals)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,8 +8,13 @@ from utils import (
     get_float_input,
     get_int_input,
     safe_remove,
-    parse_date
+    parse_date,
+    parse_dates,
+    parse_period,
+    to_datetime,
+    print_paged
 )
+from models.expense import ExpenseRecord
 
 """Unit tests for utils.py functions"""
 
@@ -112,6 +117,67 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             parse_date("1: Something - £2.00 no date")
 
+    def test_parse_date_record_string(self) -> None:
+        """Test parsing a printed record with a time, a dash in its name and a thousands separator"""
+        record = ExpenseRecord(4, "Rent - March", "Home", 1234.5, datetime(2023, 3, 1, 9, 30))
+        self.assertEqual(parse_date(str(record)), (datetime(2023, 3, 1, 9, 30), 1234.5))
+
+    def test_parse_period(self) -> None:
+        """Test years, months (including December) and days become [start, end) ranges"""
+        self.assertEqual(parse_period("2025"), (datetime(2025, 1, 1), datetime(2026, 1, 1)))
+        self.assertEqual(parse_period("2024-12"), (datetime(2024, 12, 1), datetime(2025, 1, 1)))
+        self.assertEqual(parse_period("2025-03-14"), (datetime(2025, 3, 14), datetime(2025, 3, 15)))
+        with self.assertRaises(ValueError):
+            parse_period("March")
+
+    def test_to_datetime(self) -> None:
+        """Test dates, ISO strings and strings in a given format become datetimes"""
+        self.assertEqual(to_datetime(" 2025-03-14 08:30:00 "), datetime(2025, 3, 14, 8, 30))
+        self.assertEqual(to_datetime("14/03/2025", "%d/%m/%Y"), datetime(2025, 3, 14))
+        self.assertEqual(to_datetime(datetime(2025, 3, 14).date()), datetime(2025, 3, 14))
+        self.assertIsNone(to_datetime("  "))
+        self.assertIsNone(to_datetime(None))
+        with self.assertRaisesRegex(ValueError, "expected %d/%m/%Y"):
+            to_datetime("2025-03-14", "%d/%m/%Y")
+        with self.assertRaises(ValueError):
+            to_datetime(20250314)
+
+    def test_parse_dates_batch(self) -> None:
+        """Test parsing a column of entries into NumPy arrays"""
+        dates, amounts = parse_dates([
+            "1: Lunch (Food) - £12.50 on [2023-10-01]", "2: Rent - £1,000.00 on [2023-10-02 08:00:00]",
+        ])
+        self.assertEqual(str(dates.dtype), "datetime64[s]")
+        self.assertEqual([str(d) for d in dates], ["2023-10-01T00:00:00", "2023-10-02T08:00:00"])
+        self.assertEqual(amounts.tolist(), [12.5, 1000.0])
+        self.assertEqual(len(parse_dates([])[0]), 0)
+        with self.assertRaises(ValueError):
+            parse_dates(["1: Lunch - £1.00 on [yesterday]"])
+
+    @patch("builtins.input", side_effect=[""])
+    @patch("builtins.print")
+    def test_print_paged_more(self, mock_print, mock_input) -> None:
+        """Test paging continues when the user presses Enter"""
+        printed = print_paged(iter(range(3)), page_size=2)
+        self.assertEqual(printed, 3)
+        mock_input.assert_called_once()
+
+    @patch("builtins.input", side_effect=["q"])
+    @patch("builtins.print")
+    def test_print_paged_stop(self, mock_print, mock_input) -> None:
+        """Test paging stops when the user cancels"""
+        entries = iter(range(5))
+        printed = print_paged(entries, page_size=2)
+        self.assertEqual(printed, 2)
+        self.assertEqual(next(entries), 3) # Only one entry beyond the page was pulled
+
+    @patch("builtins.input")
+    @patch("builtins.print")
+    def test_print_paged_single_page(self, mock_print, mock_input) -> None:
+        """Test no prompt is shown when everything fits on one page"""
+        self.assertEqual(print_paged(["a", "b"], page_size=2), 2)
+        mock_input.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,7 +4,8 @@ from main import (
     get_expense_from_user,
     main_menu, 
     Expense, 
-    remove_expense_from_user
+    remove_expense_from_user,
+    search_transactions
 )
 
 """Unit tests for main.py functions"""
@@ -20,6 +21,20 @@ class TestMain(unittest.TestCase):
         self.assertEqual(expense.amount, 12.5)
         self.assertEqual(expense.category, 'Food')
 
+    @patch('builtins.input', side_effect=['Test Expense', '-5', 'nan', '12.5', '1'])
+    def test_get_expense_from_user_rejects_invalid_amounts(self, mock_input) -> None:
+        """Test negative and NaN amounts are re-prompted for instead of crashing"""
+        expense = get_expense_from_user()
+        self.assertEqual(expense.amount, 12.5)
+        self.assertEqual(mock_input.call_count, 5)
+
+    @patch('builtins.input', side_effect=['6', '2', 'Pay', '-50', '50', '4', '8'])
+    @patch('main.database.add_income')
+    def test_main_menu_add_income_rejects_negative_amount(self, mock_add, mock_input) -> None:
+        """Test a negative income amount is re-prompted for and never stored"""
+        main_menu()
+        mock_add.assert_called_once_with('Pay', 50.0)
+
     @patch('builtins.input', side_effect=['5', '8'])
     @patch('main.plot_expense_summary')
     def test_main_menu_plot_summary(self, mock_plot, mock_input) -> None:
@@ -35,7 +50,7 @@ class TestMain(unittest.TestCase):
         mock_add.assert_called_once() # Ensure add_expense was called
 
     @patch('builtins.input', side_effect=['2', '1', '8'])
-    @patch('main.database.get_all_expenses', return_value=[Expense('Lunch', 12.5, 'Food')])
+    @patch('main.database.iter_expenses', return_value=iter([Expense('Lunch', 12.5, 'Food')]))
     @patch('main.database.remove_expense', return_value=True)
     def test_main_menu_remove_expense(self, mock_remove, mock_get, mock_input) -> None:
         """Test removing an expense through main menu"""
@@ -54,7 +69,7 @@ class TestMain(unittest.TestCase):
         mock_add.assert_called_once()
 
     @patch('builtins.input', side_effect=['1'])
-    @patch('main.database.get_all_expenses', return_value=[Expense('Lunch', 12.5, 'Food')])
+    @patch('main.database.iter_expenses', return_value=iter([Expense('Lunch', 12.5, 'Food')]))
     @patch('main.database.remove_expense', return_value=True)
     def test_remove_expense_from_user(self, mock_remove, mock_get, mock_input) -> None:
         """Test removing an expense from user input"""
@@ -68,5 +83,21 @@ class TestMain(unittest.TestCase):
         main_menu()
         mock_plot.assert_called_once()
 
+    @patch('builtins.input', side_effect=['9', 'lun', '8'])
+    @patch('main.database.search_income', return_value=[])
+    @patch('main.database.search_expenses', return_value=[Expense('Lunch', 12.5, 'Food')])
+    def test_main_menu_search(self, mock_search, mock_income, mock_input) -> None:
+        """Test searching transactions through main menu"""
+        main_menu()
+        mock_search.assert_called_once_with('lun')
+        mock_income.assert_called_once_with('lun')
+
+    @patch('builtins.input', side_effect=['q'])
+    @patch('main.database.search_expenses')
+    def test_search_transactions_cancelled(self, mock_search, mock_input) -> None:
+        """Test cancelling a search does not query the database"""
+        search_transactions()
+        mock_search.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
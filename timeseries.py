@@ -0,0 +1,126 @@
+import numpy as np
+
+"""Vectorised time-series aggregation of expenses and income using NumPy"""
+
+RESOLUTIONS = ("day", "week", "month")
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    Converts dates (date/datetime objects, ISO strings or a datetime64 array)
+    into a datetime64[D] array
+    """
+    return np.asarray(dates, dtype="datetime64[D]")
+
+def bucket_starts(days, resolution="day") -> np.ndarray:
+    """
+    Maps each datetime64[D] value to the first day of its bucket.
+    Weeks start on Monday; months start on the 1st.
+    """
+    if resolution == "day":
+        return days
+    if resolution == "week":
+        # Day 0 of the epoch (1970-01-01) was a Thursday, so shift by 3 to align weeks to Monday
+        offsets = (days.astype(np.int64) + 3) % 7
+        return days - offsets.astype("timedelta64[D]")
+    if resolution == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(RESOLUTIONS)}")
+
+def bucket_range(start, end, resolution="day") -> np.ndarray:
+    """Returns the start day of every bucket from the one containing `start` to the one containing `end`"""
+    first, last = bucket_starts(to_days([start, end]), resolution)
+    if resolution == "month":
+        months = np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1)
+        return months.astype("datetime64[D]")
+    step = 7 if resolution == "week" else 1
+    return np.arange(first, last + 1, step)
+
+def bucket_totals(dates, amounts, resolution="day", start=None, end=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sums amounts into contiguous day/week/month buckets with np.bincount.
+    Buckets with no transactions are included with a total of zero.
+    The range defaults to the earliest and latest date given.
+    Returns (bucket start days as datetime64[D], totals as float64)
+    """
+    days = to_days(dates)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if days.size == 0 and (start is None or end is None):
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float64)
+    start = days.min() if start is None else start
+    end = days.max() if end is None else end
+    labels = bucket_range(start, end, resolution)
+
+    # Sum each day with bincount, then fold whole days into weeks/months with reduceat
+    first, last = labels[0], to_days(end)
+    in_range = (days >= first) & (days <= last)
+    index = (days[in_range] - first).astype(np.int64)
+    span = int((last - first).astype(np.int64)) + 1
+    daily = np.bincount(index, weights=amounts[in_range], minlength=span)
+    if resolution == "day":
+        return labels, daily
+    return labels, np.add.reduceat(daily, (labels - first).astype(np.int64))
+
+def cumulative_totals(dates, amounts, resolution="day", start=None, end=None) -> tuple[np.ndarray, np.ndarray]:
+    """Like bucket_totals, but returns the running total at the end of each bucket"""
+    labels, totals = bucket_totals(dates, amounts, resolution, start, end)
+    return labels, np.cumsum(totals)
+
+def from_daily_totals(daily_totals) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Splits database.get_daily_totals() rows into (days, expenses, income) arrays"""
+    if not daily_totals:
+        return np.array([], dtype="datetime64[D]"), np.array([]), np.array([])
+    days, expenses, income = zip(*daily_totals)
+    return to_days(days), np.asarray(expenses, dtype=np.float64), np.asarray(income, dtype=np.float64)
+
+def income_vs_expenses(daily_totals, resolution="day") -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the running income and expense totals used by the line chart.
+    Returns (bucket start days, cumulative expenses, cumulative income)
+    """
+    days, expenses, income = from_daily_totals(daily_totals)
+    labels, expense_values = cumulative_totals(days, expenses, resolution)
+    _, income_values = cumulative_totals(days, income, resolution)
+    return labels, expense_values, income_values
+
+def lttb_indices(x, y, threshold) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks `threshold` point indices that keep the
+    visual shape of the series, always including the first and last points.
+    Each middle bucket keeps the point forming the largest triangle with the
+    previously kept point and the average of the next bucket, so peaks survive.
+    A threshold below 3 can't keep both endpoints and a point between them, so it is rejected.
+    """
+    if threshold < 3:
+        raise ValueError(f"LTTB needs a threshold of at least 3 points, got {threshold}")
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    x = np.asarray(x).astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket k of the middle points covers edges[k]:edges[k + 1]
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for k in range(threshold - 2):
+        start, end = edges[k], edges[k + 1]
+        next_end = edges[k + 2] if k + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[k + 1] = previous
+    return selected
+
+def downsample(x, y, max_points) -> tuple[np.ndarray, np.ndarray]:
+    """Reduces a series to at most `max_points` points with LTTB; short series are returned unchanged"""
+    x, y = np.asarray(x), np.asarray(y)
+    indices = lttb_indices(x, y, max_points)
+    return x[indices], y[indices]
@@ -1,4 +1,11 @@
-from datetime import datetime
+import functools
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING: # NumPy is only imported when parse_dates is called, to keep startup fast
+    import numpy as np
+
+DATE_MEMO_SIZE = 4096 # Distinct date strings remembered by parse_date
 
 
 def format_currency(value) -> str:
@@ -61,39 +68,100 @@ def safe_remove(func, item_id, item_name="item") -> None:
     except Exception as e:
         print(f"Failed to remove {item_name} with ID {item_id}: {e}")
 
+def _split_entry(entry_str: str) -> tuple[str, str]:
+    """Splits 'ID: Description - £Amount on [date]' into its amount and date text"""
+    before, separator, after = entry_str.rpartition(" on [")
+    _, dash, amount = before.rpartition(" - ")
+    if not separator or not dash:
+        raise ValueError("Invalid entry format")
+    return amount.strip().lstrip("£").replace(",", ""), after.partition("]")[0].strip()
+
+@functools.lru_cache(maxsize=DATE_MEMO_SIZE)
+def _parse_entry_date(date_str: str) -> datetime:
+    """Parses 'YYYY-MM-DD HH:MM:SS' or 'YYYY-MM-DD', remembering recent dates as entries often share them"""
+    return datetime.fromisoformat(date_str)
+
 def parse_date(entry_str: str) -> tuple[datetime, float]:
     """
     Parses an expense/income entry string and returns (datetime, amount).
-    Handles extra whitespace gracefully.
+    Handles extra whitespace and thousands separators gracefully.
     Expected format:
     'ID: Description - £Amount on [YYYY-MM-DD HH:MM:SS]'
     """
     try:
-        clean_str = entry_str.strip()
-        
-        if " on [" not in clean_str:
-            raise ValueError("Invalid entry format")
-        
-        date_part = clean_str.split(" on [", 1)[1]
-        date_str = date_part.split("]", 1)[0].strip()
-        try:
-            date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            date = datetime.strptime(date_str, "%Y-%m-%d")
+        amount_str, date_str = _split_entry(entry_str)
+        return _parse_entry_date(date_str), float(amount_str)
+    except Exception:
+        raise ValueError("Invalid entry format")
 
-        before_date = clean_str.split(" on [")[0]
-        if " - £" in before_date:
-            amount_str = before_date.split(" - £")[1].strip()
-        elif " - " in before_date:
-            amount_str = before_date.split(" - ")[1].strip()
-        else:
-            raise ValueError("Invalid entry format")
+def parse_dates(entries) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    Batch version of parse_date for a whole column of entry strings.
+    Returns (dates as datetime64[s], amounts as float64), converted by NumPy in one go
+    """
+    import numpy as np
 
-        amount = float(amount_str)
-        return date, amount
+    try:
+        pairs = [_split_entry(entry) for entry in entries]
+        amounts, dates = zip(*pairs) if pairs else ((), ())
+        return np.array(dates, dtype="datetime64[s]"), np.array(amounts, dtype=np.float64)
     except Exception:
         raise ValueError("Invalid entry format")
 
+def to_datetime(value, date_format=None) -> datetime | None:
+    """
+    Converts a date/datetime, or a date string in ISO 'YYYY-MM-DD[ HH:MM:SS]' format
+    (or `date_format`, strptime syntax such as '%d/%m/%Y'), to a datetime.
+    None and blank strings return None, which means 'now' when stored.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        try:
+            return datetime.strptime(text, date_format) if date_format else datetime.fromisoformat(text)
+        except ValueError:
+            raise ValueError(f"Invalid date {value!r}, expected {date_format or 'YYYY-MM-DD[ HH:MM:SS]'}") from None
+    raise ValueError(f"Invalid date {value!r}")
+
+def parse_period(period: str) -> tuple[datetime, datetime]:
+    """
+    Turns a period into a [start, end) date range: a year ('2025'),
+    a month ('2025-03') or a single day ('2025-03-14')
+    """
+    text = period.strip()
+    try:
+        if len(text) == 4:
+            year = int(text)
+            return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        if len(text) == 7 and text[4] == "-":
+            year, month = int(text[:4]), int(text[5:])
+            start = datetime(year, month, 1)
+            return start, datetime(year + month // 12, month % 12 + 1, 1)
+        start = datetime.strptime(text, "%Y-%m-%d")
+        return start, start + timedelta(days=1)
+    except ValueError:
+        raise ValueError(f"Invalid period '{period}', expected YYYY, YYYY-MM or YYYY-MM-DD")
+
+def print_paged(entries, page_size=20) -> int:
+    """
+    Prints entries one page at a time, asking before showing each further page.
+    Only pulls as many entries from the iterable as it prints.
+    Returns the number of entries printed
+    """
+    count = 0
+    for entry in entries:
+        if count and count % page_size == 0:
+            if input_with_exit("Press Enter to show more") is None:
+                break
+        print(entry)
+        count += 1
+    return count
+
 def input_with_exit(prompt: str, exit_value='q', cast=None):
     """
     Prompts the user and allows them to exit by entering 'exit_value'